@@ -0,0 +1,213 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import zstandard
+
+import MetricsUnimart as metrics
+from ExtractionUnimart import extract_articles
+
+COMPRESSION_LEVEL = 10  # pages of the same store share most of their markup, a higher level pays off little
+WORKERS = os.cpu_count() or 1
+
+
+class PageArchive:
+    """
+    Archive of the raw HTML of the scraped pages. Every page is stored once under the SHA-256 of its
+    content, compressed with zstd, in <root>/objects/<2 first hex digits>/<sha256>.html.zst, and every run
+    has an index <root>/index/<run id>.jsonl with one line per fetched page: URL, subcategory, label and hash.
+    """
+
+    def __init__(self, root, run_id=None, level=COMPRESSION_LEVEL):
+        """
+        :param root: Directory of the archive.
+        :param run_id: Run the pages are indexed under, by default the current date and time.
+        :param level: zstd compression level.
+        """
+        self.root = root
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.level = level
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'index'), exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest + '.html.zst')
+
+    def index_path(self, run_id=None):
+        return os.path.join(self.root, 'index', (run_id or self.run_id) + '.jsonl')
+
+    def put(self, url, page_html, subcategory, label):
+        """
+        Archive a page and index it under the current run. A page already in the archive is not stored again.
+
+        :param url: URL the page was fetched from.
+        :param page_html: HTML of the page, e.g. driver.page_source.
+        :param subcategory: Subcategory the page was scraped for.
+        :param label: Label the page was scraped for.
+        :return: SHA-256 of the page.
+        """
+        data = page_html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+            # Write to a temporary file first so a crash never leaves a truncated object under its final name
+            temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(temporary, 'wb') as output:
+                output.write(compressed)
+            os.replace(temporary, path)
+            metrics.count('archive_bytes', len(compressed))
+        entry = {'url': url, 'subcategory': subcategory, 'label': label, 'sha256': digest, 'size': len(data),
+                 'fetched_at': datetime.now().isoformat(timespec='seconds')}
+        with self._lock:
+            with open(self.index_path(), 'a', encoding='utf-8') as index:
+                index.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        metrics.count('pages_archived')
+        return digest
+
+    def get(self, digest):
+        """Return the HTML of an archived page."""
+        return read_object(self.object_path(digest))
+
+    def runs(self):
+        """Ids of the runs in the archive, oldest first."""
+        return sorted(file[:-len('.jsonl')] for file in os.listdir(os.path.join(self.root, 'index'))
+                      if file.endswith('.jsonl'))
+
+    def entries(self, run_id=None):
+        """
+        Read the index of a run.
+
+        :param run_id: Run to read, by default the current one.
+        :return: List of index entries in the order the pages were fetched.
+        """
+        with open(self.index_path(run_id), encoding='utf-8') as index:
+            return [json.loads(line) for line in index if line.strip()]
+
+    def lookup(self, url, run_id=None):
+        """
+        Find the last archived copy of a URL.
+
+        :param url: URL of the page.
+        :param run_id: Only look in this run; by default the runs are searched from the latest.
+        :return: The index entry, or None if the URL was never archived.
+        """
+        for run in ([run_id] if run_id else reversed(self.runs())):
+            matches = [entry for entry in self.entries(run) if entry['url'] == url]
+            if matches:
+                return dict(matches[-1], run_id=run)
+        return None
+
+
+def read_object(path):
+    with open(path, 'rb') as archived:
+        return zstandard.ZstdDecompressor().decompress(archived.read()).decode('utf-8')
+
+
+def _extract_object(path):
+    return extract_articles(read_object(path))
+
+
+def reextract(archive, sinks, run_id=None, workers=WORKERS):
+    """
+    Run the extraction again over the archived pages of a run, in parallel processes and without network,
+    and hand the articles of every label to the sinks, in the order the pages were fetched.
+
+    :param archive: The page archive.
+    :param sinks: Callables receiving (dataframe, subcategory, label), like the scraper sinks.
+    :param run_id: Run to re-extract, by default the latest one.
+    :param workers: Number of processes.
+    :return: Number of articles extracted, None if the archive has no run.
+    """
+    if run_id is None:
+        runs = archive.runs()
+        if not runs:
+            print(f"Error: the archive {archive.root} has no run to re-extract")
+            return None
+        run_id = runs[-1]
+    # A page retried during the crawl is indexed more than once, keep its last copy at its first position
+    entries = {}
+    for entry in archive.entries(run_id):
+        key = (entry['subcategory'], entry['label'], entry['url'])
+        entries[key] = dict(entries.get(key, entry), sha256=entry['sha256'])
+    entries = list(entries.values())
+
+    total = 0
+    key, frames = None, []
+
+    def flush():
+        if frames:
+            # One write per label instead of one per page
+            df = pd.concat(frames, ignore_index=True)
+            with metrics.span('sink_write'):
+                for sink in sinks:
+                    sink(df, *key)
+        frames.clear()
+
+    paths = [archive.object_path(entry['sha256']) for entry in entries]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for entry, df in zip(entries, executor.map(_extract_object, paths, chunksize=16)):
+            metrics.count('pages')
+            metrics.count('products', len(df))
+            if (entry['subcategory'], entry['label']) != key:
+                flush()
+                key = (entry['subcategory'], entry['label'])
+            frames.append(df)
+            total += len(df)
+        flush()
+
+    for sink in sinks:
+        if hasattr(sink, 'close'):
+            sink.close()
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Archive of the raw pages fetched by the scraper.')
+    parser.add_argument('root', help='Directory of the archive.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('runs', help='List the runs with their number of pages.')
+
+    reextract_parser = subparsers.add_parser('reextract', help='Extract the articles again from the archived pages.')
+    reextract_parser.add_argument('output_directory', help='Articles_by_subcategory directory to write.')
+    reextract_parser.add_argument('--run', help='Run to re-extract, by default the latest one.')
+    reextract_parser.add_argument('--workers', type=int, default=WORKERS)
+    reextract_parser.add_argument('--parquet', help='Also write a Parquet dataset to this directory.')
+
+    cat_parser = subparsers.add_parser('cat', help='Print the archived HTML of a URL.')
+    cat_parser.add_argument('url')
+    cat_parser.add_argument('--run')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    metrics.configure_from_environment()
+    archive = PageArchive(args.root)
+    if args.command == 'runs':
+        for run in archive.runs():
+            entries = archive.entries(run)
+            print(f"{run}: {len(entries)} pages, {len({entry['sha256'] for entry in entries})} distinct")
+    elif args.command == 'cat':
+        entry = archive.lookup(args.url, args.run)
+        print(archive.get(entry['sha256']) if entry else f"{args.url} is not in the archive")
+    else:
+        from FeedUnimart import ExcelSink
+        before = datetime.now()
+        sinks = [ExcelSink(args.output_directory)]
+        if args.parquet:
+            from ParquetUnimart import ParquetSink
+            sinks.append(ParquetSink(args.parquet))
+        total = reextract(archive, sinks, args.run, args.workers)
+        if total is not None:
+            print(f"{total} articles extracted in {datetime.now() - before}")
+    metrics.write_reports()
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import time
+
+import asyncpg
+
+import MetricsUnimart as metrics
+import DataAnalysisUnimart as analysis
+
+# The charts of the report and the query each one is drawn from; none depends on another
+REPORT_QUERIES = {
+    'article_count_by_brand': analysis.ARTICLE_COUNT_BY_BRAND_QUERY,
+    'article_count_by_subcategory': analysis.ARTICLE_COUNT_BY_SUBCATEGORY_QUERY,
+    'price_stats_by_category': analysis.PRICE_STATS_BY_CATEGORY_QUERY,
+    'most_expensive_articles': analysis.MOST_EXPENSIVE_ARTICLES_QUERY,
+}
+# Chart drawn with the rows of each report query
+REPORT_PLOTS = {
+    'article_count_by_brand': analysis.plot_brand_article_count,
+    'article_count_by_subcategory': analysis.plot_article_count_by_subcategory,
+    'price_stats_by_category': lambda data: analysis.plot_price_stats_by_category(analysis.without_empty_stats(data)),
+    'most_expensive_articles': analysis.plot_most_expensive_articles,
+}
+POOL_SIZE = 4  # connections of the pool, one per report query so none waits for another
+
+
+async def _fetch(pool, name, query):
+    start = time.perf_counter()
+    with metrics.span('report_query'):
+        records = await pool.fetch(query)
+    metrics.observe(f'report_query_{name}', time.perf_counter() - start)
+    # Same rows as DatabaseManager.fetch_all, so the plots take either
+    return name, [tuple(record) for record in records]
+
+
+async def fetch_reports(host, dbname, user, password, port, queries=None, pool_size=POOL_SIZE):
+    """
+    Run the report queries at the same time, each on its own connection of a pool, so the report waits
+    for the slowest query instead of the sum of all of them.
+
+    :param host: Host of the database.
+    :param dbname: Name of the database.
+    :param user: User of the database.
+    :param password: Password of the user.
+    :param port: Port of the database.
+    :param queries: Dict of name -> query without parameters, REPORT_QUERIES by default.
+    :param pool_size: Maximum connections open at once.
+    :return: Dict of name -> list of tuples, in the order of the queries.
+    """
+    queries = REPORT_QUERIES if queries is None else queries
+    with metrics.span('report_queries'):
+        async with asyncpg.create_pool(host=host, database=dbname, user=user, password=password, port=int(port),
+                                       min_size=1, max_size=min(pool_size, len(queries))) as pool:
+            results = await asyncio.gather(*(_fetch(pool, name, query) for name, query in queries.items()))
+    return dict(results)
+
+
+def render_reports(results):
+    """
+    Draw the chart of every report query.
+
+    :param results: Dict returned by `fetch_reports`.
+    """
+    for name, data in results.items():
+        REPORT_PLOTS[name](data)
+
+
+def run_reports(host, dbname, user, password, port, pool_size=POOL_SIZE):
+    """Fetch every report query concurrently, then draw the charts one after another."""
+    render_reports(asyncio.run(fetch_reports(host, dbname, user, password, port, pool_size=pool_size)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Draw the charts of the analysis, querying the database concurrently.')
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', default='unimart')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    metrics.configure_from_environment()
+    run_reports(args.host, args.dbname, args.user, args.password, args.port, args.pool_size)
+    metrics.write_reports()
@@ -0,0 +1,512 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+
+import DataAnalysisUnimart as analysis
+from MigrationsUnimart import MigrationRunner
+
+# Main categories and their subcategories, shaped like the real Unimart menu
+CATALOG_TREE = {
+    'Celulares y Smartwatches': ['Celulares por Marca', 'Smartwatches', 'Accesorios para Celular'],
+    'Cómputo e Impresión': ['Laptops y Desktops', 'Impresoras', 'Accesorios de Cómputo', 'Tablets'],
+    'Hogar': ['Cocina', 'Casa', 'Electrodomésticos', 'Línea Blanca'],
+    'TV, Audio y Smart Home': ['Televisores', 'Audio', 'Smart Home', 'Cámaras'],
+    'Deportes y Camping': ['Camping', 'Ropa Deportiva', 'Actividad'],
+    'Moda y Belleza': ['Moda Hombre', 'Moda Mujer', 'Belleza', 'Salud'],
+    'Más': ['Mascotas', 'Bebé y Niño', 'Oficina y Escolar', 'Auto, Moto y Ferretería'],
+}
+KNOWN_BRANDS = ['Xiaomi', 'Nexxt Solutions', 'Argom', 'Google', 'Amazon', 'Samsung', 'Apple', 'Lenovo', 'HP',
+                'Logitech', 'JBL', 'Sony', 'Oster', 'Black+Decker', 'Coleman', 'Adidas', 'Nike', 'Motorola']
+PRODUCT_WORDS = ['Redmi', 'Audífonos', 'Cargador', 'Cable USB-C', 'Mouse', 'Teclado', 'Licuadora', 'Freidora',
+                 'Parlante', 'Reloj', 'Tienda de Campaña', 'Mochila', 'Perfume', 'Cámara', 'Router', 'Monitor']
+TYPES_PER_SUBCATEGORY = 8
+BRAND_POOL_SIZE = 400
+OFFER_PROBABILITY = 0.2
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+REGRESSION_THRESHOLD = 1.10  # A stage 10% slower than the baseline is reported as a regression
+INDEX_SCANS = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+# Drill-downs from one category or brand of a generated catalog, the joins the foreign key indexes serve
+# (the statistics queries read the whole catalog, where sequential scans are the right plan)
+FK_JOIN_QUERIES = {
+    'articles_of_category': """
+        SELECT S.subcategory_name, T.type_name, A.article_name, A.price_cents / 100.0 AS Price
+        FROM Category C
+        JOIN Subcategory S ON S.ID_Category = C.ID_Category
+        JOIN Type T ON T.ID_Subcategory = S.ID_Subcategory
+        JOIN Article A ON A.ID_Type = T.ID_Type
+        WHERE C.category_name = 'Hogar';
+        """,
+    'articles_of_brand': """
+        SELECT A.article_name, A.price_cents / 100.0 AS Price
+        FROM Brand B
+        JOIN Article A ON A.ID_Brand = B.ID_Brand
+        WHERE B.brand_name = 'JBL';
+        """,
+}
+# Queries whose plans are checked: the statistics of the report and the foreign key drill-downs
+PLAN_QUERIES = {**analysis.STATS_QUERIES, **FK_JOIN_QUERIES}
+# Tables that a query must reach through an index once the catalog is large
+PLAN_EXPECTATIONS = {
+    'most_expensive_articles': ['article'],
+    'articles_of_category': ['article'],
+    'articles_of_brand': ['article'],
+}
+# Index each foreign key join must be able to use. Type and Subcategory hold a few hundred rows at most and the
+# planner rightly reads them whole, so these are checked with sequential scans disabled: the plan then shows
+# whether the join can be answered by the index at all, e.g. not after the index was dropped.
+FK_JOIN_INDEXES = {
+    'articles_of_category': ['idx_subcategory_id_category', 'idx_type_id_subcategory', 'idx_article_id_type'],
+    'articles_of_brand': ['idx_article_id_brand'],
+}
+
+
+def format_price(amount):
+    """
+    Format an amount the way the website shows it, e.g. '₡12,345.00'.
+
+    :param amount: Price as a number.
+    :return: The formatted price.
+    """
+    return "₡{:,.2f}".format(amount)
+
+
+def type_names(subcategory):
+    """
+    Build the names of the types (Excel sheets) generated for a subcategory.
+
+    :param subcategory: Name of the subcategory.
+    :return: List of type names, unique across the catalog and short enough to be sheet names.
+    """
+    return [f"{subcategory} {k + 1}" for k in range(TYPES_PER_SUBCATEGORY)]
+
+
+def generate_catalog(directory, n_articles, seed=0):
+    """
+    Write a synthetic catalog with the same layout as the scraper output:
+    'MainCategories/Main Categories.xlsx', one workbook per main category in
+    'MainCategories/MainCategories_urls_subcategories' and one workbook per subcategory
+    in 'Articles_by_subcategory' with a sheet per type.
+
+    :param directory: Root directory where the catalog is written.
+    :param n_articles: Total number of articles to generate.
+    :param seed: Seed for the random generator so the same catalog is produced on every run.
+    :return: None
+    """
+    rng = random.Random(seed)
+    articles_directory = os.path.join(directory, 'Articles_by_subcategory')
+    urls_directory = os.path.join(directory, 'MainCategories', 'MainCategories_urls_subcategories')
+    os.makedirs(articles_directory, exist_ok=True)
+    os.makedirs(urls_directory, exist_ok=True)
+
+    # Brands follow a long tail: a few brands own most of the articles
+    brands = KNOWN_BRANDS + [f"Marca {i:03d}" for i in range(BRAND_POOL_SIZE - len(KNOWN_BRANDS))]
+    brand_weights = [1 / (rank + 1) for rank in range(len(brands))]
+
+    subcategories = [sub for subs in CATALOG_TREE.values() for sub in subs]
+    all_types = [(sub, type_name) for sub in subcategories for type_name in type_names(sub)]
+    per_type = [n_articles // len(all_types)] * len(all_types)
+    for i in range(n_articles % len(all_types)):
+        per_type[i] += 1
+
+    pd.DataFrame({'Main Categories': list(CATALOG_TREE)}).to_excel(
+        os.path.join(directory, 'MainCategories', 'Main Categories.xlsx'), index=False)
+
+    for category, subs in CATALOG_TREE.items():
+        menu = {}
+        for sub in subs:
+            labels = ['Ver Todo ' + sub] + type_names(sub)
+            menu[sub] = pd.Series(labels)
+            menu[sub + '_url'] = pd.Series(
+                [f"https://www.unimart.com/collections/{label.lower().replace(' ', '-')}" for label in labels])
+        pd.DataFrame(menu).to_excel(os.path.join(urls_directory, category + '.xlsx'), sheet_name=category,
+                                    index=False)
+
+    type_index = 0
+    for sub in subcategories:
+        # write_only keeps memory flat while generating the large catalogs
+        workbook = Workbook(write_only=True)
+        for type_name in type_names(sub):
+            sheet = workbook.create_sheet(type_name)
+            sheet.append(['Brand', 'Articule_Name', 'Price', 'Offer_Price'])
+            for _ in range(per_type[type_index]):
+                brand = rng.choices(brands, weights=brand_weights)[0]
+                name = f"{brand} {rng.choice(PRODUCT_WORDS)} {rng.randint(1, 999)}"
+                amount = round(rng.lognormvariate(10.3, 1.0), -2) + 900
+                offer = None
+                if rng.random() < OFFER_PROBABILITY:
+                    offer = format_price(round(amount * rng.uniform(0.6, 0.95), -2))
+                sheet.append([brand, name, format_price(amount), offer])
+            type_index += 1
+        workbook.save(os.path.join(articles_directory, sub.replace(' ', '_') + '.xlsx'))
+
+
+class StageTimer:
+    """
+    Collects wall-clock timings of the benchmark stages.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block and record it under the given stage name.
+
+        :param name: Name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+            print(f"{name}: {self.stages[name]}s")
+
+
+def parse_workbooks(read_directory):
+    """
+    Read every sheet of every article workbook, like the loader does.
+
+    :param read_directory: Directory with the article Excel files.
+    :return: List of (subcategory, type, DataFrame) tuples.
+    """
+    frames = []
+    for file in sorted(os.listdir(read_directory)):
+        if not file.endswith('.xlsx'):
+            continue
+        xl = pd.ExcelFile(os.path.join(read_directory, file))
+        for sheet_name in xl.sheet_names:
+            frames.append((file.replace('.xlsx', '').replace('_', ' '), sheet_name,
+                           xl.parse(sheet_name, engine='openpyxl')))
+    return frames
+
+
+def build_dimensions(frames):
+    """
+    Build the distinct values of every dimension table from the parsed sheets.
+
+    :param frames: List of (subcategory, type, DataFrame) tuples.
+    :return: Dictionary with the distinct brands and (subcategory, type) pairs.
+    """
+    brands = set()
+    for _, _, df in frames:
+        brands.update(df['Brand'].tolist())
+    return {
+        'brands': brands,
+        'types': {(sub, type_name) for sub, type_name, _ in frames},
+    }
+
+
+def reset_database(db_manager):
+    """
+    Drop the Unimart tables and build the schema again by applying every migration.
+
+    :param db_manager: A connected instance of the database manager.
+    :return: None
+    """
+    cur = db_manager.conn.cursor()
+    try:
+        cur.execute("DROP TABLE IF EXISTS CrawlTask, OfferPrice, PriceHistory, Article, Price, Brand, Type, "
+                    "Subcategory, Category, schema_migrations CASCADE;")
+        db_manager.conn.commit()
+    finally:
+        cur.close()
+    MigrationRunner(db_manager).migrate()
+
+
+def load_catalog(db_manager, directory):
+    """
+    Load a generated catalog into the database with the loader functions of DataAnalysisUnimart.
+
+    :param db_manager: A connected instance of the database manager.
+    :param directory: Root directory of the generated catalog.
+    :return: None
+    """
+    articles_directory = os.path.join(directory, 'Articles_by_subcategory')
+    analysis.insert_category_from_excel(db_manager, os.path.join(directory, 'MainCategories', 'Main Categories.xlsx'))
+    analysis.insert_subcategory_from_excel(
+        db_manager, os.path.join(directory, 'MainCategories', 'MainCategories_urls_subcategories'))
+    analysis.insert_brands_from_excel(db_manager, articles_directory)
+    analysis.insert_type_from_excel(db_manager, articles_directory)
+    analysis.insert_articule_from_excel(db_manager, articles_directory)
+    # Fresh statistics so the planner sees the catalog at its real size
+    cur = db_manager.conn.cursor()
+    cur.execute("ANALYZE;")
+    db_manager.conn.commit()
+    cur.close()
+
+
+def catalog_directory(args, n_articles):
+    """Return the directory of the generated catalog for a size, generating it first if needed."""
+    directory = os.path.join(args.workdir, f"catalog_{n_articles}_{args.seed}")
+    if not os.path.exists(os.path.join(directory, 'MainCategories', 'Main Categories.xlsx')):
+        generate_catalog(directory, n_articles, args.seed)
+    return directory
+
+
+def connect(args):
+    """Open a connection to the benchmark database."""
+    db_manager = analysis.DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    return db_manager
+
+
+def run_size(n_articles, args):
+    """
+    Generate (or reuse) the catalog for one size and time every stage on it.
+
+    :param n_articles: Number of articles in the catalog.
+    :param args: Parsed command line arguments.
+    :return: Dictionary with the timings of the stages in seconds and the number of prices normalised.
+    """
+    timer = StageTimer()
+    with timer.stage('generate'):
+        directory = catalog_directory(args, n_articles)
+    articles_directory = os.path.join(directory, 'Articles_by_subcategory')
+
+    with timer.stage('parse'):
+        frames = parse_workbooks(articles_directory)
+    with timer.stage('normalise'):
+        prices = [analysis.clean_price_cents(price) for _, _, df in frames for price in df['Price'].tolist()]
+    with timer.stage('dimensions'):
+        build_dimensions(frames)
+
+    if not args.skip_db:
+        db_manager = connect(args)
+        reset_database(db_manager)
+        with timer.stage('db_load'):
+            load_catalog(db_manager, directory)
+        for name, query in analysis.STATS_QUERIES.items():
+            with timer.stage('query.' + name):
+                db_manager.fetch_all(query)
+        db_manager.disconnect()
+
+    return {'articles': n_articles, 'prices_normalised': len(prices), 'stages': timer.stages}
+
+
+def scan_nodes(plan):
+    """
+    Walk an EXPLAIN (FORMAT JSON) plan and yield the scan nodes.
+
+    :param plan: A plan node.
+    :return: Generator of (node type, relation name) tuples.
+    """
+    if 'Relation Name' in plan:
+        yield plan['Node Type'], plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from scan_nodes(child)
+
+
+def index_names(plan):
+    """
+    Walk an EXPLAIN (FORMAT JSON) plan and yield the names of the indexes it reads.
+
+    :param plan: A plan node.
+    :return: Generator of index names.
+    """
+    if 'Index Name' in plan:
+        yield plan['Index Name']
+    for child in plan.get('Plans', []):
+        yield from index_names(child)
+
+
+def explain(db_manager, query):
+    """Return the root node of the EXPLAIN (FORMAT JSON) plan of a query without parameters."""
+    explained = db_manager.fetch_all("EXPLAIN (FORMAT JSON) " + query.strip().rstrip(';'))
+    return explained[0][0][0]['Plan']
+
+
+def capture_plans(db_manager):
+    """
+    Capture the scans of the plan of every statistics and foreign key drill-down query.
+
+    :param db_manager: A connected instance of the database manager.
+    :return: Dictionary of query name to a sorted list of [node type, relation name] pairs.
+    """
+    return {name: sorted(set(scan_nodes(explain(db_manager, query)))) for name, query in PLAN_QUERIES.items()}
+
+
+def plan_regressions(plans, baseline=None):
+    """
+    Find the tables that a query now reads with a sequential scan although it should use an index, either
+    because PLAN_EXPECTATIONS says so or because the baseline plan used one.
+
+    :param plans: Plans returned by `capture_plans`.
+    :param baseline: Optional plans recorded earlier with `capture_plans`.
+    :return: List of messages describing the regressions.
+    """
+    regressions = []
+    for name, scans in plans.items():
+        indexed = set(PLAN_EXPECTATIONS.get(name, []))
+        if baseline:
+            indexed |= {relation for node, relation in baseline.get(name, []) if node in INDEX_SCANS}
+        for node, relation in scans:
+            if node == 'Seq Scan' and relation in indexed:
+                regressions.append(f"{name}: sequential scan on {relation}")
+    return regressions
+
+
+def join_index_regressions(db_manager):
+    """
+    Find the foreign key joins of FK_JOIN_INDEXES that cannot be answered by their index, planning the
+    drill-down queries with sequential scans disabled.
+
+    :param db_manager: A connected instance of the database manager.
+    :return: List of messages describing the regressions.
+    """
+    regressions = []
+    cur = db_manager.conn.cursor()
+    try:
+        # SET LOCAL only lasts until the rollback below
+        cur.execute("SET LOCAL enable_seqscan = off;")
+        for name, indexes in FK_JOIN_INDEXES.items():
+            used = set(index_names(explain(db_manager, FK_JOIN_QUERIES[name])))
+            regressions.extend(f"{name}: join without {index}" for index in indexes if index not in used)
+    finally:
+        db_manager.conn.rollback()
+        cur.close()
+    return regressions
+
+
+def check_plans(args):
+    """
+    Load a generated catalog with the migrated schema, capture the plans of the statistics and foreign key
+    drill-down queries and fail if any of them regressed to a sequential scan, or if a foreign key join can
+    no longer use its index.
+
+    :param args: Parsed command line arguments.
+    :return: 1 if a plan regressed, otherwise 0.
+    """
+    directory = catalog_directory(args, args.size)
+    db_manager = connect(args)
+    reset_database(db_manager)
+    load_catalog(db_manager, directory)
+    plans = capture_plans(db_manager)
+    join_regressions = join_index_regressions(db_manager)
+    db_manager.disconnect()
+
+    for name, scans in plans.items():
+        print(f"{name}: " + ', '.join(f"{node} on {relation}" for node, relation in scans))
+    if args.record:
+        with open(args.record, 'w', encoding='utf-8') as output:
+            json.dump(plans, output, indent=2)
+        print(f"Plans written to {args.record}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = {name: [tuple(scan) for scan in scans] for name, scans in json.load(baseline_file).items()}
+    regressions = plan_regressions(plans, baseline) + join_regressions
+    for regression in regressions:
+        print("Plan regression: " + regression)
+    return 1 if regressions else 0
+
+
+def current_commit():
+    """Return the hash of the checked out commit, or None outside of a git repository."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """
+    Run the benchmark for every requested size and write the results to a JSON file.
+
+    :param args: Parsed command line arguments.
+    :return: Exit code.
+    """
+    results = {
+        'commit': current_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'results': [run_size(n, args) for n in args.sizes],
+    }
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def compare(args):
+    """
+    Compare two result files stage by stage and report the regressions.
+
+    :param args: Parsed command line arguments.
+    :return: 1 if any stage regressed beyond the threshold, otherwise 0.
+    """
+    with open(args.baseline, encoding='utf-8') as baseline_file, open(args.candidate, encoding='utf-8') as candidate_file:
+        baseline = {r['articles']: r['stages'] for r in json.load(baseline_file)['results']}
+        candidate = {r['articles']: r['stages'] for r in json.load(candidate_file)['results']}
+
+    regressed = False
+    for n_articles, stages in candidate.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(n_articles, {}).get(stage)
+            if not before or stage == 'generate':
+                continue
+            ratio = seconds / before
+            flag = ''
+            if ratio > args.threshold:
+                flag = '  <-- regression'
+                regressed = True
+            print(f"{n_articles:>9} {stage:<40} {before:>10.4f}s -> {seconds:>10.4f}s  x{ratio:.2f}{flag}")
+    return 1 if regressed else 0
+
+
+def add_database_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', default='unimart_bench')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the Unimart pipeline.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Generate synthetic catalogs and time every stage.')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--workdir', default='bench_data')
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--skip-db', action='store_true', help='Only time the stages that run in Python.')
+    add_database_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    plans_parser = subparsers.add_parser('plans', help='Fail if a statistics query plan regressed to a '
+                                                       'sequential scan on a generated catalog.')
+    plans_parser.add_argument('--size', type=int, default=100_000)
+    plans_parser.add_argument('--seed', type=int, default=0)
+    plans_parser.add_argument('--workdir', default='bench_data')
+    plans_parser.add_argument('--record', help='Write the captured plans to this JSON file.')
+    plans_parser.add_argument('--baseline', help='Plans recorded earlier with --record to compare against.')
+    add_database_arguments(plans_parser)
+    plans_parser.set_defaults(func=check_plans)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two result files.')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    compare_parser.set_defaults(func=compare)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Example: python BenchmarkUnimart.py run --sizes 10000 100000 --output before.json
+    arguments = parse_args()
+    sys.exit(arguments.func(arguments))
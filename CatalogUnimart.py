@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  Arrow-backed strings are optional, names fall back to Python strings
+    NAME_DTYPE = 'string[pyarrow]'
+except ImportError:
+    NAME_DTYPE = object
+
+SCRAPER_COLUMNS = ['Brand', 'Articule_Name', 'Price', 'Offer_Price']
+DIMENSIONS = ['Subcategory', 'Type', 'Brand']
+
+
+def price_to_cents(prices):
+    """
+    Convert scraped prices such as '₡12,345.00' to integer cents, e.g. 1234500. Missing prices become <NA>.
+
+    :param prices: Series of scraped prices.
+    :return: Series of nullable int64 cents.
+    """
+    cleaned = prices.astype(object).where(prices.notna(), None).astype(str).str.replace(r'[₡,\s]', '', regex=True)
+    amounts = pd.to_numeric(cleaned, errors='coerce')
+    return (amounts * 100).round().astype('Int64')
+
+
+def cents_to_price(cents):
+    """
+    Format integer cents the way the website shows prices, e.g. 1234500 -> '₡12,345.00'.
+
+    :param cents: Series of nullable int64 cents.
+    :return: List of formatted prices, None for missing ones.
+    """
+    return [None if pd.isna(value) else "₡{:,.2f}".format(value / 100) for value in cents]
+
+
+class CompactCatalog:
+    """
+    Column-oriented catalog with dictionary-encoded dimensions, integer prices and Arrow-backed names.
+    Subcategory, type and brand are stored once per distinct value with a small integer code per row,
+    and prices are int64 cents instead of strings, so the catalog takes a fraction of the memory of the
+    scraper DataFrames and groupbys run on integer codes.
+    """
+
+    def __init__(self, frame):
+        """
+        :param frame: DataFrame already in the compact layout; use the from_* constructors instead.
+        """
+        self.frame = frame
+
+    @classmethod
+    def from_frame(cls, df, subcategory=None, type_name=None):
+        """
+        Build a compact catalog from a DataFrame with the scraper columns
+        ('Brand', 'Articule_Name', 'Price', 'Offer_Price').
+
+        :param df: DataFrame with the scraper columns, optionally with 'Subcategory' and 'Type' columns.
+        :param subcategory: Subcategory of every row, when the DataFrame has no 'Subcategory' column.
+        :param type_name: Type of every row, when the DataFrame has no 'Type' column.
+        :return: The compact catalog.
+        """
+        subcategories = df['Subcategory'] if 'Subcategory' in df.columns else [subcategory] * len(df)
+        types = df['Type'] if 'Type' in df.columns else [type_name] * len(df)
+        offers = df['Offer_Price'] if 'Offer_Price' in df.columns else pd.Series([None] * len(df))
+        frame = pd.DataFrame({
+            'Subcategory': pd.Categorical(subcategories),
+            'Type': pd.Categorical(types),
+            'Brand': pd.Categorical(df['Brand']),
+            'Articule_Name': pd.Series(df['Articule_Name'].to_numpy(), dtype=NAME_DTYPE),
+            'Price_Cents': price_to_cents(df['Price'].reset_index(drop=True)),
+            'Offer_Price_Cents': price_to_cents(offers.reset_index(drop=True)),
+        })
+        return cls(frame)
+
+    @classmethod
+    def concat(cls, catalogs):
+        """
+        Join several compact catalogs, merging the dictionaries of their dimensions.
+
+        :param catalogs: Iterable of compact catalogs.
+        :return: The joined catalog.
+        """
+        frames = [catalog.frame for catalog in catalogs]
+        if not frames:
+            return cls.from_frame(pd.DataFrame(columns=SCRAPER_COLUMNS))
+        frame = pd.concat(frames, ignore_index=True)
+        for dimension in DIMENSIONS:
+            # pd.concat falls back to object when the categories differ, encode again with the union
+            frame[dimension] = frame[dimension].astype('category')
+        return cls(frame)
+
+    @classmethod
+    def read_excel_directory(cls, read_directory):
+        """
+        Load every sheet of the workbooks in Articles_by_subcategory into one compact catalog.
+
+        :param read_directory: Directory with one Excel file per subcategory and one sheet per type.
+        :return: The compact catalog.
+        """
+        catalogs = []
+        for file in sorted(os.listdir(read_directory)):
+            if not (file.endswith('.xlsx') or file.endswith('.xls')):
+                continue
+            subcategory = file.replace('.xlsx', '').replace('.xls', '').replace('_', ' ')
+            xl = pd.ExcelFile(os.path.join(read_directory, file))
+            for sheet_name in xl.sheet_names:
+                df = xl.parse(sheet_name, engine='openpyxl')
+                catalogs.append(cls.from_frame(df, subcategory, sheet_name))
+        return cls.concat(catalogs)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def to_frame(self):
+        """
+        Convert back to the scraper layout with prices formatted as on the website.
+
+        :return: DataFrame with 'Subcategory', 'Type', 'Brand', 'Articule_Name', 'Price' and 'Offer_Price'.
+        """
+        return pd.DataFrame({
+            'Subcategory': self.frame['Subcategory'].astype(object),
+            'Type': self.frame['Type'].astype(object),
+            'Brand': self.frame['Brand'].astype(object),
+            'Articule_Name': self.frame['Articule_Name'].astype(object),
+            'Price': cents_to_price(self.frame['Price_Cents']),
+            'Offer_Price': cents_to_price(self.frame['Offer_Price_Cents']),
+        })
+
+    def memory_usage(self):
+        """Return the memory used by the catalog in bytes."""
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def count_by(self, dimension):
+        """
+        Count the rows of each value of a dimension with a bincount over the integer codes.
+
+        :param dimension: 'Subcategory', 'Type' or 'Brand'.
+        :return: Series with the count of each value, largest first.
+        """
+        column = self.frame[dimension].cat
+        codes = column.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(column.categories))
+        return pd.Series(counts, index=column.categories, name='count').sort_values(ascending=False)
+
+    def price_stats_by(self, dimension):
+        """
+        Average, minimum and maximum price of each value of a dimension, grouped on the integer codes.
+
+        :param dimension: 'Subcategory', 'Type' or 'Brand'.
+        :return: DataFrame indexed by the dimension values with prices in colones.
+        """
+        column = self.frame[dimension].cat
+        grouped = pd.DataFrame({'code': column.codes, 'cents': self.frame['Price_Cents']}).dropna()
+        # Code -1 is a missing value, it belongs to no category
+        grouped = grouped[grouped['code'] >= 0]
+        stats = grouped.groupby('code')['cents'].agg(['count', 'mean', 'min', 'max'])
+        stats.index = column.categories[stats.index]
+        stats[['mean', 'min', 'max']] = stats[['mean', 'min', 'max']].astype(float) / 100
+        return stats.rename(columns={'mean': 'avg_price', 'min': 'min_price', 'max': 'max_price'})
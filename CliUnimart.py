@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import date, datetime
+
+import MetricsUnimart as metrics
+from StorageUnimart import BUCKET
+
+# Modules every command imports, the import guard checks they stay within their budget
+COMMAND_MODULES = {
+    'discover': ['ScrappingUnimart'],
+    'scrape': ['ScrappingUnimart'],
+    'sync-s3': ['StorageUnimart', 'boto3'],
+    'ingest': ['DataAnalysisUnimart', 'OffersUnimart'],
+    'stats': ['DataAnalysisUnimart'],
+    'report': ['DataAnalysisUnimart', 'AsyncReportUnimart', 'matplotlib.pyplot'],
+    'reextract': ['ArchiveUnimart', 'FeedUnimart'],
+    'export': ['ExportUnimart'],
+}
+# Heavy packages a command must not load because it does not use them
+FORBIDDEN_MODULES = {
+    'cli': ['selenium', 'matplotlib', 'psycopg2', 'pandas', 'boto3', 'pyarrow'],
+    'discover': ['matplotlib', 'psycopg2', 'boto3'],
+    'scrape': ['matplotlib', 'psycopg2', 'boto3'],
+    'sync-s3': ['selenium', 'matplotlib', 'psycopg2', 'pandas', 'pyarrow'],
+    'ingest': ['selenium', 'matplotlib', 'boto3'],
+    'stats': ['selenium', 'matplotlib', 'boto3'],
+    'report': ['selenium', 'boto3'],
+    'reextract': ['matplotlib', 'psycopg2', 'boto3'],
+    'export': ['selenium', 'matplotlib', 'boto3'],
+}
+# Seconds each command may spend importing its modules, well above what they take on a laptop
+IMPORT_BUDGETS = {'cli': 0.15, 'discover': 1.5, 'scrape': 1.5, 'sync-s3': 0.6, 'ingest': 1.5, 'stats': 1.5,
+                  'report': 2.5, 'reextract': 1.5, 'export': 1.5}
+ROLLUP_LEVELS = ('category', 'subcategory', 'type', 'brand', 'total')
+
+# Run in a fresh interpreter so nothing is already imported
+_IMPORT_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import CliUnimart
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'modules': sorted({name.split('.')[0] for name in sys.modules})}))
+"""
+
+
+def connect(args):
+    from DataAnalysisUnimart import DatabaseManager
+
+    db_manager = DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    return db_manager
+
+
+def make_scraper(args):
+    from ScrappingUnimart import UnimartScraper
+
+    return UnimartScraper(root_url=args.root_url, output_directory=args.output_directory,
+                          output_formats=args.formats, archive_directory=args.archive,
+                          max_pages_per_session=args.max_pages_per_session, rss_watermark_mb=args.rss_watermark_mb,
+                          driver_log=args.driver_log, page_workers=args.page_workers,
+                          request_interval=args.request_interval)
+
+
+def discover(args):
+    """Save the main categories and the subcategory URLs of every main category."""
+    scraper = make_scraper(args)
+    try:
+        scraper.discover_categories()
+    finally:
+        scraper.quit()
+
+
+def scrape(args):
+    """Scrape the articles of every collection found by `discover`."""
+    scraper = make_scraper(args)
+    try:
+        scraper.get_articule_info()
+        print('\n'.join(scraper.navigator.summary()))
+    finally:
+        scraper.quit()
+
+
+def sync_s3(args):
+    """Upload the output directory to S3."""
+    from StorageUnimart import upload_directory
+
+    print(f"{upload_directory(args.directory, args.bucket)} files uploaded")
+
+
+def ingest(args):
+    """Load the scraped Excel files, or a Parquet dataset, into the database."""
+    import DataAnalysisUnimart as analysis
+    from DeduplicationUnimart import assign_canonical_ids_in_database
+    from OffersUnimart import load_offers_from_excel
+
+    main_categories_file = args.main_categories_file or analysis.MAIN_CATEGORIES_FILE
+    urls_directory = args.urls_directory or analysis.MAIN_CATEGORIES_URLS_DIRECTORY
+    articles_directory = args.articles_directory or analysis.ARTICLES_BY_SUBCATEGORY_DIRECTORY
+
+    db_manager = connect(args)
+    try:
+        analysis.insert_category_from_excel(db_manager, main_categories_file)
+        analysis.insert_subcategory_from_excel(db_manager, urls_directory)
+        analysis.insert_brands_from_excel(db_manager, articles_directory)
+        analysis.insert_type_from_excel(db_manager, articles_directory)
+        # The prices of the loaded articles are recorded in the history on the day of the scrape
+        analysis.insert_articule_from_excel(db_manager, articles_directory, observed_on=args.observed_on)
+        # Open and close the offer periods of the scraped articles
+        print(load_offers_from_excel(db_manager, args.observed_on, articles_directory))
+        # Group the listings of the same product so counts are computed on distinct products
+        assign_canonical_ids_in_database(db_manager)
+    finally:
+        db_manager.disconnect()
+
+
+def stats(args):
+    """Print the price statistics and article counts of one level as a table, without drawing anything."""
+    import DataAnalysisUnimart as analysis
+
+    db_manager = connect(args)
+    try:
+        rollup = analysis.fetch_price_stats_rollup(db_manager)
+    finally:
+        db_manager.disconnect()
+    rows = analysis.slice_rollup(rollup, args.level, sort_by=args.sort_by, top=args.top)
+    columns = [column for column in analysis.ROLLUP_COLUMNS if column != 'level' and rows[column].notna().any()]
+    print(rows[columns].to_string(index=False))
+
+
+def report(args):
+    """Draw the charts of the analysis."""
+    if args.concurrent:
+        from AsyncReportUnimart import run_reports
+
+        run_reports(args.host, args.dbname, args.user, args.password, args.port, args.pool_size)
+        return
+    import DataAnalysisUnimart as analysis
+
+    db_manager = connect(args)
+    try:
+        # One query feeds the brand, subcategory and category charts
+        rollup = analysis.fetch_price_stats_rollup(db_manager)
+        analysis.get_article_count_by_brand(db_manager, rollup)
+        analysis.get_article_count_by_subcategory(db_manager, rollup)
+        analysis.get_price_stats_by_category(db_manager, rollup)
+        analysis.most_expensive_articles(db_manager)
+    finally:
+        db_manager.disconnect()
+
+
+def reextract(args):
+    """Extract the articles again from the pages archived by `scrape --archive`, without network."""
+    from ArchiveUnimart import PageArchive, reextract as reextract_archive
+    from FeedUnimart import ExcelSink
+
+    sinks = [ExcelSink(args.output_directory)]
+    if args.parquet:
+        from ParquetUnimart import ParquetSink
+        sinks.append(ParquetSink(args.parquet))
+    total = reextract_archive(PageArchive(args.archive), sinks, args.run, args.workers)
+    if total is not None:
+        print(f"{total} articles extracted")
+
+
+def export(args):
+    """Stream the result of a statistics or catalog query to an xlsx, CSV or Parquet file."""
+    from ExportUnimart import export_query
+
+    db_manager = connect(args)
+    try:
+        rows = export_query(db_manager, args.query, args.path, export_format=args.format, fetch_size=args.fetch_size)
+    finally:
+        db_manager.disconnect()
+    print(f"{rows} rows written to {args.path}")
+
+
+def measure_imports(command, repeat=3):
+    """
+    Measure, in fresh interpreters, the time to import this CLI and the modules of a command.
+
+    :param command: Name of the command, or 'cli' for the CLI alone.
+    :param repeat: Number of runs; the fastest one is kept, the others are mostly noise of the machine.
+    :return: Dictionary with the seconds and the top-level packages loaded.
+    """
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_PROBE, *COMMAND_MODULES.get(command, [])],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        result = json.loads(output)
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def check_imports(args):
+    """
+    Guard the startup latency: fail if a command loads a heavy package it does not use, or if importing
+    its modules takes longer than its budget.
+    """
+    failures = 0
+    for command in ['cli'] + list(COMMAND_MODULES):
+        result = measure_imports(command, args.repeat)
+        budget = IMPORT_BUDGETS[command] * args.budget_factor
+        unexpected = [name for name in FORBIDDEN_MODULES[command] if name in result['modules']]
+        ok = result['seconds'] <= budget and not unexpected
+        failures += not ok
+        print(f"{command:<10} {result['seconds']:.3f} s (budget {budget:.2f} s)"
+              f"{' imports ' + ', '.join(unexpected) if unexpected else ''} {'ok' if ok else 'FAIL'}")
+    if failures:
+        sys.exit(1)
+
+
+def add_database_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', default='unimart')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+
+
+def add_scraper_arguments(parser):
+    parser.add_argument('--root-url', help='Store to scrape instead of the Unimart website, e.g. the fixture site.')
+    parser.add_argument('--output-directory', help='Directory for the Excel files instead of the default one.')
+    parser.add_argument('--formats', nargs='+', default=['excel'], choices=['excel', 'parquet'])
+    parser.add_argument('--archive', help='Archive the HTML of every page in this directory.')
+    parser.add_argument('--max-pages-per-session', type=int, default=300,
+                        help='Pages after which the Chrome session is replaced by a fresh one.')
+    parser.add_argument('--rss-watermark-mb', type=float, default=1500,
+                        help='Memory of the Chrome session above which it is replaced.')
+    parser.add_argument('--driver-log', help='JSON lines file with the pages, memory and latencies of every session.')
+    parser.add_argument('--page-workers', type=int, default=3,
+                        help='Chrome sessions loading the pages of a collection at the same time.')
+    parser.add_argument('--request-interval', type=float, default=1.0,
+                        help='Seconds between two page requests to the store, across every session.')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape the Unimart store and analyse its articles.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    discover_parser = subparsers.add_parser('discover', help='Save the categories and subcategory URLs.')
+    add_scraper_arguments(discover_parser)
+    discover_parser.set_defaults(handler=discover)
+
+    scrape_parser = subparsers.add_parser('scrape', help='Scrape the articles of the discovered collections.')
+    add_scraper_arguments(scrape_parser)
+    scrape_parser.set_defaults(handler=scrape)
+
+    sync_parser = subparsers.add_parser('sync-s3', help='Upload a directory of results to S3.')
+    sync_parser.add_argument('directory')
+    sync_parser.add_argument('--bucket', default=BUCKET)
+    sync_parser.set_defaults(handler=sync_s3)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Load the scraped files into the database.')
+    ingest_parser.add_argument('--main-categories-file')
+    ingest_parser.add_argument('--urls-directory', help='MainCategories_urls_subcategories directory.')
+    ingest_parser.add_argument('--articles-directory', help='Articles_by_subcategory directory or Parquet dataset.')
+    ingest_parser.add_argument('--observed-on', type=date.fromisoformat, default=date.today(),
+                               help='Date the articles were scraped, for the offer history; today by default.')
+    add_database_arguments(ingest_parser)
+    ingest_parser.set_defaults(handler=ingest)
+
+    stats_parser = subparsers.add_parser('stats', help='Print price statistics and article counts.')
+    stats_parser.add_argument('--level', choices=ROLLUP_LEVELS, default='category')
+    stats_parser.add_argument('--sort-by', default='distinct_products')
+    stats_parser.add_argument('--top', type=int)
+    add_database_arguments(stats_parser)
+    stats_parser.set_defaults(handler=stats)
+
+    report_parser = subparsers.add_parser('report', help='Draw the charts of the analysis.')
+    report_parser.add_argument('--concurrent', action='store_true',
+                               help='Run the chart queries at the same time on a pool of async connections.')
+    report_parser.add_argument('--pool-size', type=int, default=4)
+    add_database_arguments(report_parser)
+    report_parser.set_defaults(handler=report)
+
+    reextract_parser = subparsers.add_parser('reextract', help='Extract the articles again from archived pages.')
+    reextract_parser.add_argument('archive', help='Directory of the page archive.')
+    reextract_parser.add_argument('output_directory', help='Articles_by_subcategory directory to write.')
+    reextract_parser.add_argument('--run', help='Run to re-extract, by default the latest one.')
+    reextract_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    reextract_parser.add_argument('--parquet', help='Also write a Parquet dataset to this directory.')
+    reextract_parser.set_defaults(handler=reextract)
+
+    export_parser = subparsers.add_parser('export', help='Export a statistics or catalog query to a file.')
+    export_parser.add_argument('query', help='Name of the query, e.g. catalog or price_stats_rollup, or a SELECT.')
+    export_parser.add_argument('path', help='File to write, .xlsx, .csv or .parquet.')
+    export_parser.add_argument('--format', choices=['xlsx', 'csv', 'parquet'],
+                               help='Format of the file, by default from its extension.')
+    export_parser.add_argument('--fetch-size', type=int, default=10000,
+                               help='Rows fetched from the database per round trip.')
+    add_database_arguments(export_parser)
+    export_parser.set_defaults(handler=export)
+
+    imports_parser = subparsers.add_parser('check-imports', help='Check the import time of every command.')
+    imports_parser.add_argument('--repeat', type=int, default=3)
+    imports_parser.add_argument('--budget-factor', type=float, default=1.0,
+                                help='Multiply the budgets, e.g. on a slow CI machine.')
+    imports_parser.set_defaults(handler=check_imports)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Optional stage timings, e.g. UNIMART_METRICS_PROMETHEUS=ingest-{run}.prom
+    metrics.configure_from_environment()
+    before = datetime.now()
+    args.handler(args)
+    print(datetime.now() - before)
+    metrics.write_reports()
@@ -1,10 +1,37 @@
 import pandas as pd
 import psycopg2
+import psycopg2.extras
 import os
-import locale
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcm
+from collections import namedtuple
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from openpyxl import load_workbook
 import numpy as np
+import MetricsUnimart as metrics
+from DeduplicationUnimart import assign_canonical_ids_in_database
+
+# For ease of development, folder paths were added statically.
+ARTICLES_BY_SUBCATEGORY_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\Articles_by_subcategory\\'
+MAIN_CATEGORIES_FILE = 'C:\\Users\\alega\\Documents\\Excels\\MainCategories\\Main Categories.xlsx'
+MAIN_CATEGORIES_URLS_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\MainCategories\\MainCategories_urls_subcategories\\'
+# Articles handed at once to the database by the streaming reader
+ARTICLE_BATCH_SIZE = 1000
+
+# Prices observed for many articles on one date, (ID_Article, price_cents, DateChanged) rows
+INSERT_PRICE_HISTORY_QUERY = "INSERT INTO PriceHistory (ID_Article, price_cents, DateChanged) VALUES %s;"
+# An article is identified by its type, brand and name (idx_article_natural_key): a load updates the prices
+# of the articles already known, so their ID_Article, price history and offers carry over from load to load
+UPSERT_ARTICLES_QUERY = """
+    INSERT INTO Article (ID_Type, ID_Brand, price_cents, offer_price_cents, article_name) VALUES %s
+    ON CONFLICT (ID_Type, COALESCE(ID_Brand, 0), article_name)
+    DO UPDATE SET price_cents = EXCLUDED.price_cents, offer_price_cents = EXCLUDED.offer_price_cents
+    RETURNING ID_Article, price_cents;
+    """
+
+# An article of a workbook with its prices in integer cents, e.g. ('Samsung', 'Galaxy A14', 12990000, None)
+ArticleRow = namedtuple('ArticleRow', ['brand', 'articule_name', 'price', 'offer_price'])
+# Up to ARTICLE_BATCH_SIZE articles of the same subcategory and type
+ArticleBatch = namedtuple('ArticleBatch', ['subcategory', 'type_name', 'rows'])
 
 
 class DatabaseManager:
@@ -86,26 +113,32 @@ class DatabaseManager:
         :param params: Optional parameters to use with the query.
         :return: List of tuples containing query results.
         """
-        self.connect()
+        # Reuse the open connection instead of opening a new one per query
+        if self.conn is None or self.conn.closed:
+            self.connect()
         cur = self.conn.cursor()
-        cur.execute(query, params or ())
-        results = cur.fetchall()
+        try:
+            with metrics.span('query'):
+                cur.execute(query, params or ())
+                results = cur.fetchall()
+        finally:
+            cur.close()
         return results
 
-    def insert_price(self, price):
+    def insert_brand1(self, brand):
         """
-        Insert a new price into the database.
+        Insert a new brand into the database.
 
-        :param price: The price value to be inserted.
+        :param brand: The name of the brand to be inserted.
         :return: None
         """
-        data = (price,)
+        data = (brand,)
         try:
             # Create a cursor for database operations
             cur = self.conn.cursor()
 
             # SQL INSERT query
-            query = "INSERT INTO Price (price) VALUES (%s);"
+            query = "INSERT INTO brand (brand_name) VALUES (%s);"
 
             # Execute the query with the provided data
             cur.execute(query, data)
@@ -122,7 +155,7 @@ class DatabaseManager:
             # Close the cursor
             cur.close()
 
-    def insert_brand1(self, brand):
+    def insert_brand(self, brand):
         """
         Insert a new brand into the database.
 
@@ -152,23 +185,24 @@ class DatabaseManager:
             # Close the cursor
             cur.close()
 
-    def insert_brand(self, brand):
+    def insert_article(self, id_type, id_brand, price_cents, article_name, offer_price_cents=None):
         """
-        Insert a new brand into the database.
+        Insert a new article with its related information into the database.
 
-        :param brand: The name of the brand to be inserted.
+        :param id_type: The ID of the article type.
+        :param id_brand: The ID of the article brand.
+        :param price_cents: The price of the article in cents.
+        :param article_name: The name of the article to be inserted.
+        :param offer_price_cents: The offer price of the article in cents, None when it is not on offer.
         :return: None
         """
-        data = (brand,)
+        data = (id_type, id_brand, price_cents, offer_price_cents, article_name,)
         try:
             # Create a cursor for database operations
             cur = self.conn.cursor()
 
-            # SQL INSERT query
-            query = "INSERT INTO brand (brand_name) VALUES (%s);"
-
-            # Execute the query with the provided data
-            cur.execute(query, data)
+            # Insert the article, or update the prices of the article of that type, brand and name
+            psycopg2.extras.execute_values(cur, UPSERT_ARTICLES_QUERY, [data])
 
             # Commit the transaction to the database
             self.conn.commit()
@@ -182,34 +216,32 @@ class DatabaseManager:
             # Close the cursor
             cur.close()
 
-    def insert_article(self, id_type, id_brand, id_price, article_name):
+    def insert_articles(self, rows):
         """
-        Insert a new article with its related information into the database.
+        Insert several articles in one statement and one transaction. Articles already known by their type,
+        brand and name keep their ID and get the new prices.
 
-        :param id_type: The ID of the article type.
-        :param id_brand: The ID of the article brand.
-        :param id_price: The ID of the article price.
-        :param article_name: The name of the article to be inserted.
-        :return: None
+        :param rows: List of (id_type, id_brand, price_cents, offer_price_cents, article_name) tuples.
+        :return: List of (id_article, price_cents) of the articles written, empty if the batch failed.
         """
-        data = (id_type, id_brand, id_price, article_name,)
+        rows = unique_articles(rows)
         try:
             # Create a cursor for database operations
             cur = self.conn.cursor()
 
-            # SQL INSERT query
-            query = "INSERT INTO article (id_type, id_brand,id_price,article_name) VALUES (%s, %s, %s, %s);"
-
-            # Execute the query with the provided data
-            cur.execute(query, data)
+            # One INSERT with a VALUES list per page of rows instead of one round trip per article
+            written = psycopg2.extras.execute_values(cur, UPSERT_ARTICLES_QUERY, rows, page_size=len(rows) or 1,
+                                                     fetch=True)
 
             # Commit the transaction to the database
             self.conn.commit()
+            return written
 
         except Exception as e:
             # In case of an error, rollback the transaction
             self.conn.rollback()
             print(f"Error: {e}")
+            return []
 
         finally:
             # Close the cursor
@@ -309,38 +341,6 @@ class DatabaseManager:
             # Close the cursor
             cur.close()
 
-    def select_id_price(self, price):
-        """
-        Fetch the ID associated with a specific price from the database.
-
-        :param price: The price value to look up.
-        :return: The ID associated with the given price, or None if not found.
-        """
-        data = (price,)
-        try:
-            # Create a cursor for database operations
-            cur = self.conn.cursor()
-
-            # SQL SELECT query
-            query = "SELECT id_price FROM price WHERE price = %s;"
-
-            # Execute the query with the provided data
-            cur.execute(query, data)
-
-            results = cur.fetchall()
-
-            if results:
-                id_price = results[0][0]
-                return id_price
-
-        except Exception as e:
-            # In case of an error, report it
-            print(f"Error: {e}")
-
-        finally:
-            # Close the cursor
-            cur.close()
-
     def select_id_brand(self, brand_name):
         """
         Fetch the ID associated with a specific brand name from the database.
@@ -353,8 +353,8 @@ class DatabaseManager:
             # Create a cursor for database operations
             cur = self.conn.cursor()
 
-            # SQL SELECT query
-            query = "SELECT id_brand FROM brand WHERE brand_name = %s;"
+            # SQL SELECT query, the first brand of that name when a repeated load inserted it again
+            query = "SELECT id_brand FROM brand WHERE brand_name = %s ORDER BY id_brand LIMIT 1;"
 
             # Execute the query with the provided data
             cur.execute(query, data)
@@ -386,7 +386,7 @@ class DatabaseManager:
             cur = self.conn.cursor()
 
             # SQL SELECT query
-            query = "SELECT id_type FROM type WHERE type_name = %s;"
+            query = "SELECT id_type FROM type WHERE type_name = %s ORDER BY id_type LIMIT 1;"
 
             # Execute the query with the provided data
             cur.execute(query, data)
@@ -418,7 +418,7 @@ class DatabaseManager:
             cur = self.conn.cursor()
 
             # SQL SELECT query
-            query = "SELECT id_subcategory FROM subcategory WHERE subcategory_name = %s;"
+            query = "SELECT id_subcategory FROM subcategory WHERE subcategory_name = %s ORDER BY id_subcategory LIMIT 1;"
 
             # Execute the query with the provided data
             cur.execute(query, data)
@@ -450,7 +450,7 @@ class DatabaseManager:
             cur = self.conn.cursor()
 
             # SQL SELECT query
-            query = "SELECT id_category FROM Category WHERE category_name = %s;"
+            query = "SELECT id_category FROM Category WHERE category_name = %s ORDER BY id_category LIMIT 1;"
 
             # Execute the query with the provided data
             cur.execute(query, data)
@@ -469,38 +469,210 @@ class DatabaseManager:
             # Close the cursor
             cur.close()
 
+    def record_price_history(self, rows, date_changed):
+        """
+        Insert the prices observed for many articles on one date into the price history,
+        creating the monthly partition for that date if it does not exist yet.
+
+        :param rows: List of (id_article, price_cents) tuples.
+        :param date_changed: Date the prices were observed.
+        :return: None
+        """
+        try:
+            # Create a cursor for database operations
+            cur = self.conn.cursor()
+
+            cur.execute("SELECT ensure_pricehistory_partition(%s);", (date_changed,))
+
+            # Insert all the rows in batches instead of one statement per row
+            psycopg2.extras.execute_values(cur, INSERT_PRICE_HISTORY_QUERY, [(id_article, price_cents, date_changed)
+                                                        for id_article, price_cents in rows], page_size=1000)
+
+            # Commit the transaction to the database
+            self.conn.commit()
+
+        except Exception as e:
+            # In case of an error, rollback the transaction
+            self.conn.rollback()
+            print(f"Error: {e}")
+
+        finally:
+            # Close the cursor
+            cur.close()
+
+    def get_article_price_series(self, id_article, start_date, end_date, bucket='day'):
+        """
+        Fetch the price trend of one article, downsampled to one point per bucket.
+
+        :param id_article: The ID of the article.
+        :param start_date: First date of the series (inclusive).
+        :param end_date: Last date of the series (exclusive).
+        :param bucket: 'day', 'week' or 'month'.
+        :return: List of (period, average price, minimum price, maximum price) tuples.
+        """
+        if bucket not in PRICE_TREND_BUCKETS:
+            raise ValueError(f"bucket must be one of {PRICE_TREND_BUCKETS}")
+        return self.fetch_all(ARTICLE_PRICE_SERIES_QUERY, (bucket, id_article, start_date, end_date))
+
+    def get_brand_median_price(self, id_brand, start_date, end_date, bucket='week'):
+        """
+        Fetch the median price of the articles of a brand per bucket.
+
+        :param id_brand: The ID of the brand.
+        :param start_date: First date of the series (inclusive).
+        :param end_date: Last date of the series (exclusive).
+        :param bucket: 'day', 'week' or 'month'.
+        :return: List of (period, median price, number of observations) tuples.
+        """
+        if bucket not in PRICE_TREND_BUCKETS:
+            raise ValueError(f"bucket must be one of {PRICE_TREND_BUCKETS}")
+        return self.fetch_all(BRAND_MEDIAN_PRICE_QUERY, (bucket, id_brand, start_date, end_date))
+
+    def get_biggest_price_movers(self, start_date, end_date, limit=10):
+        """
+        Fetch the articles whose price changed the most between two dates, comparing the first and the last
+        price recorded for each article in the range.
+
+        :param start_date: First date of the range (inclusive).
+        :param end_date: Last date of the range (inclusive).
+        :param limit: Number of articles to return.
+        :return: List of (article name, first price, last price, change, change percentage) tuples.
+        """
+        return self.fetch_all(BIGGEST_PRICE_MOVERS_QUERY, (start_date, end_date, start_date, end_date, limit))
 
-def get_article_count_by_brand(db_manager):
+    def search_articles(self, text, category=None, subcategory=None, brand=None, limit=20):
+        """
+        Search articles by a partial or misspelled brand and name, ranked by relevance, using the trigram and
+        full-text indexes on Article.search_name.
+
+        :param text: Text to search, e.g. 'xiaomi redmi 12'.
+        :param category: Optional category name to filter by.
+        :param subcategory: Optional subcategory name to filter by.
+        :param brand: Optional brand name to filter by.
+        :param limit: Maximum number of results.
+        :return: List of (article ID, article name, brand, category, subcategory, price, score) tuples.
+        """
+        params = {'text': text, 'category': category, 'subcategory': subcategory, 'brand': brand, 'limit': limit}
+        return self.fetch_all(SEARCH_ARTICLES_QUERY, params)
+
+
+# Articles are matched on "brand name" (Article.search_name), so 'xiaomi redmi 12' finds the Redmi 12 of the brand
+# Xiaomi. Among articles that contain the query equally well, the one closest to it as a whole comes first.
+SEARCH_ARTICLES_QUERY = """
+    SELECT
+        A.ID_Article,
+        A.article_name,
+        B.brand_name,
+        C.category_name,
+        S.subcategory_name,
+        A.price_cents / 100.0 AS Price,
+        GREATEST(word_similarity(search_text(%(text)s), A.search_name),
+                 ts_rank(to_tsvector('simple', A.search_name), plainto_tsquery('simple', search_text(%(text)s))))
+            AS score
+    FROM Article A
+    JOIN Type T ON A.ID_Type = T.ID_Type
+    JOIN Subcategory S ON T.ID_Subcategory = S.ID_Subcategory
+    JOIN Category C ON S.ID_Category = C.ID_Category
+    LEFT JOIN Brand B ON A.ID_Brand = B.ID_Brand
+    WHERE (search_text(%(text)s) <%% A.search_name
+           OR to_tsvector('simple', A.search_name) @@ plainto_tsquery('simple', search_text(%(text)s)))
+      AND (%(category)s IS NULL OR C.category_name = %(category)s)
+      AND (%(subcategory)s IS NULL OR S.subcategory_name = %(subcategory)s)
+      AND (%(brand)s IS NULL OR B.brand_name = %(brand)s)
+    ORDER BY score DESC, similarity(search_text(%(text)s), A.search_name) DESC
+    LIMIT %(limit)s;
     """
-    Fetch the count of articles grouped by brand from the database, returning the top 10 brands with the highest article count.
 
-    :param db_manager: An instance of the database manager or the object that provides the `fetch_all` method.
-    :return: List of tuples containing brand names and their associated article counts.
+
+# --------------------------
+# Price history trends
+# --------------------------
+# Every query filters PriceHistory on DateChanged so only the partitions of the range are scanned
+PRICE_TREND_BUCKETS = ('day', 'week', 'month')
+
+ARTICLE_PRICE_SERIES_QUERY = """
+    SELECT
+        date_trunc(%s, H.DateChanged)::date AS period,
+        AVG(H.price_cents) / 100 AS AvgPrice,
+        MIN(H.price_cents) / 100.0 AS MinPrice,
+        MAX(H.price_cents) / 100.0 AS MaxPrice
+    FROM PriceHistory H
+    WHERE H.ID_Article = %s AND H.DateChanged >= %s AND H.DateChanged < %s
+    GROUP BY period
+    ORDER BY period;
+    """
+
+BRAND_MEDIAN_PRICE_QUERY = """
+    SELECT
+        date_trunc(%s, H.DateChanged)::date AS period,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY H.price_cents) / 100 AS MedianPrice,
+        COUNT(*) AS Observations
+    FROM Article A
+    JOIN PriceHistory H ON H.ID_Article = A.ID_Article
+    WHERE A.ID_Brand = %s AND H.DateChanged >= %s AND H.DateChanged < %s
+    GROUP BY period
+    ORDER BY period;
     """
-    query = """
-    SELECT B.brand_name, COUNT(A.ID_Article) AS NumberOfArticles
+
+BIGGEST_PRICE_MOVERS_QUERY = """
+    WITH first_price AS (
+        SELECT DISTINCT ON (ID_Article) ID_Article, price_cents
+        FROM PriceHistory
+        WHERE DateChanged BETWEEN %s AND %s
+        ORDER BY ID_Article, DateChanged ASC, ID_History ASC
+    ), last_price AS (
+        SELECT DISTINCT ON (ID_Article) ID_Article, price_cents
+        FROM PriceHistory
+        WHERE DateChanged BETWEEN %s AND %s
+        ORDER BY ID_Article, DateChanged DESC, ID_History DESC
+    )
+    SELECT
+        A.article_name,
+        F.price_cents / 100.0 AS FirstPrice,
+        L.price_cents / 100.0 AS LastPrice,
+        (L.price_cents - F.price_cents) / 100.0 AS Change,
+        ROUND((L.price_cents - F.price_cents) * 100.0 / NULLIF(F.price_cents, 0), 2) AS ChangePercentage
+    FROM first_price F
+    JOIN last_price L ON F.ID_Article = L.ID_Article
+    JOIN Article A ON F.ID_Article = A.ID_Article
+    WHERE F.price_cents <> L.price_cents
+    ORDER BY ABS(L.price_cents - F.price_cents) * 1.0 / NULLIF(F.price_cents, 0) DESC
+    LIMIT %s;
+    """
+
+
+ARTICLE_COUNT_BY_BRAND_QUERY = """
+    SELECT B.brand_name, COUNT(DISTINCT COALESCE(A.ID_Canonical, A.ID_Article)) AS NumberOfArticles
     FROM Brand B
     LEFT JOIN Article A ON B.ID_Brand = A.ID_Brand
     GROUP BY B.brand_name
     ORDER BY NumberOfArticles DESC
     limit 10;
     """
-    data= db_manager.fetch_all(query)
-    plot_brand_article_count(data)
 
 
-def get_article_count_by_subcategory(db_manager):
+def get_article_count_by_brand(db_manager, rollup=None):
     """
-    Fetch the count of articles grouped by subcategory from the database, returning the top 10 subcategories with the highest article count.
+    Fetch the count of articles grouped by brand from the database, returning the top 10 brands with the highest article count.
 
     :param db_manager: An instance of the database manager or the object that provides the `fetch_all` method.
-    :return: List of tuples containing subcategory IDs, subcategory names, and their associated article counts.
+    :param rollup: Optional result of `fetch_price_stats_rollup` to slice instead of querying the database.
+    :return: List of tuples containing brand names and their associated article counts.
     """
-    query = """
+    if rollup is not None:
+        brands = slice_rollup(rollup, 'brand', sort_by='distinct_products', top=10)
+        data = list(brands[['brand_name', 'distinct_products']].itertuples(index=False, name=None))
+    else:
+        query = ARTICLE_COUNT_BY_BRAND_QUERY
+        data = db_manager.fetch_all(query)
+    plot_brand_article_count(data)
+
+
+ARTICLE_COUNT_BY_SUBCATEGORY_QUERY = """
     SELECT 
         s.ID_Subcategory,
         s.subcategory_name,
-        COUNT(a.ID_Article) AS article_count
+        COUNT(DISTINCT COALESCE(a.ID_Canonical, a.ID_Article)) AS article_count
     FROM 
         Subcategory s
     LEFT JOIN 
@@ -513,20 +685,36 @@ def get_article_count_by_subcategory(db_manager):
         article_count DESC
     limit 10;
     """
-    data= db_manager.fetch_all(query)
+
+
+def get_article_count_by_subcategory(db_manager, rollup=None):
+    """
+    Fetch the count of articles grouped by subcategory from the database, returning the top 10 subcategories with the highest article count.
+
+    :param db_manager: An instance of the database manager or the object that provides the `fetch_all` method.
+    :param rollup: Optional result of `fetch_price_stats_rollup` to slice instead of querying the database.
+    :return: List of tuples containing subcategory IDs, subcategory names, and their associated article counts.
+    """
+    if rollup is not None:
+        subcategories = slice_rollup(rollup, 'subcategory', sort_by='distinct_products', top=10)
+        data = list(subcategories[['id_subcategory', 'subcategory_name', 'distinct_products']]
+                    .itertuples(index=False, name=None))
+    else:
+        query = ARTICLE_COUNT_BY_SUBCATEGORY_QUERY
+        data = db_manager.fetch_all(query)
     plot_article_count_by_subcategory(data)
 
 
-def insert_category_from_excel(db_manager):
+def insert_category_from_excel(db_manager, file_path=MAIN_CATEGORIES_FILE):
     """
     Read categories from an Excel file and insert them into the database.
 
     :param db_manager: An instance of the database manager or the object that provides the `insert_category` method.
+    :param file_path: Path of the Excel file with the main categories.
     :return: None
     """
     # Load data from the Excel file into a pandas DataFrame
-    excel_df = pd.read_excel('C:\\Users\\alega\\Documents\\Excels\\MainCategories\\Main Categories.xlsx',
-                             engine='openpyxl')
+    excel_df = pd.read_excel(file_path, engine='openpyxl')
 
     # Iterate through each row of the DataFrame
     for index, row in excel_df.iterrows():
@@ -534,73 +722,166 @@ def insert_category_from_excel(db_manager):
         db_manager.insert_category(row['Main Categories'])
 
 
-def insert_price_from_excel(db_manager):
+def clean_price_cents(price):
     """
-    Read prices from multiple Excel files within a directory and insert unique prices into the database.
+    Convert a scraped price such as '₡12,345.00' into integer cents, as the database stores prices.
 
-    :param db_manager: An instance of the database manager or the object that provides the `insert_price` method.
-    :return: None
+    :param price: Price as it was scraped from the website.
+    :return: The price in cents, e.g. 1234500.
     """
-    # Set locale for number formatting
-    # READ_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\Ver Todo URL\\'  # An alternative path, currently commented out
-    READ_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\Articles_by_subcategory\\'
+    cleaned_price = str(price).replace("₡", "").replace(",", "").strip()
+    # Decimal instead of float so a price like 19.99 is not stored as 1998 cents
+    return int((Decimal(cleaned_price) * 100).to_integral_value(ROUND_HALF_UP))
 
-    # List all files in the directory
-    files = os.listdir(READ_DIRECTORY)
-    print(files)
 
-    # Filter out only Excel files from the list
+def iter_article_sheets(read_directory, parse=True):
+    """
+    Yield the articles of every subcategory and type, from a directory of Excel workbooks
+    (one file per subcategory, one sheet per type) or from a Parquet dataset written by ParquetUnimart.
+
+    :param read_directory: Directory with the article Excel files or the Parquet dataset.
+    :param parse: Set to False when only the subcategory and type names are needed; the sheets are then
+                  not read and None is yielded instead of their DataFrame.
+    :return: Generator of (subcategory name, type name, DataFrame with the scraper columns); the DataFrames of
+             a Parquet dataset have its price columns in cents instead (ParquetUnimart.SHEET_COLUMNS).
+    """
+    import ParquetUnimart
+    if ParquetUnimart.is_parquet_dataset(read_directory):
+        for (subcategory, type_name), fragments in ParquetUnimart.partitions(read_directory).items():
+            if not parse:
+                yield subcategory, type_name, None
+                continue
+            with metrics.span('parse'):
+                df = pd.concat([fragment.to_table(columns=ParquetUnimart.SHEET_COLUMNS).to_pandas()
+                                for fragment in fragments], ignore_index=True)
+            yield subcategory, type_name, df
+        return
+
+    files = os.listdir(read_directory)
     excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
-    collected_rows = []
 
-    # Iterate over each Excel file
     for file in excelFiles:
-        file_without_extension = file.replace(".xlsx", "")
-        print(file_without_extension)
-        full_path = os.path.join(READ_DIRECTORY, file)
+        full_path = os.path.join(read_directory, file)
         print(full_path)
-
-        # Load the Excel file
         xl = pd.ExcelFile(full_path)
 
-        # Iterate over each sheet in the Excel file
+        # The subcategory name is the file name with spaces instead of '_'
+        subcategory = file.replace(".xlsx", "").replace(".xls", "").replace("_", " ")
         for sheet_name in xl.sheet_names:
-            df = xl.parse(sheet_name, engine='openpyxl')
-
-            # Check if the sheet has a 'Price' column
-            if 'Price' in df.columns:
-                values = df['Price'].tolist()
-                collected_rows.extend(values)
-            else:
-                print(f"The file {file} does not have a 'Price' column.")
+            if not parse:
+                yield subcategory, sheet_name, None
+                continue
+            with metrics.span('parse'):
+                df = xl.parse(sheet_name, engine='openpyxl')
+            yield subcategory, sheet_name, df
+
+
+def _article_row(brand, articule_name, price, offer_price):
+    """Build an ArticleRow from the cell values of a sheet, or return None for a row without a price."""
+    if price is None or (isinstance(price, float) and pd.isna(price)):
+        return None
+    with metrics.span('normalise'):
+        price = clean_price_cents(price)
+        if offer_price is None or (isinstance(offer_price, float) and pd.isna(offer_price)):
+            offer_price = None
+        else:
+            offer_price = clean_price_cents(offer_price)
+    if isinstance(brand, float) and pd.isna(brand):
+        brand = None
+    return ArticleRow(brand, articule_name, price, offer_price)
+
+
+def iter_workbook_rows(file_path):
+    """
+    Stream the articles of a workbook sheet by sheet with openpyxl in read-only mode, so only the row being
+    read is in memory, whatever the size of the workbook.
 
-    # Remove duplicates from the collected prices and format them
-    unique_values = list(set(collected_rows))
-    for price in unique_values:
-        cleaned_price = price.replace("₡", "").replace(",", "")
-        decimal_number = locale.atof(cleaned_price)
-        formatted_number = "{:.2f}".format(decimal_number)
+    :param file_path: Path of a workbook with one sheet per type and the scraper columns.
+    :return: Generator of (sheet name, ArticleRow); rows without a price are skipped.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = {name: index for index, name in enumerate(header) if name is not None}
+            if 'Price' not in columns or 'Articule_Name' not in columns:
+                print(f"The sheet {worksheet.title} of {file_path} does not have the article columns.")
+                continue
+            indexes = [columns.get(name) for name in ('Brand', 'Articule_Name', 'Price', 'Offer_Price')]
+            for values in rows:
+                cells = [values[index] if index is not None and index < len(values) else None for index in indexes]
+                row = _article_row(*cells)
+                if row is None:
+                    continue
+                yield worksheet.title, row
+    finally:
+        # Read-only workbooks keep the file open until they are closed
+        workbook.close()
+
+
+def iter_article_batches(read_directory, batch_size=ARTICLE_BATCH_SIZE):
+    """
+    Yield the articles of every subcategory and type in batches of at most `batch_size` rows, streamed from
+    the workbooks without building a DataFrame, or read from a Parquet dataset written by ParquetUnimart.
 
-        # Use the database manager to insert each cleaned price into the database
-        db_manager.insert_price(formatted_number)
+    :param read_directory: Directory with the article Excel files or the Parquet dataset.
+    :param batch_size: Maximum number of articles of a batch.
+    :return: Generator of ArticleBatch; a batch never mixes two sheets.
+    """
+    import ParquetUnimart
+    if ParquetUnimart.is_parquet_dataset(read_directory):
+        # The dataset already stores integer cents, the rows are built without parsing any price
+        for subcategory, sheet_name, batch in ParquetUnimart.iter_sheets(read_directory, batch_size):
+            with metrics.span('parse'):
+                rows = [ArticleRow(*values) for values in zip(*(batch.column(name).to_pylist()
+                                                                 for name in ParquetUnimart.SHEET_COLUMNS))
+                        if values[2] is not None]
+            if rows:
+                yield ArticleBatch(subcategory, sheet_name, rows)
+        return
+
+    files = os.listdir(read_directory)
+    excelFiles = [f for f in files if f.endswith('.xlsx')]
 
+    for file in excelFiles:
+        full_path = os.path.join(read_directory, file)
+        print(full_path)
 
-def insert_subcategory_from_excel(db_manager):
+        # The subcategory name is the file name with spaces instead of '_'
+        subcategory = file.replace(".xlsx", "").replace("_", " ")
+        batch = ArticleBatch(subcategory, None, [])
+        rows = iter_workbook_rows(full_path)
+        while True:
+            with metrics.span('parse'):
+                item = next(rows, None)
+            if item is None or item[0] != batch.type_name or len(batch.rows) == batch_size:
+                if batch.rows:
+                    yield batch
+                if item is None:
+                    break
+                batch = ArticleBatch(subcategory, item[0], [])
+            batch.rows.append(item[1])
+
+
+def insert_subcategory_from_excel(db_manager, read_directory=MAIN_CATEGORIES_URLS_DIRECTORY):
     """
     Read subcategories from Excel files within a directory and insert them into the database,
     associating them with their main category based on the file name.
 
     :param db_manager: An instance of the database manager.
+    :param read_directory: Directory with one Excel file of subcategories and URLs per main category.
     :return: None
     """
-    READ_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\MainCategories\\MainCategories_urls_subcategories\\'
-    files = os.listdir(READ_DIRECTORY)
+    files = os.listdir(read_directory)
     print(files)
     excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
     collected_rows = []
 
     for file in excelFiles:
-        full_path = os.path.join(READ_DIRECTORY, file)
+        full_path = os.path.join(read_directory, file)
         file_without_extension = file.replace(".xlsx", "")
         df = pd.read_excel(full_path, engine='openpyxl')
         print(file_without_extension)
@@ -620,33 +901,22 @@ def insert_subcategory_from_excel(db_manager):
             print(f"Error: {e}")
 
 
-def insert_brands_from_excel(db_manager):
+def insert_brands_from_excel(db_manager, read_directory=ARTICLES_BY_SUBCATEGORY_DIRECTORY):
     """
     Read brands from multiple Excel files within a directory and insert unique brands into the database.
 
     :param db_manager: An instance of the database manager.
+    :param read_directory: Directory with the article Excel files, one file per subcategory, or a Parquet dataset.
     :return: None
     """
-    READ_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\Articles_by_subcategory\\'
-    files = os.listdir(READ_DIRECTORY)
-    excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
     collected_rows = []
 
-    for file in excelFiles:
-        file_without_extension = file.replace(".xlsx", "")
-        print(file_without_extension)
-        full_path = os.path.join(READ_DIRECTORY, file)
-        print(full_path)
-        xl = pd.ExcelFile(full_path)
-
-        for sheet_name in xl.sheet_names:
-            df = xl.parse(sheet_name, engine='openpyxl')
-
-            if 'Brand' in df.columns:
-                values = df['Brand'].tolist()
-                collected_rows.extend(values)
-            else:
-                print(f"The file {file} does not have a 'Brand' column.")
+    for subcategory, sheet_name, df in iter_article_sheets(read_directory):
+        if 'Brand' in df.columns:
+            values = df['Brand'].tolist()
+            collected_rows.extend(values)
+        else:
+            print(f"The subcategory {subcategory} does not have a 'Brand' column.")
 
     # Remove duplicates from the collected brands
     unique_values = list(set(collected_rows))
@@ -655,158 +925,259 @@ def insert_brands_from_excel(db_manager):
     db_manager.insert_brands(unique_values)
 
 
-def insert_type_from_excel(db_manager):
+def insert_type_from_excel(db_manager, read_directory=ARTICLES_BY_SUBCATEGORY_DIRECTORY):
     """
     Read types from Excel files within a directory and insert them into the database,
     associating them with their subcategory based on the file name.
 
     :param db_manager: An instance of the database manager.
+    :param read_directory: Directory with the article Excel files, one file per subcategory, or a Parquet dataset.
     :return: None
     """
-    READ_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\Articles_by_subcategory\\'
-    files = os.listdir(READ_DIRECTORY)
-    excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
+    for subcategory, sheet_name, _ in iter_article_sheets(read_directory, parse=False):
+        # Fetch the ID of the subcategory and insert the type associated with it
+        id_subcategory = db_manager.select_id_subcategory(subcategory)
+        db_manager.insert_type(id_subcategory, sheet_name)
 
-    for file in excelFiles:
-        file_without_extension = file.replace(".xlsx", "")
-        print(file_without_extension)
-        full_path = os.path.join(READ_DIRECTORY, file)
-        print(full_path)
-        xl = pd.ExcelFile(full_path)
 
-        # Convert file name to subcategory name and fetch its ID
-        subcategory = file_without_extension.replace("_", " ")
-        id_subcategory = db_manager.select_id_subcategory(subcategory)
+def unique_articles(rows):
+    """
+    Keep one row per article key (type, brand, name), the last one, as one upsert cannot update a row twice.
 
-        for sheet_name in xl.sheet_names:
-            # Insert type into the database, associating it with its subcategory
-            db_manager.insert_type(id_subcategory, sheet_name)
+    :param rows: List of (id_type, id_brand, price_cents, offer_price_cents, article_name) tuples.
+    :return: The rows without repeated keys, in their first order.
+    """
+    unique = {}
+    for row in rows:
+        unique[(row[0], row[1] or 0, row[4])] = row
+    return list(unique.values())
 
 
-def insert_articule_from_excel(db_manager):
+def insert_articule_from_excel(db_manager, read_directory=ARTICLES_BY_SUBCATEGORY_DIRECTORY,
+                               batch_size=ARTICLE_BATCH_SIZE, observed_on=None):
     """
-    Read articles from Excel files and insert them into the database.
+    Read articles from Excel files and insert them into the database, one batch of rows at a time.
 
     :param db_manager: An instance of the database manager.
+    :param read_directory: Directory with the article Excel files, one file per subcategory, or a Parquet dataset.
+    :param batch_size: Number of articles inserted at once.
+    :param observed_on: Date the articles were scraped; their prices are recorded in PriceHistory. None records nothing.
     :return: None
     """
-    READ_DIRECTORY = 'C:\\Users\\alega\\Documents\\Excels\\Articles_by_subcategory\\'
-    files = os.listdir(READ_DIRECTORY)
-    excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
+    # The same types and brands come back in every batch, look each one up only once
+    type_ids, brand_ids = {}, {}
+
+    for batch in iter_article_batches(read_directory, batch_size):
+        if batch.type_name not in type_ids:
+            type_ids[batch.type_name] = db_manager.select_id_type(batch.type_name)
+        id_type = type_ids[batch.type_name]
+
+        with metrics.span('db_load'):
+            rows = []
+            for row in batch.rows:
+                # Get the brand ID from the database, the prices are stored on the article in cents
+                if row.brand not in brand_ids:
+                    brand_ids[row.brand] = db_manager.select_id_brand(row.brand)
+                rows.append((id_type, brand_ids[row.brand], row.price, row.offer_price, row.articule_name))
+
+            # Insert the articles of the batch into the database
+            written = db_manager.insert_articles(rows)
+            if observed_on is not None:
+                prices = [row for row in written if row[1] is not None]
+                db_manager.record_price_history(prices, observed_on)
+                metrics.count('prices_recorded', len(prices))
+        metrics.count('articles_loaded', len(rows))
+
+
+PRICE_STATS_BY_SUBCATEGORY_QUERY = """
+    SELECT 
+        S.subcategory_name, 
+        AVG(A.price_cents) / 100 AS AvgPrice, 
+        MIN(A.price_cents) / 100.0 AS MinPrice, 
+        MAX(A.price_cents) / 100.0 AS MaxPrice
+    FROM Subcategory S
+    LEFT JOIN Type T ON S.ID_Subcategory = T.ID_Subcategory
+    LEFT JOIN Article A ON T.ID_Type = A.ID_Type
+    GROUP BY S.subcategory_name
+    ORDER BY AvgPrice DESC;
+    """
 
-    for file in excelFiles:
-        file_without_extension = file.replace(".xlsx", "").replace("_", " ")
-        print(f"file is  {file_without_extension}")
-        full_path = os.path.join(READ_DIRECTORY, file)
 
-        xl = pd.ExcelFile(full_path)
+def get_price_stats_by_subcategory(db_manager, rollup=None):
+    """
+    Fetch average, minimum, and maximum prices of articles grouped by their subcategories.
 
-        for sheet_name in xl.sheet_names:
-            df = xl.parse(sheet_name, engine='openpyxl')
-            id_type = db_manager.select_id_type(sheet_name)
+    :param db_manager: An instance of the database manager.
+    :param rollup: Optional result of `fetch_price_stats_rollup` to slice instead of querying the database.
+    :return: A list of tuples where each tuple contains statistics for a specific subcategory.
+    """
+    if rollup is not None:
+        subcategories = slice_rollup(rollup, 'subcategory', sort_by='avg_price')
+        return list(subcategories[['subcategory_name', 'avg_price', 'min_price', 'max_price']]
+                    .itertuples(index=False, name=None))
+    query = PRICE_STATS_BY_SUBCATEGORY_QUERY
+    return db_manager.fetch_all(query)
 
-            for index, row in df.iterrows():
-                # Get brand ID from the database
-                id_brand = db_manager.select_id_brand(row['Brand'])
-                print(f"id_brand id is  {id_brand}")
 
-                # Clean and format the price
-                cleaned_price = row['Price'].replace("₡", "").replace(",", "")
-                decimal_number = locale.atof(cleaned_price)
-                formatted_number = "{:.2f}".format(decimal_number)
+# Price statistics and article counts for every level of the Category -> Subcategory -> Type
+# hierarchy and for every brand, computed in a single scan of Article
+PRICE_STATS_ROLLUP_QUERY = """
+    SELECT
+        CASE GROUPING(C.ID_Category, S.ID_Subcategory, T.ID_Type, B.ID_Brand)
+            WHEN 1 THEN 'type'
+            WHEN 3 THEN 'subcategory'
+            WHEN 7 THEN 'category'
+            WHEN 14 THEN 'brand'
+            ELSE 'total'
+        END AS level,
+        C.ID_Category, C.category_name,
+        S.ID_Subcategory, S.subcategory_name,
+        T.ID_Type, T.type_name,
+        B.ID_Brand, B.brand_name,
+        COUNT(A.ID_Article) AS article_count,
+        COUNT(DISTINCT COALESCE(A.ID_Canonical, A.ID_Article)) AS distinct_products,
+        AVG(A.price_cents) / 100 AS avg_price,
+        MIN(A.price_cents) / 100.0 AS min_price,
+        MAX(A.price_cents) / 100.0 AS max_price
+    FROM Article A
+    JOIN Type T ON A.ID_Type = T.ID_Type
+    JOIN Subcategory S ON T.ID_Subcategory = S.ID_Subcategory
+    JOIN Category C ON S.ID_Category = C.ID_Category
+    LEFT JOIN Brand B ON A.ID_Brand = B.ID_Brand
+    GROUP BY GROUPING SETS (
+        (C.ID_Category, C.category_name),
+        (C.ID_Category, C.category_name, S.ID_Subcategory, S.subcategory_name),
+        (C.ID_Category, C.category_name, S.ID_Subcategory, S.subcategory_name, T.ID_Type, T.type_name),
+        (B.ID_Brand, B.brand_name),
+        ()
+    );
+    """
+ROLLUP_COLUMNS = ['level', 'id_category', 'category_name', 'id_subcategory', 'subcategory_name', 'id_type',
+                  'type_name', 'id_brand', 'brand_name', 'article_count', 'distinct_products', 'avg_price', 'min_price',
+                  'max_price']
 
-                # Get price ID from the database
-                id_price = db_manager.select_id_price(formatted_number)
-                print(f"id_price id is  {id_price}")
 
-                article_name = row['Articule_Name']
-                print(f"article_name is {article_name}")
+def fetch_price_stats_rollup(db_manager):
+    """
+    Fetch price statistics and article counts for categories, subcategories, types and brands in one query.
+    Each row has a 'level' column ('category', 'subcategory', 'type', 'brand' or 'total') so every chart can
+    slice the result without going back to the database.
 
-                # Insert the article into the database
-                db_manager.insert_article(id_type, id_brand, id_price, article_name)
+    :param db_manager: An instance of the database manager.
+    :return: A DataFrame with the ROLLUP_COLUMNS columns.
+    """
+    rollup = pd.DataFrame(db_manager.fetch_all(PRICE_STATS_ROLLUP_QUERY), columns=ROLLUP_COLUMNS)
+    for column in ['avg_price', 'min_price', 'max_price']:
+        rollup[column] = pd.to_numeric(rollup[column])
+    return rollup
 
 
-def get_price_stats_by_subcategory(db_manager):
+def slice_rollup(rollup, level, sort_by=None, top=None):
     """
-    Fetch average, minimum, and maximum prices of articles grouped by their subcategories.
+    Select one level of the rollup, optionally sorted in descending order and limited to the first rows.
 
-    :param db_manager: An instance of the database manager.
-    :return: A list of tuples where each tuple contains statistics for a specific subcategory.
-    """
-    query = """
-    SELECT 
-        S.subcategory_name, 
-        AVG(P.Price) AS AvgPrice, 
-        MIN(P.Price) AS MinPrice, 
-        MAX(P.Price) AS MaxPrice
-    FROM Subcategory S
-    LEFT JOIN Article A ON S.ID_Subcategory = A.ID_Subcategory
-    LEFT JOIN Price P ON A.ID_Price = P.ID_Price
-    GROUP BY S.subcategory_name
-    ORDER BY AvgPrice DESC;
+    :param rollup: The DataFrame returned by `fetch_price_stats_rollup`.
+    :param level: 'category', 'subcategory', 'type', 'brand' or 'total'.
+    :param sort_by: Optional column to sort by, in descending order.
+    :param top: Optional number of rows to keep.
+    :return: A DataFrame with the rows of the level.
     """
-    return db_manager.fetch_all(query)
+    rows = rollup[rollup['level'] == level]
+    if sort_by is not None:
+        rows = rows.sort_values(sort_by, ascending=False)
+    if top is not None:
+        rows = rows.head(top)
+    return rows.reset_index(drop=True)
 
 
 # --------------------------
 # Queries for Statistics
 # --------------------------
-def get_price_stats_by_category(db_manager):
-    """
-    Fetch average, minimum, and maximum prices of articles grouped by their main categories.
-
-    :param db_manager: An instance of the database manager.
-    :return: A list of tuples where each tuple contains statistics for a specific main category.
-    """
-    query = """
+PRICE_STATS_BY_CATEGORY_QUERY = """
     SELECT 
     C.category_name, 
-    AVG(P.Price) AS AvgPrice, 
-    MIN(P.Price) AS MinPrice, 
-    MAX(P.Price) AS MaxPrice
+    AVG(A.price_cents) / 100 AS AvgPrice, 
+    MIN(A.price_cents) / 100.0 AS MinPrice, 
+    MAX(A.price_cents) / 100.0 AS MaxPrice
 FROM Category C
 LEFT JOIN Subcategory S ON C.ID_Category = S.ID_Category
 LEFT JOIN Type T ON S.ID_Subcategory = T.ID_Subcategory
 LEFT JOIN Article A ON T.ID_Type = A.ID_Type
-LEFT JOIN Price P ON A.ID_Price = P.ID_Price
 GROUP BY C.category_name
 ORDER BY AvgPrice DESC;
     """
-    data= db_manager.fetch_all(query)
-    filtered_data = [row for row in data if not (row[1] is None and row[2] is None and row[3] is None)]
-    # # print(data)
-    plot_price_stats_by_category(filtered_data)
 
 
-def most_expensive_articles(db_manager):
+def get_price_stats_by_category(db_manager, rollup=None):
     """
-    Fetch the top 10 most expensive articles along with their prices.
+    Fetch average, minimum, and maximum prices of articles grouped by their main categories.
 
     :param db_manager: An instance of the database manager.
-    :return: A list of tuples where each tuple contains the name and price of an article.
+    :param rollup: Optional result of `fetch_price_stats_rollup` to slice instead of querying the database.
+    :return: A list of tuples where each tuple contains statistics for a specific main category.
     """
-    query = """
+    if rollup is not None:
+        categories = slice_rollup(rollup, 'category', sort_by='avg_price')
+        data = list(categories[['category_name', 'avg_price', 'min_price', 'max_price']]
+                    .itertuples(index=False, name=None))
+    else:
+        query = PRICE_STATS_BY_CATEGORY_QUERY
+        data = db_manager.fetch_all(query)
+    # # print(data)
+    plot_price_stats_by_category(without_empty_stats(data))
+
+
+def without_empty_stats(data):
+    """Drop the categories without any priced article, their average, minimum and maximum are all None."""
+    return [row for row in data if not (row[1] is None and row[2] is None and row[3] is None)]
+
+
+MOST_EXPENSIVE_ARTICLES_QUERY = """
     SELECT 
     A.article_name,
-    P.Price AS price
+    A.price_cents / 100.0 AS price
 FROM 
     Article A
-JOIN 
-    Price P ON A.ID_Price = P.ID_Price
+WHERE 
+    A.price_cents IS NOT NULL
 ORDER BY 
-    P.Price DESC
+    A.price_cents DESC
 LIMIT 10;
     """
+
+
+def most_expensive_articles(db_manager):
+    """
+    Fetch the top 10 most expensive articles along with their prices.
+
+    :param db_manager: An instance of the database manager.
+    :return: A list of tuples where each tuple contains the name and price of an article.
+    """
+    query = MOST_EXPENSIVE_ARTICLES_QUERY
     data= db_manager.fetch_all(query)
     plot_most_expensive_articles(data)
 
 
+# Statistics queries shown in the report, by name
+STATS_QUERIES = {
+    'article_count_by_brand': ARTICLE_COUNT_BY_BRAND_QUERY,
+    'article_count_by_subcategory': ARTICLE_COUNT_BY_SUBCATEGORY_QUERY,
+    'price_stats_by_category': PRICE_STATS_BY_CATEGORY_QUERY,
+    'price_stats_by_subcategory': PRICE_STATS_BY_SUBCATEGORY_QUERY,
+    'price_stats_rollup': PRICE_STATS_ROLLUP_QUERY,
+    'most_expensive_articles': MOST_EXPENSIVE_ARTICLES_QUERY,
+}
+
+
 def plot_brand_article_count(data):
     """
     Plot the number of articles for each brand.
 
     :param data: List of tuples, where each tuple contains the brand name and the respective article count.
     """
+    # matplotlib is only imported when a chart is drawn, it is slow to import
+    import matplotlib.pyplot as plt
+
     brands = [row[0] for row in data]
     counts = [row[1] for row in data]
 
@@ -839,6 +1210,8 @@ def plot_price_stats_by_category(data):
 
     :param data: List of tuples, where each tuple contains the category name, average, minimum, and maximum prices.
     """
+    import matplotlib.pyplot as plt
+
     # Get the category names
     categories = [row[0] for row in data]
     # Get average, min, and max prices
@@ -889,6 +1262,8 @@ def plot_most_expensive_articles(data):
 
     :param data: List of tuples, where each tuple contains the article name and its price.
     """
+    import matplotlib.pyplot as plt
+
 
     # Get the article names and their prices
     articles = [row[0] for row in data]
@@ -925,6 +1300,8 @@ def plot_article_count_by_subcategory(data):
 
     :param data: List of tuples, where each tuple contains the subcategory ID, subcategory name, and article count.
     """
+    import matplotlib.pyplot as plt
+
     # Get the subcategory names
     subcategories = [row[1] for row in data]
     # Get the article counts
@@ -959,16 +1336,25 @@ if __name__ == "__main__":
     PASSWORD = 'root'
     PORT = '5432'
 
+    # Optional stage timings, e.g. UNIMART_METRICS_PROMETHEUS=ingest-{run}.prom
+    metrics.configure_from_environment()
+
     db_manager = DatabaseManager(HOST, DBNAME, USER, PASSWORD, PORT)
     db_manager.connect()
     insert_category_from_excel(db_manager)
-    insert_price_from_excel(db_manager)
     insert_subcategory_from_excel(db_manager)
     insert_brands_from_excel(db_manager)
     insert_type_from_excel(db_manager)
-    insert_articule_from_excel(db_manager)
-    #get_article_count_by_brand(db_manager)
-    #get_article_count_by_subcategory(db_manager)
-    #get_price_stats_by_category(db_manager)
+    # The workbooks are the prices of today
+    insert_articule_from_excel(db_manager, observed_on=date.today())
+    # Group the listings of the same product so counts are computed on distinct products
+    assign_canonical_ids_in_database(db_manager)
+    # One query feeds the brand, subcategory and category charts
+    #rollup = fetch_price_stats_rollup(db_manager)
+    #get_article_count_by_brand(db_manager, rollup)
+    #get_article_count_by_subcategory(db_manager, rollup)
+    #get_price_stats_by_category(db_manager, rollup)
     #most_expensive_articles(db_manager)
+    # Or every chart query at once on a pool of connections: python AsyncReportUnimart.py
     db_manager.disconnect()
+    metrics.write_reports()
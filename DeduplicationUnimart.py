@@ -0,0 +1,216 @@
+import zlib
+
+import numpy as np
+import psycopg2.extras
+
+from SearchUnimart import normalize_text
+
+NUM_PERMUTATIONS = 96
+BANDS = 16  # 16 bands of 6 rows: 99% of the pairs at 0.8 similarity become candidates, 22% at 0.5
+SIMILARITY_THRESHOLD = 0.8
+SHINGLE_SIZE = 4
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_LOW_29 = (1 << 29) - 1
+
+
+class UnionFind:
+    """
+    Disjoint sets of listing positions; the representative of a set is its smallest position.
+    """
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression keeps later lookups constant time
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def shingles(name, size=SHINGLE_SIZE):
+    """
+    Hash the character shingles of a normalised name to 32-bit integers.
+
+    :param name: Name of the listing.
+    :param size: Number of characters per shingle.
+    :return: numpy array with the distinct shingle hashes.
+    """
+    text = normalize_text(name)
+    if len(text) <= size:
+        return np.asarray([zlib.crc32(text.encode())], dtype=np.uint64)
+    return np.unique(np.asarray([zlib.crc32(text[i:i + size].encode()) for i in range(len(text) - size + 1)],
+                                dtype=np.uint64))
+
+
+def _mod_mersenne(values):
+    """Reduce uint64 values modulo 2^61 - 1 without overflow, using 2^61 = 1 (mod 2^61 - 1)."""
+    values = (values & _MERSENNE_PRIME) + (values >> np.uint64(61))
+    return np.where(values >= _MERSENNE_PRIME, values - np.uint64(_MERSENNE_PRIME), values)
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures with a fixed family of seeded universal hashes (a*x + b) mod (2^61 - 1),
+    with a and b drawn over the whole field.
+    """
+
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.randint(0, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        # a = a_high * 2^32 + a_low, so each partial product of a 32-bit hash fits in 64 bits
+        self.a_high = self.a >> np.uint64(32)
+        self.a_low = self.a & np.uint64(_MAX_HASH)
+
+    def permute(self, hashes):
+        """
+        :param hashes: 32-bit hashes as uint64.
+        :return: (a*x + b) mod (2^61 - 1) for every hash (rows) and permutation (columns).
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        # a_high * x < 2^61, and y * 2^32 = (y >> 29) * 2^61 + (y mod 2^29) * 2^32 = (y >> 29) + (y mod 2^29) * 2^32
+        high = np.outer(hashes, self.a_high)
+        high = (high >> np.uint64(29)) + ((high & np.uint64(_LOW_29)) << np.uint64(32))
+        low = _mod_mersenne(np.outer(hashes, self.a_low))
+        # Three terms below 2^61 each, their sum stays below 2^63
+        return _mod_mersenne(_mod_mersenne(high) + low + self.b)
+
+    def signature(self, hashes):
+        """
+        :param hashes: Shingle hashes of one name.
+        :return: numpy array with the signature.
+        """
+        return (self.permute(hashes) & np.uint64(_MAX_HASH)).min(axis=0)
+
+
+def assign_canonical_ids(names, brands, prices, threshold=SIMILARITY_THRESHOLD, price_tolerance=0.0,
+                         num_permutations=NUM_PERMUTATIONS, bands=BANDS):
+    """
+    Group the listings of the same product and give each group a canonical id.
+
+    Listings with the same brand, normalised name and price are merged directly. The remaining distinct
+    listings are compared only when MinHash-LSH puts them in the same bucket of the same brand (and the
+    same price when prices must match exactly), so the work grows with the number of listings instead of
+    the number of pairs. A candidate pair is merged when its estimated name similarity reaches the
+    threshold and its prices match within the tolerance.
+
+    :param names: Names of the listings.
+    :param brands: Brands of the listings.
+    :param prices: Prices of the listings as numbers.
+    :param threshold: Minimum estimated Jaccard similarity of the names.
+    :param price_tolerance: Maximum relative price difference, 0 means equal prices.
+    :param num_permutations: Length of the MinHash signatures.
+    :param bands: Number of LSH bands; must divide num_permutations.
+    :return: List with the canonical id of each listing: the position of the first listing of its group.
+    """
+    total = len(names)
+    groups = UnionFind(total)
+
+    # Exact duplicates: same brand, normalised name and price
+    representatives = {}
+    for position, (name, brand, price) in enumerate(zip(names, brands, prices)):
+        key = (normalize_text(brand), normalize_text(name), price)
+        if key in representatives:
+            groups.union(representatives[key], position)
+        else:
+            representatives[key] = position
+
+    # Near duplicates among the distinct listings: MinHash-LSH blocked by brand (and price)
+    hasher = MinHasher(num_permutations)
+    rows = num_permutations // bands
+    signatures = {}
+    buckets = {}
+    for position in representatives.values():
+        signature = hasher.signature(shingles(names[position]))
+        signatures[position] = signature
+        block = (normalize_text(brands[position]), prices[position] if price_tolerance == 0 else None)
+        for band in range(bands):
+            key = (block, band, signature[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(position)
+
+    compared = set()
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                if (first, second) in compared:
+                    continue
+                compared.add((first, second))
+                first_price, second_price = prices[first], prices[second]
+                if abs(first_price - second_price) > price_tolerance * max(first_price, second_price):
+                    continue
+                if np.mean(signatures[first] == signatures[second]) >= threshold:
+                    groups.union(first, second)
+
+    return [groups.find(position) for position in range(total)]
+
+
+def deduplicate_frame(df, price_column='Price', **options):
+    """
+    Add a 'Canonical_ID' column to a DataFrame of scraped listings ('Brand', 'Articule_Name', price column),
+    so counts and statistics can be computed on distinct products, e.g. df.drop_duplicates('Canonical_ID').
+
+    :param df: DataFrame with the listings. Prices may be numbers or scraped strings like '₡12,345.00'.
+    :param price_column: Name of the price column.
+    :param options: Extra arguments for `assign_canonical_ids`.
+    :return: The DataFrame with the new column.
+    """
+    prices = [float(str(price).replace("₡", "").replace(",", "")) for price in df[price_column]]
+    df['Canonical_ID'] = assign_canonical_ids(df['Articule_Name'].tolist(), df['Brand'].tolist(), prices, **options)
+    return df
+
+
+def assign_canonical_ids_in_database(db_manager, **options):
+    """
+    Cluster every article of the database and store the canonical article of its cluster in Article.ID_Canonical.
+    The canonical article of a cluster is the one with the smallest ID.
+
+    :param db_manager: A connected instance of the database manager.
+    :param options: Extra arguments for `assign_canonical_ids`.
+    :return: Number of distinct products.
+    """
+    articles = db_manager.fetch_all("""
+        SELECT A.ID_Article, A.article_name, COALESCE(B.brand_name, ''), COALESCE(A.price_cents, 0)
+        FROM Article A
+        LEFT JOIN Brand B ON A.ID_Brand = B.ID_Brand
+        ORDER BY A.ID_Article;
+    """)
+    ids = [row[0] for row in articles]
+    canonical = assign_canonical_ids([row[1] for row in articles], [row[2] for row in articles],
+                                     [float(row[3]) for row in articles], **options)
+
+    try:
+        # Create a cursor for database operations
+        cur = db_manager.conn.cursor()
+
+        # Update every article in batches with a single statement per page
+        query = """
+            UPDATE Article SET ID_Canonical = v.id_canonical
+            FROM (VALUES %s) AS v(id_article, id_canonical)
+            WHERE Article.ID_Article = v.id_article;
+        """
+        psycopg2.extras.execute_values(cur, query, [(ids[i], ids[c]) for i, c in enumerate(canonical)],
+                                       page_size=5000)
+
+        # Commit the transaction to the database
+        db_manager.conn.commit()
+
+    except Exception as e:
+        # In case of an error, rollback the transaction
+        db_manager.conn.rollback()
+        print(f"Error: {e}")
+
+    finally:
+        # Close the cursor
+        cur.close()
+
+    return len(set(canonical))
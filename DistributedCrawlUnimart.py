@@ -0,0 +1,496 @@
+import argparse
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+
+import psycopg2.extras
+
+import DataAnalysisUnimart as analysis
+import MetricsUnimart as metrics
+from FrontierUnimart import build_frontier
+from NavigationUnimart import RESET_TIMEOUT, RetryPolicy
+from PaginationUnimart import REQUEST_INTERVAL
+from PipelineUnimart import BulkArticleWriter, page_rows
+
+# The lease is renewed after every step of a page, so it only has to outlast the longest step: a page load or
+# wait through all of its attempts, plus one wait for the circuit of the host to close
+LEASE_SECONDS = math.ceil(RetryPolicy().max_duration()) + RESET_TIMEOUT
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 2
+LOCAL_DBNAME = 'unimart_bench'  # database reset by local
+SCRATCH_DATABASE_MARKERS = ('bench', 'scratch', 'test')  # names of databases local may reset without --reset
+
+CLAIM_QUERY = """
+    UPDATE CrawlTask
+    SET status = 'leased', leased_by = %(node)s, attempts = attempts + 1,
+        lease_expires = now() + make_interval(secs => %(lease_seconds)s), started_at = now()
+    WHERE ID_Task IN (
+        SELECT ID_Task FROM CrawlTask
+        WHERE run_id = %(run_id)s
+          AND attempts < %(max_attempts)s
+          AND (status = 'pending' OR (status = 'leased' AND lease_expires < now()))
+        ORDER BY ID_Task
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING ID_Task, kind, subcategory_name, label, url, other_labels;
+    """
+
+# Tasks whose last lease expired after the maximum number of attempts are not claimed again
+FAIL_EXPIRED_QUERY = """
+    UPDATE CrawlTask
+    SET status = 'failed', error = COALESCE(error, 'lease expired')
+    WHERE run_id = %(run_id)s AND status = 'leased' AND lease_expires < now() AND attempts >= %(max_attempts)s;
+    """
+
+COMPLETE_QUERY = """
+    UPDATE CrawlTask
+    SET status = 'done', finished_at = now(), products = %(products)s, lease_expires = NULL
+    WHERE ID_Task = %(id_task)s AND leased_by = %(node)s AND status = 'leased';
+    """
+
+RENEW_QUERY = """
+    UPDATE CrawlTask
+    SET lease_expires = now() + make_interval(secs => %(lease_seconds)s)
+    WHERE ID_Task = %(id_task)s AND leased_by = %(node)s AND status = 'leased';
+"""
+
+RELEASE_QUERY = """
+    UPDATE CrawlTask
+    SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'pending' END,
+        lease_expires = NULL, error = %(error)s
+    WHERE ID_Task = %(id_task)s AND leased_by = %(node)s AND status = 'leased';
+    """
+
+ENQUEUE_QUERY = """
+    INSERT INTO CrawlTask (run_id, kind, subcategory_name, label, url, other_labels) VALUES %s
+    ON CONFLICT (run_id, subcategory_name, label, url) DO NOTHING
+    RETURNING ID_Task;
+    """
+
+NODE_THROUGHPUT_QUERY = """
+    SELECT
+        leased_by AS node,
+        COUNT(*) AS pages,
+        SUM(products) AS products,
+        EXTRACT(EPOCH FROM MAX(finished_at) - MIN(started_at)) AS seconds,
+        COUNT(*) * 60 / NULLIF(EXTRACT(EPOCH FROM MAX(finished_at) - MIN(started_at)), 0) AS pages_per_minute
+    FROM CrawlTask
+    WHERE run_id = %s AND status = 'done'
+    GROUP BY leased_by
+    ORDER BY leased_by;
+    """
+
+
+class CrawlQueue:
+    """
+    Work queue of the pages of one crawl run, shared by every node through the CrawlTask table.
+    """
+
+    def __init__(self, db_manager, run_id, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        """
+        :param db_manager: A connected instance of the database manager.
+        :param run_id: Identifier of the crawl run.
+        :param lease_seconds: Time a node keeps a claimed page before other nodes may claim it again.
+        :param max_attempts: Number of claims after which a page is marked as failed.
+        """
+        self.db_manager = db_manager
+        self.run_id = run_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _execute(self, query, params, fetch=False):
+        try:
+            # Create a cursor for database operations
+            cur = self.db_manager.conn.cursor()
+            cur.execute(query, params)
+            rows = cur.fetchall() if fetch else cur.rowcount
+
+            # Commit the transaction to the database
+            self.db_manager.conn.commit()
+            return rows
+
+        except Exception:
+            # In case of an error, rollback the transaction
+            self.db_manager.conn.rollback()
+            raise
+
+        finally:
+            # Close the cursor
+            cur.close()
+
+    def enqueue(self, cur, kind, tasks):
+        """
+        Add pages to the queue with an open cursor; pages already queued in this run are ignored.
+
+        :param cur: Cursor of the transaction the pages are added in.
+        :param kind: 'collection' for the first page of a collection, 'page' for the following ones.
+        :param tasks: List of (subcategory, label, url, other labels) tuples, the other labels being the other
+                      (subcategory, label) pairs the collection is listed under.
+        :return: Number of pages added.
+        """
+        if not tasks:
+            return 0
+        rows = [(self.run_id, kind, subcategory, label, url, psycopg2.extras.Json(other_labels))
+                for subcategory, label, url, other_labels in tasks]
+        return len(psycopg2.extras.execute_values(cur, ENQUEUE_QUERY, rows, fetch=True))
+
+    def seed(self, collections):
+        """
+        Queue the first page of every collection, once per canonical URL: a collection listed under several
+        labels is crawled once and its articles are written under every label.
+
+        :param collections: Iterable of (subcategory, label, url) tuples.
+        :return: Number of collections added.
+        """
+        tasks = [(subcategory, label, url, other_labels)
+                 for url, ((subcategory, label), *other_labels) in build_frontier(collections)]
+        cur = self.db_manager.conn.cursor()
+        try:
+            added = self.enqueue(cur, 'collection', tasks)
+            self.db_manager.conn.commit()
+            return added
+        except Exception:
+            self.db_manager.conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def claim(self, node, limit=1):
+        """
+        Lease the next pending pages, or pages whose lease expired. Rows being claimed by other nodes
+        are skipped instead of waited for, so nodes never block each other.
+
+        :param node: Name of the claiming node.
+        :param limit: Maximum number of pages to claim.
+        :return: List of (id_task, kind, subcategory, label, url, other labels) tuples.
+        """
+        params = {'node': node, 'run_id': self.run_id, 'lease_seconds': self.lease_seconds,
+                  'max_attempts': self.max_attempts, 'limit': limit}
+        self._execute(FAIL_EXPIRED_QUERY, params)
+        return [(*task[:5], [tuple(pair) for pair in task[5]])
+                for task in self._execute(CLAIM_QUERY, params, fetch=True)]
+
+    def complete(self, cur, id_task, node, products, next_url=None, subcategory=None, label=None, other_labels=()):
+        """
+        Mark a page as done and queue the page after it, in the transaction of the cursor.
+
+        :param cur: Cursor of the transaction that writes the articles of the page.
+        :param id_task: ID of the task.
+        :param node: Name of the node holding the lease.
+        :param products: Number of articles scraped from the page.
+        :param next_url: URL of the next page of the collection, if any.
+        :param subcategory: Subcategory of the next page.
+        :param label: Label of the next page.
+        :param other_labels: Other (subcategory, label) pairs of the next page.
+        :return: False if the node lost its lease, in which case nothing must be written.
+        """
+        cur.execute(COMPLETE_QUERY, {'id_task': id_task, 'node': node, 'products': products})
+        if cur.rowcount == 0:
+            return False
+        if next_url is not None:
+            self.enqueue(cur, 'page', [(subcategory, label, next_url, list(other_labels))])
+        return True
+
+    def renew(self, id_task, node):
+        """
+        Extend the lease of a page the node is still working on.
+
+        :param id_task: ID of the task.
+        :param node: Name of the node holding the lease.
+        :return: False if the node lost its lease, in which case the page must be abandoned.
+        """
+        return self._execute(RENEW_QUERY, {'id_task': id_task, 'node': node,
+                                           'lease_seconds': self.lease_seconds}) == 1
+
+    def release(self, id_task, node, error):
+        """
+        Give a page back to the queue after a failure, or mark it as failed after the last attempt.
+
+        :param id_task: ID of the task.
+        :param node: Name of the node holding the lease.
+        :param error: Description of the failure.
+        """
+        self._execute(RELEASE_QUERY, {'id_task': id_task, 'node': node, 'error': error[:1000],
+                                      'max_attempts': self.max_attempts})
+
+    def is_drained(self):
+        """Return True when no page of the run is pending or leased."""
+        rows = self.db_manager.fetch_all(
+            "SELECT COUNT(*) FROM CrawlTask WHERE run_id = %s AND status IN ('pending', 'leased');", (self.run_id,))
+        return rows[0][0] == 0
+
+    def status_counts(self):
+        """Return the number of pages of the run in every status."""
+        return dict(self.db_manager.fetch_all(
+            "SELECT status, COUNT(*) FROM CrawlTask WHERE run_id = %s GROUP BY status;", (self.run_id,)))
+
+    def node_throughput(self):
+        """Return (node, pages, products, seconds, pages per minute) for every node of the run."""
+        return self.db_manager.fetch_all(NODE_THROUGHPUT_QUERY, (self.run_id,))
+
+
+class CrawlWorker:
+    """
+    A crawl node: claims pages from the shared queue, scrapes them with its own browser and writes their
+    articles to the database in the same transaction that marks the page as done.
+    """
+
+    def __init__(self, scraper, db_manager, run_id, node=None, lease_seconds=LEASE_SECONDS,
+                 max_attempts=MAX_ATTEMPTS):
+        """
+        :param scraper: An instance of UnimartScraper; its sinks are replaced by the worker.
+        :param db_manager: A connected instance of the database manager, used only by this worker.
+        :param run_id: Identifier of the crawl run.
+        :param node: Name of the node, by default the host name and process ID.
+        """
+        self.scraper = scraper
+        self.node = node or f"{socket.gethostname()}-{os.getpid()}"
+        self.queue = CrawlQueue(db_manager, run_id, lease_seconds, max_attempts)
+        # Each page records its prices with its articles, so a page committed once is recorded once
+        self.writer = BulkArticleWriter(db_manager, shared=True, observed_on=date.today())
+        self.rows = []
+        self.scraper.row_sinks = [self.collect]
+
+    def collect(self, df, subcategory, label):
+        self.rows.extend(page_rows(df, subcategory, label))
+
+    def process(self, task):
+        """
+        Scrape one page and commit its articles, unless another node took over the lease meanwhile. The lease
+        is renewed after loading and after reading the page, so a slow page keeps it.
+
+        :param task: (id_task, kind, subcategory, label, url, other labels) tuple returned by `CrawlQueue.claim`.
+        :return: True if the articles were written.
+        """
+        id_task, _, subcategory, label, url, other_labels = task
+        self.rows = []
+        self.scraper.load_page(url)
+        if not self.queue.renew(id_task, self.node):
+            return self.lease_lost(url)
+        next_url = self.scraper.scrape_current_page(subcategory, label, other_labels)
+        # The rows of the page are collected once for every label
+        products = len(self.rows) // (1 + len(other_labels))
+        if not self.queue.renew(id_task, self.node):
+            return self.lease_lost(url)
+
+        with metrics.span('db_load'):
+            written = self.writer.write(self.rows, guard=lambda cur: self.queue.complete(
+                cur, id_task, self.node, products, next_url, subcategory, label, other_labels))
+        if not written:
+            return self.lease_lost(url)
+        metrics.count('articles_loaded', len(self.rows))
+        return True
+
+    def lease_lost(self, url):
+        print(f"Lease lost on {url}, the page is left to the node that claimed it again")
+        metrics.count('leases_lost')
+        return False
+
+    def run(self):
+        """
+        Process pages until no page of the run is pending or leased by any node.
+
+        :return: Number of pages processed by this node.
+        """
+        processed = 0
+        while True:
+            tasks = self.queue.claim(self.node)
+            if not tasks:
+                # Pages leased by other nodes may still add the pages after them
+                if self.queue.is_drained():
+                    return processed
+                time.sleep(POLL_SECONDS)
+                continue
+            for task in tasks:
+                try:
+                    if self.process(task):
+                        processed += 1
+                except Exception as e:
+                    print(f"Error: {e}")
+                    self.queue.release(task[0], self.node, str(e))
+
+
+def seed_run(scraper, db_manager, run_id):
+    """
+    Discover the categories, load them into the database and queue every collection of the run, once per
+    canonical URL.
+
+    :param scraper: An instance of UnimartScraper.
+    :param db_manager: A connected instance of the database manager.
+    :param run_id: Identifier of the crawl run.
+    :return: Number of collections queued.
+    """
+    scraper.discover_categories()
+    analysis.insert_category_from_excel(
+        db_manager, scraper.OUTPUT_DIRECTORY + scraper.MAIN_CATEGORIES_SUBFOLDER + scraper.MAIN_CATEGORIES_TITLE + '.xlsx')
+    analysis.insert_subcategory_from_excel(db_manager, scraper.MAIN_CATEGORIES_URLS_SUBCATEGORIES)
+    # The queue and the database use subcategory names with spaces, as the Excel loaders do
+    collections = [(subcategory.replace('_', ' '), label, url)
+                   for subcategory, label, url in scraper.iter_collection_urls()]
+    return CrawlQueue(db_manager, run_id).seed(collections)
+
+
+def print_report(crawl_queue):
+    """Print the status of the run and the throughput of every node."""
+    counts = crawl_queue.status_counts()
+    print(' '.join(f"{status}={counts.get(status, 0)}" for status in ('pending', 'leased', 'done', 'failed')))
+    for node, pages, products, seconds, pages_per_minute in crawl_queue.node_throughput():
+        print(f"  {node:<32} {pages:>6} pages {products or 0:>8} products "
+              f"{float(seconds or 0):>8.1f} s {float(pages_per_minute or 0):>8.1f} pages/min")
+
+
+def watch(crawl_queue, interval=10):
+    """
+    Report the progress of a run until every page is done or failed.
+
+    :param crawl_queue: Queue of the run.
+    :param interval: Seconds between reports.
+    """
+    while not crawl_queue.is_drained():
+        print_report(crawl_queue)
+        time.sleep(interval)
+    print_report(crawl_queue)
+
+
+def make_scraper(args, output_directory=None):
+    """Create a scraper for the store of the command line, without delays when --no-delays is given."""
+    from ScrappingUnimart import UnimartScraper
+
+    # Pages served by the fixture site need no spacing
+    scraper = UnimartScraper(root_url=args.root_url, output_directory=output_directory or args.output_directory,
+                             request_interval=0 if args.no_delays else REQUEST_INTERVAL)
+    if args.no_delays:
+        # Menus rendered on the server, e.g. by the fixture site, have nothing to wait for
+        scraper.MENU_OPEN_DELAY = scraper.MENU_CLOSE_DELAY = 0
+    return scraper
+
+
+def connect(args):
+    db_manager = analysis.DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    return db_manager
+
+
+def worker_command(args, node):
+    """Arguments to start a worker process with the same store and database as this process."""
+    command = [sys.executable, os.path.abspath(__file__), 'worker', '--run-id', args.run_id, '--node', node,
+               '--lease-seconds', str(args.lease_seconds), '--host', args.host, '--dbname', args.dbname,
+               '--user', args.user, '--password', args.password, '--port', args.port]
+    if args.root_url:
+        command += ['--root-url', args.root_url]
+    if args.no_delays:
+        command.append('--no-delays')
+    return command
+
+
+def is_scratch_database(dbname):
+    """Whether a database only holds disposable data, e.g. unimart_bench, so `local` may reset it."""
+    return any(marker in dbname.lower() for marker in SCRATCH_DATABASE_MARKERS)
+
+
+def run_local(args):
+    """
+    Crawl the fixture site with several worker processes on this machine and check that every product
+    was loaded exactly once.
+    """
+    from BenchmarkUnimart import reset_database
+    from FixtureSiteUnimart import FixtureCatalog, FixtureSite
+
+    site = FixtureSite(FixtureCatalog(args.products, args.page_size), args.latency, '127.0.0.1', 0).start()
+    args.root_url, args.no_delays = site.url, True
+    db_manager = connect(args)
+    reset_database(db_manager)
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        scraper = make_scraper(args, output_directory)
+        queued = seed_run(scraper, db_manager, args.run_id)
+        scraper.quit()
+    print(f"{queued} collections queued for run {args.run_id}")
+
+    start = time.perf_counter()
+    workers = [subprocess.Popen(worker_command(args, f"node-{i + 1}")) for i in range(args.workers)]
+    watch(CrawlQueue(db_manager, args.run_id), args.interval)
+    for process in workers:
+        process.wait()
+    elapsed = time.perf_counter() - start
+
+    loaded = db_manager.fetch_all("SELECT COUNT(*) FROM Article;")[0][0]
+    print(f"{args.workers} workers: {site.pages_served} pages in {elapsed:.1f} s, "
+          f"{loaded} articles loaded for {args.products} products")
+    db_manager.disconnect()
+    site.stop()
+    if loaded != args.products:
+        sys.exit(1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Distributed crawl of Unimart through a shared Postgres queue.')
+    parser.add_argument('command', choices=['seed', 'worker', 'watch', 'report', 'local'])
+    parser.add_argument('--run-id', default=None, help='Identifier of the crawl run, new for seed and local.')
+    parser.add_argument('--node', help='Name of this worker, by default the host name and process ID.')
+    parser.add_argument('--lease-seconds', type=int, default=LEASE_SECONDS)
+    parser.add_argument('--root-url', help='Store to scrape, e.g. the fixture site.')
+    parser.add_argument('--output-directory', help='Directory for the category workbooks of seed.')
+    parser.add_argument('--no-delays', action='store_true',
+                        help='Skip the menu delays of the scraper and the spacing of its page requests.')
+    parser.add_argument('--interval', type=int, default=10, help='Seconds between progress reports.')
+    parser.add_argument('--workers', type=int, default=3, help='Worker processes started by local.')
+    parser.add_argument('--products', type=int, default=2000, help='Products of the fixture site of local.')
+    parser.add_argument('--page-size', type=int, default=24)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', help=f"Database of the queue, 'unimart' by default and {LOCAL_DBNAME} for local.")
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+    parser.add_argument('--reset', action='store_true',
+                        help='Let local reset a database whose name is not a bench or scratch name.')
+    args = parser.parse_args(argv)
+    if args.dbname is None:
+        args.dbname = LOCAL_DBNAME if args.command == 'local' else 'unimart'
+    # local drops every Unimart table, never do it to the real catalog by accident
+    if args.command == 'local' and not args.reset and not is_scratch_database(args.dbname):
+        parser.error(f"local resets database '{args.dbname}'; use a bench or scratch database or pass --reset")
+    if args.run_id is None:
+        if args.command not in ('seed', 'local'):
+            parser.error('--run-id is required')
+        args.run_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    metrics.configure_from_environment()
+
+    if args.command == 'local':
+        run_local(args)
+    elif args.command == 'seed':
+        db_manager = connect(args)
+        scraper = make_scraper(args)
+        print(f"{seed_run(scraper, db_manager, args.run_id)} collections queued for run {args.run_id}")
+        scraper.quit()
+        db_manager.disconnect()
+    elif args.command == 'worker':
+        db_manager = connect(args)
+        scraper = make_scraper(args)
+        worker = CrawlWorker(scraper, db_manager, args.run_id, args.node, args.lease_seconds)
+        print(f"{worker.node}: {worker.run()} pages")
+        scraper.quit()
+        db_manager.disconnect()
+    else:
+        db_manager = connect(args)
+        crawl_queue = CrawlQueue(db_manager, args.run_id)
+        if args.command == 'watch':
+            watch(crawl_queue, args.interval)
+        else:
+            print_report(crawl_queue)
+        db_manager.disconnect()
+
+    metrics.write_reports()
@@ -0,0 +1,213 @@
+import json
+from datetime import datetime
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+import MetricsUnimart as metrics
+
+MAX_PAGES_PER_SESSION = 300  # pages a browser session serves before it is replaced by a fresh one
+RSS_WATERMARK_MB = 1500  # memory of chromedriver and its Chrome processes that triggers a restart
+RSS_CHECK_EVERY = 5  # pages between two measurements of the memory of the session
+
+
+def chrome_factory(headless=True):
+    """
+    Build the function that starts the Chrome sessions of the scraper.
+
+    :param headless: Run Chrome without a visible window.
+    :return: Function returning a new WebDriver.
+    """
+    def start():
+        chrome_options = Options()
+        if headless:
+            chrome_options.add_argument("--headless")
+        return webdriver.Chrome(options=chrome_options)
+    return start
+
+
+def session_rss_mb(driver):
+    """
+    Resident memory of a session: the chromedriver process and every Chrome process it started.
+
+    :param driver: The WebDriver.
+    :return: Memory in MB, or None if the processes cannot be inspected.
+    """
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return None
+    total = 0
+    for child in processes:
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            # A renderer can exit between listing the processes and reading their memory
+            continue
+    return total / (1024 * 1024)
+
+
+class DriverSession:
+    """
+    Statistics of one browser session, from its start until it is recycled, replaced or quit.
+    """
+
+    def __init__(self, number, driver):
+        self.number = number
+        self.driver = driver
+        self.started_at = datetime.now()
+        self.pages = 0
+        self.latency = metrics.LatencyHistogram()
+        self.rss_start_mb = session_rss_mb(driver)
+        self.rss_max_mb = self.rss_start_mb
+        self.rss_last_mb = self.rss_start_mb
+
+    def as_dict(self, reason):
+        rss = {name: round(value, 1) if value is not None else None for name, value in
+               (('rss_start_mb', self.rss_start_mb), ('rss_max_mb', self.rss_max_mb),
+                ('rss_end_mb', self.rss_last_mb))}
+        return {'session': self.number, 'started_at': self.started_at.isoformat(timespec='seconds'),
+                'ended_at': datetime.now().isoformat(timespec='seconds'), 'reason': reason, 'pages': self.pages,
+                **rss, 'p50_seconds': self.latency.quantile(0.5), 'p90_seconds': self.latency.quantile(0.9),
+                'max_seconds': round(self.latency.max, 3)}
+
+
+class DriverManager:
+    """
+    Owns the browser session of the scraper. The session is replaced by a fresh one after a number of
+    pages or when its memory crosses a watermark, at the next safe point between two pages, and at once
+    when it stops answering. Every session is logged with its pages, memory and page-load latencies.
+    """
+
+    def __init__(self, factory=None, max_pages=MAX_PAGES_PER_SESSION, rss_watermark_mb=RSS_WATERMARK_MB,
+                 rss_check_every=RSS_CHECK_EVERY, log_path=None):
+        """
+        :param factory: Function returning a new WebDriver, by default `chrome_factory()`.
+        :param max_pages: Pages after which the session is recycled, None to never recycle on pages.
+        :param rss_watermark_mb: Memory in MB above which the session is recycled, None to ignore memory.
+        :param rss_check_every: Pages between two memory measurements.
+        :param log_path: Optional JSON lines file where every ended session is appended.
+        """
+        self.factory = factory or chrome_factory()
+        self.max_pages = max_pages
+        self.rss_watermark_mb = rss_watermark_mb
+        self.rss_check_every = rss_check_every
+        self.log_path = log_path
+        self.on_start = []  # functions called with every new driver, e.g. to set its timeouts
+        self.sessions = []  # dictionaries of the ended sessions
+        self.session = None
+        self.recycle_reason = None
+        self.start()
+
+    @property
+    def driver(self):
+        return self.session.driver
+
+    def start(self):
+        """Start a new session."""
+        number = len(self.sessions) + 1
+        driver = self.factory()
+        for callback in self.on_start:
+            callback(driver)
+        self.session = DriverSession(number, driver)
+        self.recycle_reason = None
+        metrics.count('driver_sessions')
+
+    def _end(self, reason):
+        try:
+            self.session.driver.quit()
+        except Exception as e:
+            # A crashed session cannot be quit cleanly, its processes are gone or going
+            print(f"Error: session {self.session.number} did not quit: {e}")
+        ended = self.session.as_dict(reason)
+        self.sessions.append(ended)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(json.dumps(ended) + '\n')
+        metrics.count(f'driver_{reason}')
+
+    def replace(self, reason):
+        """End the current session and start a new one."""
+        self._end(reason)
+        self.start()
+
+    def add_start_callback(self, callback):
+        """Call a function with the current driver and with every driver started later."""
+        self.on_start.append(callback)
+        callback(self.driver)
+
+    def record_page(self, seconds):
+        """
+        Record a page loaded by the current session and decide whether the session must be recycled.
+
+        :param seconds: Time the page took to load.
+        """
+        session = self.session
+        session.pages += 1
+        session.latency.observe(seconds)
+        if self.max_pages is not None and session.pages >= self.max_pages:
+            self.recycle_reason = 'recycled_pages'
+        if self.rss_watermark_mb is not None and session.pages % self.rss_check_every == 0:
+            rss = session_rss_mb(session.driver)
+            if rss is not None:
+                session.rss_last_mb = rss
+                session.rss_max_mb = max(session.rss_max_mb or 0.0, rss)
+                if rss >= self.rss_watermark_mb:
+                    self.recycle_reason = 'recycled_memory'
+
+    def maybe_recycle(self):
+        """
+        Recycle the session if it served its pages or uses too much memory. Call it only between two
+        pages, the new session starts on a blank page.
+
+        :return: True if the session was recycled.
+        """
+        if self.recycle_reason is None:
+            return False
+        self.replace(self.recycle_reason)
+        return True
+
+    def is_healthy(self):
+        """Return True if the session still answers commands."""
+        try:
+            self.driver.execute_script('return 1;')
+            return True
+        except Exception:
+            return False
+
+    def ensure_healthy(self):
+        """
+        Replace the session if it crashed.
+
+        :return: True if the session was replaced.
+        """
+        if self.is_healthy():
+            return False
+        print(f"Session {self.session.number} is not answering, starting a new one")
+        self.replace('crashed')
+        return True
+
+    def quit(self):
+        """End the current session for good."""
+        if self.session is not None:
+            self._end('quit')
+            self.session = None
+
+    def summary(self):
+        """
+        One line per session with its pages, memory and latencies.
+
+        :return: List of lines of text.
+        """
+        lines = []
+        for session in self.sessions:
+            rss = (f"rss {session['rss_start_mb']} -> max {session['rss_max_mb']} MB"
+                   if session['rss_max_mb'] is not None else "rss unknown")
+            p50 = session['p50_seconds']
+            lines.append(f"session {session['session']}: {session['pages']} pages, {rss}, "
+                         f"p50 {p50 if p50 is None else round(p50, 2)} s, max {session['max_seconds']} s, "
+                         f"ended {session['reason']}")
+        return lines
+
@@ -0,0 +1,267 @@
+import argparse
+import csv
+import os
+import uuid
+from datetime import timezone
+
+from openpyxl import Workbook
+
+import MetricsUnimart as metrics
+from DataAnalysisUnimart import STATS_QUERIES, DatabaseManager
+
+EXCEL_MAX_ROWS = 1048576  # rows of an Excel sheet, the header included
+FETCH_SIZE = 10000  # rows fetched from the server-side cursor per round trip
+FORMATS = ('xlsx', 'csv', 'parquet')
+# PostgreSQL type OIDs of the columns that need a conversion or an explicit Parquet type
+INTEGER_TYPES = {20, 21, 23}  # int8, int2, int4
+FLOAT_TYPES = {700, 701, 1700}  # float4, float8, numeric
+BOOLEAN_TYPE = 16
+DATE_TYPE = 1082
+TIMESTAMP_TYPE = 1114
+TIMESTAMPTZ_TYPE = 1184
+
+# Every article with its hierarchy, brand and prices, one row per listing
+CATALOG_QUERY = """
+    SELECT
+        C.category_name,
+        S.subcategory_name,
+        T.type_name,
+        B.brand_name,
+        A.ID_Article,
+        COALESCE(A.ID_Canonical, A.ID_Article) AS ID_Product,
+        A.article_name,
+        A.price_cents / 100.0 AS price,
+        A.offer_price_cents / 100.0 AS offer_price
+    FROM Article A
+    JOIN Type T ON A.ID_Type = T.ID_Type
+    JOIN Subcategory S ON T.ID_Subcategory = S.ID_Subcategory
+    JOIN Category C ON S.ID_Category = C.ID_Category
+    LEFT JOIN Brand B ON A.ID_Brand = B.ID_Brand
+    ORDER BY A.ID_Article;
+    """
+
+# Queries that can be exported by name, the statistics of the charts and the raw catalog
+EXPORT_QUERIES = dict(STATS_QUERIES, catalog=CATALOG_QUERY)
+
+
+def stream_query(db_manager, query, params=None, fetch_size=FETCH_SIZE):
+    """
+    Run a query with a server-side cursor, so the rows stay on the server until they are read.
+
+    :param db_manager: A connected instance of the database manager.
+    :param query: The SQL query.
+    :param params: Optional parameters of the query.
+    :param fetch_size: Number of rows fetched per round trip.
+    :return: (column names, column type OIDs, generator of lists of at most fetch_size rows).
+    """
+    # A named cursor is declared on the server, only fetch_size rows are in memory at once
+    cur = db_manager.conn.cursor(name=f'export_{uuid.uuid4().hex}')
+    cur.itersize = fetch_size
+    try:
+        with metrics.span('query'):
+            cur.execute(query, params or ())
+            first = cur.fetchmany(fetch_size)
+        columns = [column.name for column in cur.description]
+        types = [column.type_code for column in cur.description]
+    except Exception:
+        cur.close()
+        db_manager.conn.rollback()
+        raise
+
+    def batches():
+        try:
+            batch = first
+            while batch:
+                yield batch
+                with metrics.span('query'):
+                    batch = cur.fetchmany(fetch_size)
+        finally:
+            cur.close()
+            # The cursor lived in a read transaction, end it
+            db_manager.conn.rollback()
+
+    return columns, types, batches()
+
+
+class XlsxExport:
+    """
+    Writes rows to a write-only workbook, which streams every row to disk. A sheet that reaches the Excel
+    row limit is continued in a new sheet with the same header.
+    """
+
+    def __init__(self, path, columns, types, sheet_name='Export', max_rows=EXCEL_MAX_ROWS):
+        self.path = path
+        self.columns = columns
+        self.sheet_name = sheet_name[:28]  # leaves room for the number of the sheet in the 31 characters allowed
+        self.max_rows = max_rows
+        # Excel has no time zones, timestamps with one are written in UTC without it
+        self.timezone_columns = [index for index, type_code in enumerate(types) if type_code == TIMESTAMPTZ_TYPE]
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self.sheet = None
+        self.sheet_rows = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        title = self.sheet_name if self.sheets == 1 else f'{self.sheet_name}_{self.sheets}'
+        self.sheet = self.workbook.create_sheet(title)
+        self.sheet.append(self.columns)
+        self.sheet_rows = 1
+
+    def write(self, rows):
+        for row in rows:
+            if self.sheet_rows == self.max_rows:
+                self._new_sheet()
+            if self.timezone_columns:
+                row = list(row)
+                for index in self.timezone_columns:
+                    if row[index] is not None:
+                        row[index] = row[index].astimezone(timezone.utc).replace(tzinfo=None)
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class CsvExport:
+    """Writes rows to a UTF-8 CSV file with a header, readable by Excel thanks to the byte order mark."""
+
+    def __init__(self, path, columns, types):
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExport:
+    """
+    Writes rows to a Parquet file, one row group per batch, with the column types taken from the query
+    so every batch has the same schema even when a column of the first one is all empty.
+    """
+
+    def __init__(self, path, columns, types):
+        # pyarrow is only needed for this format
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(name, self.arrow_type(type_code)) for name, type_code in zip(columns, types)])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def arrow_type(self, type_code):
+        pa = self.pa
+        if type_code in INTEGER_TYPES:
+            return pa.int64()
+        if type_code in FLOAT_TYPES:
+            # Prices come as numeric, doubles are what the analysis tools read
+            return pa.float64()
+        if type_code == BOOLEAN_TYPE:
+            return pa.bool_()
+        if type_code == DATE_TYPE:
+            return pa.date32()
+        if type_code == TIMESTAMP_TYPE:
+            return pa.timestamp('us')
+        if type_code == TIMESTAMPTZ_TYPE:
+            return pa.timestamp('us', tz='UTC')
+        return pa.string()
+
+    def write(self, rows):
+        arrays = []
+        for index, field in enumerate(self.schema):
+            values = [row[index] for row in rows]
+            if self.pa.types.is_floating(field.type):
+                values = [float(value) if value is not None else None for value in values]
+            elif self.pa.types.is_string(field.type):
+                values = [str(value) if value is not None else None for value in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORTERS = {'xlsx': XlsxExport, 'csv': CsvExport, 'parquet': ParquetExport}
+
+
+def resolve_format(path, export_format=None):
+    """Return the format of an export, given or taken from the extension of its file."""
+    export_format = export_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}', use one of {FORMATS}")
+    return export_format
+
+
+def write_export(path, columns, types, batches, export_format=None):
+    """
+    Write batches of rows to a file, one batch in memory at a time.
+
+    :param path: Path of the file.
+    :param columns: Names of the columns.
+    :param types: PostgreSQL type OIDs of the columns.
+    :param batches: Iterable of lists of rows.
+    :param export_format: 'xlsx', 'csv' or 'parquet', by default taken from the extension of the file.
+    :return: Number of rows written.
+    """
+    exporter = EXPORTERS[resolve_format(path, export_format)](path, columns, types)
+    total = 0
+    try:
+        for rows in batches:
+            with metrics.span('export_write'):
+                exporter.write(rows)
+            total += len(rows)
+            metrics.count('rows_exported', len(rows))
+    finally:
+        with metrics.span('export_write'):
+            exporter.close()
+    return total
+
+
+def export_query(db_manager, query, path, params=None, export_format=None, fetch_size=FETCH_SIZE):
+    """
+    Export the whole result of a query to an xlsx, CSV or Parquet file in constant memory.
+
+    :param db_manager: A connected instance of the database manager.
+    :param query: The SQL query, or the name of a query of EXPORT_QUERIES.
+    :param path: Path of the file.
+    :param params: Optional parameters of the query.
+    :param export_format: 'xlsx', 'csv' or 'parquet', by default taken from the extension of the file.
+    :param fetch_size: Number of rows fetched per round trip.
+    :return: Number of rows written.
+    """
+    query = EXPORT_QUERIES.get(query, query)
+    columns, types, batches = stream_query(db_manager, query, params, fetch_size)
+    return write_export(path, columns, types, batches, export_format)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Export the result of a statistics or catalog query.')
+    parser.add_argument('query', help=f"One of {', '.join(EXPORT_QUERIES)}, or a SELECT statement.")
+    parser.add_argument('path', help='File to write, .xlsx, .csv or .parquet.')
+    parser.add_argument('--format', choices=FORMATS, help='Format of the file, by default from its extension.')
+    parser.add_argument('--fetch-size', type=int, default=FETCH_SIZE)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', default='unimart')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    metrics.configure_from_environment()
+    db_manager = DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    try:
+        print(f"{export_query(db_manager, args.query, args.path, export_format=args.format, fetch_size=args.fetch_size)}"
+              f" rows written to {args.path}")
+    finally:
+        db_manager.disconnect()
+    metrics.write_reports()
@@ -0,0 +1,48 @@
+import pandas as pd
+from lxml import html as lxml_html
+
+import MetricsUnimart as metrics
+
+COLUMNS = ['Brand', 'Articule_Name', 'Price', 'Offer_Price']
+# XPath for the main content div containing article details on the website
+DIV_WITH_ARTICLES = (
+    "//*[contains(@class, 'boost-pfs-filter-products') and "
+    "contains(@class, 'boost-pfs-filter-product-item-layout-no-border') and "
+    "contains(@class, 'boost-pfs-filter-product-item-label-top_left') and "
+    "contains(@class, 'boost-pfs-filter-product-item-swatch_color_display_type_image_product') and "
+    "contains(@class, 'boost-pfs-filter-swatch-shape-circle') and "
+    "contains(@class, 'boost-pfs-filter-product-item-text-alignment-left')]"
+)
+# XPath for the bottom of every product of the grid: its brand and name links and its prices
+PRODUCT_BOTTOM_INNER = './/div[contains(@class, "boost-pfs-filter-product-bottom-inner")]'
+PRODUCT_BOTTOM = './/div[contains(@class, "boost-pfs-filter-product-bottom")]'
+MONEY = './/span[contains(concat(" ", normalize-space(@class), " "), " money ")]'
+
+
+def _text(element):
+    """Text of an element with the whitespace collapsed, as the browser shows it."""
+    return ' '.join(element.text_content().split())
+
+
+def extract_articles(page_html):
+    """
+    Extract the articles of a collection page from its HTML. The scraper runs it on the page source of the
+    browser and `ArchiveUnimart.reextract` on the archived pages, so both always extract the same fields.
+
+    :param page_html: HTML of the page.
+    :return: DataFrame with the 'Brand', 'Articule_Name', 'Price' and 'Offer_Price' columns.
+    """
+    document = lxml_html.fromstring(page_html)
+    grids = document.xpath(DIV_WITH_ARTICLES)
+    rows = []
+    if grids:
+        elements = grids[0].xpath(PRODUCT_BOTTOM_INNER) or grids[0].xpath(PRODUCT_BOTTOM)
+        for element in elements:
+            links = element.xpath('.//a')
+            money = element.xpath(MONEY)
+            if len(links) < 2 or not money:
+                metrics.count('products_skipped')
+                continue
+            offer = _text(money[1]) if len(money) > 1 else None
+            rows.append([_text(links[0]), _text(links[1]), _text(money[0]), offer])
+    return pd.DataFrame(rows, columns=COLUMNS)
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+import pandas as pd
+
+import MetricsUnimart as metrics
+from FrontierUnimart import build_frontier
+from ScrappingUnimart import UnimartScraper, iter_collection_urls
+
+FEED_PAGE_SIZE = 250  # largest page the Shopify products.json endpoint returns
+WORKERS = 4  # collections fetched at the same time
+REQUEST_DELAY = 0.5  # seconds between two requests of the same worker
+TIMEOUT = 30
+USER_AGENT = 'UnimartScrapping-Analytics feed adapter'
+COLUMNS = ['Brand', 'Articule_Name', 'Price', 'Offer_Price']
+
+
+def collection_handle(url):
+    """
+    Extract the handle of a collection URL, e.g. 'https://www.unimart.com/collections/audio?page=2' -> 'audio'.
+
+    :param url: URL of the collection, as found in the menu.
+    :return: The handle, or None if the URL is not a collection.
+    """
+    parts = [part for part in urlparse(url).path.split('/') if part]
+    if len(parts) >= 2 and parts[-2] == 'collections':
+        return parts[-1]
+    return None
+
+
+def format_price(amount):
+    """Format a Shopify price such as '12345.00' the way the website shows it, e.g. '₡12,345.00'."""
+    return "₡{:,.2f}".format(float(amount))
+
+
+def products_to_frame(products):
+    """
+    Map Shopify products to the rows the browser scraper produces. A variant on sale has its sale price
+    in 'price' and the regular price in 'compare_at_price', which the website shows first.
+
+    :param products: List of products of a products.json page.
+    :return: DataFrame with the 'Brand', 'Articule_Name', 'Price' and 'Offer_Price' columns.
+    """
+    rows = []
+    for product in products:
+        if not product.get('variants'):
+            continue
+        variant = product['variants'][0]
+        price, compare_at = variant.get('price'), variant.get('compare_at_price')
+        if compare_at and float(compare_at) > float(price):
+            rows.append([product.get('vendor'), product.get('title'), format_price(compare_at), format_price(price)])
+        else:
+            rows.append([product.get('vendor'), product.get('title'), format_price(price), None])
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+class ShopifyFeed:
+    """
+    Reads the products of the store collections from the Shopify products.json endpoints instead of
+    rendering the HTML pages in a browser.
+    """
+
+    def __init__(self, root_url=UnimartScraper.ROOT_URL, page_size=FEED_PAGE_SIZE, workers=WORKERS,
+                 request_delay=REQUEST_DELAY, timeout=TIMEOUT):
+        """
+        :param root_url: Root URL of the store; collection URLs of another host are read from this one.
+        :param page_size: Products per request, at most 250.
+        :param workers: Number of collections fetched at the same time.
+        :param request_delay: Seconds each worker waits between two requests, to stay polite.
+        :param timeout: Seconds before a request is abandoned.
+        """
+        self.root_url = root_url
+        self.page_size = page_size
+        self.workers = workers
+        self.request_delay = request_delay
+        self.timeout = timeout
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def page_url(self, handle, page):
+        return urljoin(self.root_url, f"collections/{handle}/products.json?limit={self.page_size}&page={page}")
+
+    def fetch_page(self, handle, page):
+        """
+        Fetch one page of a collection.
+
+        :param handle: Handle of the collection.
+        :param page: Number of the page, starting at 1.
+        :return: List of products.
+        """
+        request = urllib.request.Request(self.page_url(handle, page), headers={'User-Agent': USER_AGENT,
+                                                                               'Accept': 'application/json'})
+        with metrics.span('page_fetch'):
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read()
+        with self._lock:
+            self.bytes_read += len(data)
+        metrics.count('pages')
+        metrics.count('feed_bytes', len(data))
+        return json.loads(data)['products']
+
+    def read_collection(self, handle):
+        """
+        Read every page of a collection, until a page comes back shorter than the page size.
+
+        :param handle: Handle of the collection.
+        :return: List of DataFrames, one per page.
+        """
+        frames = []
+        page = 1
+        while True:
+            products = self.fetch_page(handle, page)
+            if products:
+                with metrics.span('extraction'):
+                    frames.append(products_to_frame(products))
+                metrics.count('products', len(products))
+            if len(products) < self.page_size:
+                return frames
+            page += 1
+            time.sleep(self.request_delay)
+
+    def scrape(self, collections, sinks):
+        """
+        Read the collections concurrently and hand every page to the sinks, in the calling thread so the
+        sinks never run concurrently. A collection listed under several labels is read once and written
+        under each of them.
+
+        :param collections: Iterable of (subcategory, label, url) tuples, e.g. from `iter_collection_urls`.
+        :param sinks: Callables receiving (dataframe, subcategory, label), like the scraper sinks.
+        :return: Number of products read.
+        """
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+            for url, labels in build_frontier(collections):
+                handle = collection_handle(url)
+                if handle is None:
+                    print(f"Not a collection: {url}")
+                    continue
+                futures[executor.submit(self.read_collection, handle)] = (labels, url)
+
+            for future in as_completed(futures):
+                labels, url = futures[future]
+                try:
+                    frames = future.result()
+                except Exception as e:
+                    print(f"Error: {url}: {e}")
+                    metrics.count('collections_failed')
+                    continue
+                for subcategory, label in labels:
+                    print(f"Processing: {subcategory} - {label} - {url}")
+                    with metrics.span('sink_write'):
+                        for df in frames:
+                            for sink in sinks:
+                                sink(df, subcategory, label)
+                total += sum(len(df) for df in frames)
+
+        for sink in sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+        return total
+
+
+class ExcelSink:
+    """
+    Sink that appends the pages to the Articles_by_subcategory workbooks, like the browser scraper does.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, df, subcategory, label):
+        UnimartScraper.save_to_excel(df, os.path.join(self.directory, subcategory + '.xlsx'), label)
+
+
+def record(feed, collections, directory):
+    """
+    Save the products.json pages of the collections, e.g. of the real store, to replay them in the
+    fixture site without network access.
+
+    :param feed: The Shopify feed.
+    :param collections: Iterable of (subcategory, label, url) tuples.
+    :param directory: Directory where '<handle>/page-<n>.json' files are written.
+    :return: Number of pages recorded.
+    """
+    recorded = 0
+    for _, _, url in collections:
+        handle = collection_handle(url)
+        if handle is None or os.path.isdir(os.path.join(directory, handle)):
+            continue
+        os.makedirs(os.path.join(directory, handle))
+        page = 1
+        while True:
+            products = feed.fetch_page(handle, page)
+            with open(os.path.join(directory, handle, f'page-{page}.json'), 'w', encoding='utf-8') as output:
+                json.dump({'products': products}, output, ensure_ascii=False)
+            recorded += 1
+            if len(products) < feed.page_size:
+                break
+            page += 1
+            time.sleep(feed.request_delay)
+    return recorded
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Read the Unimart collections from the Shopify JSON feed.')
+    parser.add_argument('command', choices=['scrape', 'record'])
+    parser.add_argument('urls_directory', help='MainCategories_urls_subcategories directory with the collections.')
+    parser.add_argument('output_directory', help='Articles_by_subcategory directory, or the recordings directory.')
+    parser.add_argument('--root-url', default=UnimartScraper.ROOT_URL)
+    parser.add_argument('--page-size', type=int, default=FEED_PAGE_SIZE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--request-delay', type=float, default=REQUEST_DELAY)
+    parser.add_argument('--parquet', help='Also write a Parquet dataset to this directory.')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    metrics.configure_from_environment()
+    before = datetime.now()
+
+    feed = ShopifyFeed(args.root_url, args.page_size, args.workers, args.request_delay)
+    collections = list(iter_collection_urls(args.urls_directory))
+    if args.command == 'record':
+        print(f"{record(feed, collections, args.output_directory)} pages recorded")
+    else:
+        sinks = [ExcelSink(args.output_directory)]
+        if args.parquet:
+            from ParquetUnimart import ParquetSink
+            sinks.append(ParquetSink(args.parquet))
+        print(f"{feed.scrape(collections, sinks)} products read")
+    print(f"{feed.bytes_read} bytes read in {datetime.now() - before}")
+    metrics.write_reports()
@@ -0,0 +1,516 @@
+import argparse
+import html
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from BenchmarkUnimart import CATALOG_TREE, KNOWN_BRANDS, PRODUCT_WORDS, OFFER_PROBABILITY, format_price, type_names
+
+# Classes of the product grid and pagination, copied from the boost-pfs markup of the real store
+PRODUCTS_GRID_CLASS = ('boost-pfs-filter-products boost-pfs-filter-product-item-layout-no-border '
+                       'boost-pfs-filter-product-item-label-top_left '
+                       'boost-pfs-filter-product-item-swatch_color_display_type_image_product '
+                       'boost-pfs-filter-swatch-shape-circle boost-pfs-filter-product-item-text-alignment-left')
+PAGINATION_CLASS = 'boost-pfs-filter-bottom-pagination boost-pfs-filter-bottom-pagination-default'
+SUBCATEGORY_DIV_CLASS = 'grid__item large--one-fifth medium--one-whole no_middle_align mt30'
+# Temporary categories that the scraper leaves out, they are always the last two of the menu
+TEMPORARY_CATEGORIES = ['Regalos', 'Ofertas']
+
+MENU_SCRIPT = """
+document.querySelectorAll('#AccessibleNav [data-link]').forEach(function (link) {
+  link.closest('li').addEventListener('click', function (event) {
+    event.preventDefault();
+    var panel = document.getElementById(link.getAttribute('data-link'));
+    panel.style.display = panel.style.display === 'none' ? 'block' : 'none';
+  });
+});
+"""
+
+
+def slugify(text):
+    """
+    Build the collection handle of a label the way Shopify does, e.g. 'Línea Blanca 1' -> 'linea-blanca-1'.
+
+    :param text: Label of the collection.
+    :return: The handle.
+    """
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', ascii_text.lower()).strip('-')
+
+
+class FixtureCatalog:
+    """
+    A synthetic catalog with the category menu and the collections of the Unimart store.
+    """
+
+    def __init__(self, n_products=2000, page_size=24, seed=0):
+        """
+        Generate the catalog.
+
+        :param n_products: Total number of products distributed across the collections.
+        :param page_size: Number of products rendered on each collection page.
+        :param seed: Seed for the random generator so the same catalog is produced on every run.
+        """
+        rng = random.Random(seed)
+        self.page_size = page_size
+        self.menu = {}  # category -> subcategory -> list of (label, handle)
+        self.collections = {}  # handle -> list of products
+
+        handles = []
+        for category, subcategories in CATALOG_TREE.items():
+            self.menu[category] = {}
+            for subcategory in subcategories:
+                labels = ['Ver Todo ' + subcategory] + type_names(subcategory)
+                self.menu[category][subcategory] = [(label, slugify(label)) for label in labels]
+                handles.extend(slugify(label) for label in labels[1:])
+
+        for i, handle in enumerate(handles):
+            size = n_products // len(handles) + (1 if i < n_products % len(handles) else 0)
+            self.collections[handle] = [self._product(rng, handle, k) for k in range(size)]
+
+        # "Ver Todo" collections list every product of their subcategory
+        for subcategories in self.menu.values():
+            for links in subcategories.values():
+                self.collections[links[0][1]] = [p for _, handle in links[1:] for p in self.collections[handle]]
+
+    @staticmethod
+    def _product(rng, handle, index):
+        brand = rng.choice(KNOWN_BRANDS)
+        amount = round(rng.lognormvariate(10.3, 1.0), -2) + 900
+        offer = round(amount * rng.uniform(0.6, 0.95), -2) if rng.random() < OFFER_PROBABILITY else None
+        return {
+            'handle': f"{handle}-{index}",
+            'vendor': brand,
+            'title': f"{brand} {rng.choice(PRODUCT_WORDS)} {rng.randint(1, 999)}",
+            'price': amount,
+            'offer': offer,
+        }
+
+    def page_count(self, handle):
+        """Return the number of pages of a collection."""
+        return max(1, -(-len(self.collections[handle]) // self.page_size))
+
+    def page(self, handle, page):
+        """Return the products rendered on one page of a collection."""
+        start = (page - 1) * self.page_size
+        return self.collections[handle][start:start + self.page_size]
+
+
+def render_root(catalog):
+    """
+    Render the home page with the AccessibleNav menu and its data-link mega-menu panels.
+
+    :param catalog: The fixture catalog.
+    :return: HTML of the page.
+    """
+    items, panels = [], []
+    categories = list(catalog.menu) + TEMPORARY_CATEGORIES
+    for i, category in enumerate(categories):
+        data_link = f"megamenu-{i + 1}"
+        items.append(f'<li class="site-nav--has-dropdown"><a href="#" class="site-nav__link" '
+                     f'data-link="{data_link}">{html.escape(category)}</a></li>')
+        columns = []
+        for subcategory, links in catalog.menu.get(category, {}).items():
+            anchors = ''.join(f'<li><a href="/collections/{handle}">{html.escape(label)}</a></li>'
+                              for label, handle in links)
+            columns.append(f'<div class="{SUBCATEGORY_DIV_CLASS}"><a href="/collections/{links[0][1]}">'
+                           f'{html.escape(subcategory)}</a><ul>{anchors}</ul></div>')
+        panels.append(f'<div id="{data_link}" class="mega-menu" style="display: none;">'
+                      f'<div class="grid">{"".join(columns)}</div></div>')
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Unimart</title></head><body>'
+            f'<nav id="AccessibleNav"><ul class="site-nav">{"".join(items)}</ul></nav>'
+            f'{"".join(panels)}<script>{MENU_SCRIPT}</script></body></html>')
+
+
+def render_collection(catalog, handle, page):
+    """
+    Render one page of a collection with the boost-pfs product grid and pagination.
+
+    :param catalog: The fixture catalog.
+    :param handle: Handle of the collection.
+    :param page: Number of the page, starting at 1.
+    :return: HTML of the page.
+    """
+    products = []
+    for product in catalog.page(handle, page):
+        prices = f'<span class="money">{format_price(product["price"])}</span>'
+        if product['offer'] is not None:
+            prices += (f' <span class="boost-pfs-filter-product-item-sale-price">'
+                       f'<span class="money">{format_price(product["offer"])}</span></span>')
+        products.append(
+            '<div class="boost-pfs-filter-product-item"><div class="boost-pfs-filter-product-bottom">'
+            '<div class="boost-pfs-filter-product-bottom-inner">'
+            f'<a class="boost-pfs-filter-product-item-vendor" href="#">{html.escape(product["vendor"])}</a>'
+            f'<a class="boost-pfs-filter-product-item-title" href="/products/{product["handle"]}">'
+            f'{html.escape(product["title"])}</a>'
+            f'<p class="boost-pfs-filter-product-item-price">{prices}</p></div></div></div>')
+
+    last = catalog.page_count(handle)
+    pages = ''.join(
+        f'<li class="{"boost-pfs-filter-pagination-active" if n == page else ""}">'
+        f'<a href="/collections/{handle}?page={n}">{n}</a></li>' for n in range(1, last + 1))
+    previous_class = 'boost-pfs-filter-pagination-disabled' if page == 1 else ''
+    next_class = 'boost-pfs-filter-pagination-disabled' if page == last else ''
+    display = 'display: block;' if last > 1 else 'display: none;'
+    pagination = (f'<div class="{PAGINATION_CLASS}" style="{display}"><ul class="boost-pfs-filter-pagination">'
+                  f'<li class="{previous_class}"><a href="/collections/{handle}?page={max(page - 1, 1)}">←</a></li>'
+                  f'{pages}<li class="{next_class}"><a href="/collections/{handle}?page={min(page + 1, last)}">→</a>'
+                  f'</li></ul></div>')
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Unimart</title></head><body>'
+            f'<span class="boost-pfs-filter-total-product">{len(catalog.collections[handle])} productos</span>'
+            f'<div class="{PRODUCTS_GRID_CLASS}">{"".join(products)}</div>{pagination}</body></html>')
+
+
+def render_products_json(catalog, handle, page, limit):
+    """
+    Render one page of a collection as the Shopify products.json endpoint does. A product on sale has its
+    sale price in 'price' and the regular price in 'compare_at_price'.
+
+    :param catalog: The fixture catalog.
+    :param handle: Handle of the collection.
+    :param page: Number of the page, starting at 1.
+    :param limit: Products per page.
+    :return: JSON of the page.
+    """
+    products = []
+    for product in catalog.collections[handle][(page - 1) * limit:page * limit]:
+        on_sale = product['offer'] is not None
+        products.append({
+            'handle': product['handle'],
+            'title': product['title'],
+            'vendor': product['vendor'],
+            'product_type': handle,
+            'variants': [{
+                'title': 'Default Title',
+                'price': f"{product['offer'] if on_sale else product['price']:.2f}",
+                'compare_at_price': f"{product['price']:.2f}" if on_sale else None,
+                'available': True,
+            }],
+        })
+    return json.dumps({'products': products}, ensure_ascii=False)
+
+
+def write_collection_workbooks(catalog, base_url, directory):
+    """
+    Write the MainCategories_urls_subcategories workbooks of the fixture menu, as the category discovery
+    of the scraper does, so modes that do not discover the categories can run.
+
+    :param catalog: The fixture catalog.
+    :param base_url: Root URL of the fixture site.
+    :param directory: Directory for the workbooks.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for category, subcategories in catalog.menu.items():
+        columns = {}
+        for subcategory, links in subcategories.items():
+            columns[subcategory] = pd.Series([label for label, _ in links])
+            columns[subcategory + '_url'] = pd.Series([f"{base_url}collections/{handle}" for _, handle in links])
+        pd.DataFrame(columns).to_excel(os.path.join(directory, category + '.xlsx'), sheet_name=category[:31],
+                                       index=False)
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the home page, robots.txt and the collection pages of the fixture catalog.
+    """
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        time.sleep(fixture.latency)
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split('/') if part]
+
+        if not parts:
+            self.respond(render_root(fixture.catalog))
+        elif parts == ['robots.txt']:
+            self.respond('User-agent: *\nAllow: /\n', 'text/plain')
+        elif len(parts) == 2 and parts[0] == 'collections' and parts[1] in fixture.catalog.collections:
+            page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+            fixture.count(pages=1, products=len(fixture.catalog.page(parts[1], page)))
+            self.respond(render_collection(fixture.catalog, parts[1], page))
+        elif len(parts) == 3 and parts[0] == 'collections' and parts[2] == 'products.json':
+            query = parse_qs(parsed.query)
+            page = int(query.get('page', ['1'])[0])
+            limit = min(int(query.get('limit', ['30'])[0]), 250)
+            recorded = fixture.recorded_products(parts[1])
+            if recorded is not None:
+                # Past the last recorded product the collection is empty, as on the store
+                products = recorded[(page - 1) * limit:page * limit]
+                fixture.count(pages=1, products=len(products))
+                self.respond(json.dumps({'products': products}, ensure_ascii=False), 'application/json')
+            elif parts[1] in fixture.catalog.collections:
+                fixture.count(pages=1, products=len(fixture.catalog.collections[parts[1]][(page - 1) * limit:
+                                                                                        page * limit]))
+                self.respond(render_products_json(fixture.catalog, parts[1], page, limit), 'application/json')
+            else:
+                self.send_error(404)
+        else:
+            self.send_error(404)
+
+    def respond(self, body, content_type='text/html'):
+        data = body.encode('utf-8')
+        self.server.fixture.count(bytes_sent=len(data))
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep the benchmark output clean
+        pass
+
+
+class FixtureSite:
+    """
+    A local web server that replays the markup of the Unimart store for a synthetic catalog.
+    """
+
+    def __init__(self, catalog, latency=0.0, host='127.0.0.1', port=0, recordings=None):
+        """
+        :param catalog: The fixture catalog to serve.
+        :param latency: Artificial delay in seconds added to every response.
+        :param host: Interface to listen on.
+        :param port: Port to listen on, 0 picks a free port.
+        :param recordings: Optional directory of products.json pages recorded by FeedUnimart.py, served
+                           instead of the generated products for the collections they contain.
+        """
+        self.catalog = catalog
+        self.latency = latency
+        self.recordings = recordings
+        self.pages_served = 0
+        self.products_served = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), FixtureRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fixture = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def count(self, pages=0, products=0, bytes_sent=0):
+        """Add to the counters of collection pages, products and bytes served."""
+        with self._lock:
+            self.pages_served += pages
+            self.products_served += products
+            self.bytes_served += bytes_sent
+
+    def reset_counters(self):
+        with self._lock:
+            self.pages_served = 0
+            self.products_served = 0
+            self.bytes_served = 0
+
+    def recorded_products(self, handle):
+        """
+        Return the products of every recorded page of a collection in order, or None if it was not recorded.
+        They are served again in pages of the requested size, whatever the page size they were recorded with.
+        """
+        if self.recordings is None:
+            return None
+        directory = os.path.join(self.recordings, os.path.basename(handle))
+        if not os.path.isdir(directory):
+            return None
+        products = []
+        page = 1
+        while os.path.exists(os.path.join(directory, f'page-{page}.json')):
+            with open(os.path.join(directory, f'page-{page}.json'), encoding='utf-8') as recorded:
+                products.extend(json.load(recorded)['products'])
+            page += 1
+        return products
+
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def scrape_with_browser(site, output_directory):
+    """
+    Run the Selenium scraper end to end against the fixture site, without the rendering delays.
+
+    :param site: The started fixture site.
+    :param output_directory: Directory where the scraper writes its Excel files.
+    :return: Directory of the Articles_by_subcategory workbooks.
+    """
+    from ScrappingUnimart import UnimartScraper
+
+    # The fixture only serves the benchmark, the requests need no spacing
+    scraper = UnimartScraper(root_url=site.url, output_directory=output_directory, request_interval=0)
+    # The fixture renders the menus on the server, so there is nothing to wait for
+    scraper.MENU_OPEN_DELAY = scraper.MENU_CLOSE_DELAY = 0
+    scraper.scrape_unimart()
+    return scraper.ARTICLES_BY_SUBCATEGORY_FOLDER
+
+
+def scrape_with_feed(site, output_directory):
+    """
+    Read the collections from the products.json feed of the fixture site, without a browser.
+
+    :param site: The started fixture site.
+    :param output_directory: Directory where the Excel files are written.
+    :return: Directory of the Articles_by_subcategory workbooks.
+    """
+    from FeedUnimart import ExcelSink, ShopifyFeed
+    from ScrappingUnimart import iter_collection_urls
+
+    # The categories come from the fixture menu, the feed has no equivalent of the discovery step
+    urls_directory = os.path.join(output_directory, 'MainCategories_urls_subcategories')
+    write_collection_workbooks(site.catalog, site.url, urls_directory)
+    feed = ShopifyFeed(site.url, request_delay=0)
+    articles_directory = os.path.join(output_directory, 'Articles')
+    feed.scrape(iter_collection_urls(urls_directory), [ExcelSink(articles_directory)])
+    return articles_directory
+
+
+# Scraping modes measured by the benchmark harness, by name
+SCRAPE_MODES = {
+    'browser': scrape_with_browser,
+    'feed': scrape_with_feed,
+}
+
+
+def expected_articles(site, handle):
+    """
+    Rows the scraper should write for a collection: its recorded pages when the site replays them, the
+    generated products otherwise.
+
+    :param site: The fixture site that was scraped.
+    :param handle: Handle of the collection.
+    :return: List of (brand, name, price, offer price or None), formatted as the website shows them.
+    """
+    from FeedUnimart import products_to_frame
+
+    recorded = site.recorded_products(handle)
+    if recorded is not None:
+        frame = products_to_frame(recorded)
+        return [tuple(None if pd.isna(value) else value for value in row)
+                for row in frame.itertuples(index=False, name=None)]
+    return [(product['vendor'], product['title'], format_price(product['price']),
+             format_price(product['offer']) if product['offer'] is not None else None)
+            for product in site.catalog.collections[handle]]
+
+
+def check_written_articles(site, articles_directory):
+    """
+    Read the scraped workbooks back and compare every row of every sheet with its collection, so an article
+    lost, written twice between two pages or with the wrong price is caught.
+
+    :param site: The fixture site that was scraped.
+    :param articles_directory: Directory of the Articles_by_subcategory workbooks.
+    :return: List of (subcategory, label, rows read, products of the collection) for the sheets that differ.
+    """
+    mismatches = []
+    for subcategories in site.catalog.menu.values():
+        for subcategory, links in subcategories.items():
+            # The workbooks are named after the subcategory with '_' instead of spaces, see iter_collection_urls
+            file_path = os.path.join(articles_directory, subcategory.replace(' ', '_') + '.xlsx')
+            sheets = pd.read_excel(file_path, sheet_name=None, engine='openpyxl') if os.path.exists(file_path) else {}
+            # "Ver Todo" repeats the products of the other labels and is not scraped
+            for label, handle in links[1:]:
+                expected = expected_articles(site, handle)
+                if label not in sheets:
+                    rows = []
+                else:
+                    sheet = sheets[label].reindex(columns=['Brand', 'Articule_Name', 'Price', 'Offer_Price'])
+                    rows = [tuple(None if pd.isna(value) else value for value in row)
+                            for row in sheet.itertuples(index=False, name=None)]
+                if rows != expected:
+                    mismatches.append((subcategory, label, len(rows), len(expected)))
+    return mismatches
+
+
+def run_benchmark(site, modes):
+    """
+    Run every scraping mode against the fixture site and measure its throughput.
+
+    :param site: A started fixture site.
+    :param modes: Names of the modes in SCRAPE_MODES to run.
+    :return: List of dictionaries with the results of each mode.
+    """
+    results = []
+    for mode in modes:
+        site.reset_counters()
+        with tempfile.TemporaryDirectory() as output_directory:
+            start = time.perf_counter()
+            articles_directory = SCRAPE_MODES[mode](site, output_directory)
+            elapsed = time.perf_counter() - start
+            mismatches = check_written_articles(site, articles_directory)
+        result = {
+            'mode': mode,
+            'seconds': round(elapsed, 3),
+            'pages': site.pages_served,
+            'products': site.products_served,
+            'pages_per_second': round(site.pages_served / elapsed, 2),
+            'products_per_second': round(site.products_served / elapsed, 2),
+            'bytes': site.bytes_served,
+            'sheets_mismatched': len(mismatches),
+        }
+        print(f"{mode:<12} {result['pages']:>7} pages {result['products']:>9} products "
+              f"{result['pages_per_second']:>9} pages/s {result['products_per_second']:>10} products/s "
+              f"{result['bytes']:>12} bytes")
+        for subcategory, label, rows, products in mismatches:
+            if rows != products:
+                print(f"  {subcategory} - {label}: {rows} articles written for {products} products")
+            else:
+                print(f"  {subcategory} - {label}: the articles written differ from the products")
+        results.append(result)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local fixture site that replays the Unimart markup.')
+    parser.add_argument('command', choices=['serve', 'bench'])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=24)
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay in seconds added to every response.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--recordings', help='Directory of products.json pages recorded by FeedUnimart.py.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--modes', nargs='+', default=list(SCRAPE_MODES), choices=list(SCRAPE_MODES))
+    parser.add_argument('--output', help='Optional JSON file for the benchmark results.')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    fixture_catalog = FixtureCatalog(args.products, args.page_size, args.seed)
+
+    if args.command == 'serve':
+        site = FixtureSite(fixture_catalog, args.latency, args.host, args.port, args.recordings)
+        print(f"Serving {args.products} products on {site.url}")
+        try:
+            site.httpd.serve_forever()
+        except KeyboardInterrupt:
+            site.stop()
+    else:
+        site = FixtureSite(fixture_catalog, args.latency, args.host, 0, args.recordings).start()
+        benchmark_results = run_benchmark(site, args.modes)
+        site.stop()
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output:
+                json.dump({'products': args.products, 'page_size': args.page_size, 'latency': args.latency,
+                           'results': benchmark_results}, output, indent=2)
+        # A mode that lost or altered articles is a failure, whatever its throughput
+        if any(result['sheets_mismatched'] for result in benchmark_results):
+            sys.exit(1)
@@ -0,0 +1,76 @@
+import argparse
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+import MetricsUnimart as metrics
+
+# Query parameters that only track the click, they never change the articles of the page
+TRACKING_PARAMETERS = {'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'srsltid', 'ref', '_pos', '_sid', '_ss',
+                       '_psq', '_v'}
+TRACKING_PREFIXES = ('utm_',)
+# Query parameters that only change the order or the window of the articles; the scraper reads every page
+SORT_PARAMETERS = {'sort_by', 'sort', 'order', 'page', 'limit', 'view'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_ignored_parameter(name):
+    name = name.lower()
+    return name in TRACKING_PARAMETERS or name in SORT_PARAMETERS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url):
+    """
+    Canonical form of a collection URL, equal for every link to the same set of articles: lowercase scheme,
+    host and path, no default port, fragment or trailing slash, no tracking or sort parameter, and the
+    remaining query parameters sorted.
+
+    :param url: URL of the collection, as found in the menu.
+    :return: The canonical URL.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port is not None and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parsed.port}'
+    # Shopify handles are lowercase, /collections/Audio/ and /collections/audio are the same collection
+    path = parsed.path.lower().rstrip('/') or '/'
+    query = parse_qs(parsed.query, keep_blank_values=True)
+    filters = sorted((name, sorted(values)) for name, values in query.items() if not is_ignored_parameter(name))
+    return urlunparse((scheme, host, path, '', urlencode(filters, doseq=True), ''))
+
+
+def build_frontier(collections):
+    """
+    Group the collections of the menus by canonical URL, so each one is fetched once per run.
+
+    :param collections: Iterable of (subcategory, label, url), e.g. from `iter_collection_urls`.
+    :return: List of (canonical url, [(subcategory, label), ...]) in the order the collections were first
+             found; every label the collection is listed under, without repetition.
+    """
+    frontier = {}
+    listings = 0
+    for subcategory, label, url in collections:
+        listings += 1
+        labels = frontier.setdefault(canonical_url(url), [])
+        if (subcategory, label) not in labels:
+            labels.append((subcategory, label))
+    metrics.count('collections_listed', listings)
+    metrics.count('collections_unique', len(frontier))
+    return list(frontier.items())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Collections of the menus after removing the duplicate URLs.')
+    parser.add_argument('urls_directory', help='MainCategories_urls_subcategories directory.')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from ScrappingUnimart import iter_collection_urls
+
+    args = parse_args()
+    collections = list(iter_collection_urls(args.urls_directory))
+    frontier = build_frontier(collections)
+    for url, labels in frontier:
+        if len(labels) > 1:
+            print(f"{url}\t" + '; '.join(f"{subcategory} - {label}" for subcategory, label in labels))
+    print(f"{len(collections)} listed collections, {len(frontier)} to fetch")
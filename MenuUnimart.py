@@ -0,0 +1,128 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import pandas as pd
+
+ROOT_NAV_ID = 'AccessibleNav'  # ID for the main navigation element on the website
+# Class of the subcategory columns of a mega-menu panel
+SUBCATEGORY_DIV_CLASS = 'grid__item large--one-fifth medium--one-whole no_middle_align mt30'
+# Elements without a closing tag, they never contain anything
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+
+def _clean(text):
+    """Collapse the whitespace of a text the way the browser shows it."""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class MegaMenuParser(HTMLParser):
+    """
+    Collects, from the markup of the home page, the main categories of the AccessibleNav menu with their
+    data-link panel ids, and every subcategory column with its labels and URLs.
+    """
+
+    def __init__(self, nav_id=ROOT_NAV_ID, column_class=SUBCATEGORY_DIV_CLASS):
+        super().__init__()
+        self.nav_id = nav_id
+        self.column_class = column_class
+        self.stack = []  # open elements as [tag, id, role]
+        self.categories = []  # [data link, name] in menu order
+        self.columns = []  # {'ids': ids of the enclosing elements, 'name': ..., 'links': [[label, href]]}
+        self.text = None  # list collecting the text of the element being read, or None
+
+    def _inside(self, role):
+        return any(entry[2] == role for entry in self.stack)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        role = None
+        column = self.columns[-1] if self._inside('column') else None
+        if attrs.get('id') == self.nav_id:
+            role = 'nav'
+        elif self._inside('nav') and attrs.get('data-link'):
+            role = 'category'
+            self.categories.append([attrs['data-link'], ''])
+            self.text = []
+        elif tag == 'div' and self.column_class in (attrs.get('class') or ''):
+            role = 'column'
+            self.columns.append({'ids': [entry[1] for entry in self.stack if entry[1]], 'name': None,
+                                 'links': [], 'list': 'before'})
+        elif column is not None and tag == 'ul' and column['list'] == 'before':
+            role = 'list'
+            column['list'] = 'open'
+        elif column is not None and tag == 'a':
+            if column['list'] == 'open':
+                role = 'label'
+                column['links'].append([None, attrs.get('href')])
+                self.text = []
+            elif column['name'] is None:
+                role = 'subcategory'
+                self.text = []
+        if tag not in VOID_TAGS:
+            self.stack.append([tag, attrs.get('id'), role])
+
+    def handle_endtag(self, tag):
+        # Close the elements left open inside this one, as the browser does with e.g. an unclosed <li>
+        if not any(entry[0] == tag for entry in self.stack):
+            return
+        while self.stack:
+            open_tag, _, role = self.stack.pop()
+            self._close(role)
+            if open_tag == tag:
+                break
+
+    def _close(self, role):
+        if role == 'category':
+            self.categories[-1][1] = _clean(''.join(self.text))
+        elif role == 'subcategory':
+            self.columns[-1]['name'] = _clean(''.join(self.text))
+        elif role == 'label':
+            self.columns[-1]['links'][-1][0] = _clean(''.join(self.text))
+        elif role == 'list':
+            self.columns[-1]['list'] = 'closed'
+        if role in ('category', 'subcategory', 'label'):
+            self.text = None
+
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+
+def parse_mega_menu(markup, base_url):
+    """
+    Read the whole category tree from one snapshot of the home page, since the data-link panels of the
+    mega-menu are already in the page, only hidden.
+
+    :param markup: HTML of the home page, e.g. driver.page_source.
+    :param base_url: URL of the page, to make the collection links absolute.
+    :return: List of (main category, data link, [(subcategory, [(label, url)])]) in menu order.
+    """
+    parser = MegaMenuParser()
+    parser.feed(markup)
+    parser.close()
+
+    panels = {}
+    for column in parser.columns:
+        links = [(label, urljoin(base_url, href) if href is not None else None) for label, href in column['links']]
+        # A column belongs to the innermost enclosing element that is the panel of a category
+        for element_id in reversed(column['ids']):
+            if any(data_link == element_id for data_link, _ in parser.categories):
+                panels.setdefault(element_id, []).append((column['name'], links))
+                break
+    return [(name, data_link, panels.get(data_link, [])) for data_link, name in parser.categories]
+
+
+def subcategories_frame(subcategories):
+    """
+    Lay out the subcategories of a main category as in the MainCategories_urls_subcategories files:
+    a column with the labels of every subcategory followed by a '<subcategory>_url' column with their URLs.
+
+    :param subcategories: List of (subcategory, [(label, url)]).
+    :return: The DataFrame.
+    """
+    dataframe = pd.DataFrame()
+    for subcategory, links in subcategories:
+        dataframe[subcategory] = pd.Series([label for label, _ in links])
+        dataframe[subcategory + '_url'] = pd.Series([url for _, url in links])
+    return dataframe
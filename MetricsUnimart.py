@@ -0,0 +1,223 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Environment variables that turn the instrumentation on for a run; '{run}' in a path is replaced by the run id
+PROMETHEUS_ENV = 'UNIMART_METRICS_PROMETHEUS'
+TRACE_ENV = 'UNIMART_METRICS_TRACE'
+
+_enabled = False
+_tracing = False
+_prometheus_path = None
+_trace_path = None
+_run_id = None
+_lock = threading.Lock()
+_spans = {}  # name -> [calls, total seconds, max seconds]
+_counters = {}  # name -> value
+_histograms = {}  # name -> LatencyHistogram
+_events = []  # completed spans in Chrome trace event format
+_origin = time.perf_counter()
+_NOOP = nullcontext()
+# Upper bounds in seconds of the latency histogram buckets, from fast responses to the slowest page loads
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """
+    Distribution of latencies in fixed buckets, cheap enough to record every request of a crawl.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket holds everything above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by interpolating inside its bucket, as Prometheus histogram_quantile does.
+
+        :param q: Quantile between 0 and 1, e.g. 0.99.
+        :return: Estimated latency in seconds, or None if nothing was observed.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                # Never report more than the slowest latency actually observed
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+    def as_dict(self):
+        return {'count': self.count, 'seconds': round(self.sum, 6), 'max_seconds': round(self.max, 6),
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts))}
+
+
+def configure(prometheus_path=None, trace_path=None):
+    """
+    Turn the instrumentation on and choose where the reports of this run are written.
+    Without any path the instrumentation stays off and spans and counters cost a single flag check.
+
+    :param prometheus_path: Optional path of a Prometheus text file with the totals of the run.
+    :param trace_path: Optional path of a JSON trace with every span, viewable in chrome://tracing or Perfetto.
+    """
+    global _enabled, _tracing, _prometheus_path, _trace_path, _run_id
+    _run_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+    _prometheus_path = prometheus_path.format(run=_run_id) if prometheus_path else None
+    _trace_path = trace_path.format(run=_run_id) if trace_path else None
+    _tracing = _trace_path is not None
+    _enabled = bool(_prometheus_path or _trace_path)
+    reset()
+
+
+def configure_from_environment():
+    """Configure the instrumentation from the UNIMART_METRICS_PROMETHEUS and UNIMART_METRICS_TRACE variables."""
+    configure(os.environ.get(PROMETHEUS_ENV), os.environ.get(TRACE_ENV))
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget the spans, counters and events recorded so far."""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _histograms.clear()
+        _events.clear()
+
+
+@contextmanager
+def _timed_span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        elapsed = end - start
+        with _lock:
+            stats = _spans.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            if _tracing:
+                _events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                                'ts': round((start - _origin) * 1e6), 'dur': round(elapsed * 1e6)})
+
+
+def span(name):
+    """
+    Time the enclosed block under the given stage name, e.g. ``with span('page_fetch'): driver.get(url)``.
+
+    :param name: Name of the stage.
+    :return: A context manager.
+    """
+    if not _enabled:
+        return _NOOP
+    return _timed_span(name)
+
+
+def count(name, value=1):
+    """
+    Add to a named counter, e.g. the number of products extracted.
+
+    :param name: Name of the counter.
+    :param value: Amount to add.
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, seconds):
+    """
+    Record a latency in the histogram of the given name, e.g. the time to load a page.
+
+    :param name: Name of the histogram.
+    :param seconds: Latency in seconds.
+    """
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+
+def snapshot():
+    """
+    Return the totals recorded so far.
+
+    :return: Dictionary with the spans (calls, seconds, max seconds), the counters and the latency histograms.
+    """
+    with _lock:
+        return {
+            'spans': {name: {'calls': calls, 'seconds': round(total, 6), 'max_seconds': round(longest, 6)}
+                      for name, (calls, total, longest) in _spans.items()},
+            'counters': dict(_counters),
+            'histograms': {name: histogram.as_dict() for name, histogram in _histograms.items()},
+        }
+
+
+def prometheus_text():
+    """Render the totals in the Prometheus text exposition format."""
+    totals = snapshot()
+    lines = ['# HELP unimart_stage_seconds_total Time spent in each stage.',
+             '# TYPE unimart_stage_seconds_total counter']
+    lines += [f'unimart_stage_seconds_total{{stage="{name}"}} {stats["seconds"]}'
+              for name, stats in totals['spans'].items()]
+    lines += ['# HELP unimart_stage_calls_total Number of times each stage ran.',
+              '# TYPE unimart_stage_calls_total counter']
+    lines += [f'unimart_stage_calls_total{{stage="{name}"}} {stats["calls"]}'
+              for name, stats in totals['spans'].items()]
+    lines += ['# HELP unimart_stage_max_seconds Longest single run of each stage.',
+              '# TYPE unimart_stage_max_seconds gauge']
+    lines += [f'unimart_stage_max_seconds{{stage="{name}"}} {stats["max_seconds"]}'
+              for name, stats in totals['spans'].items()]
+    lines += ['# HELP unimart_events_total Number of items processed.',
+              '# TYPE unimart_events_total counter']
+    lines += [f'unimart_events_total{{counter="{name}"}} {value}' for name, value in totals['counters'].items()]
+    lines += ['# HELP unimart_latency_seconds Distribution of the latencies, e.g. of page loads.',
+              '# TYPE unimart_latency_seconds histogram']
+    for name, histogram in totals['histograms'].items():
+        cumulative = 0
+        for bound, bucket_count in histogram['buckets'].items():
+            cumulative += bucket_count
+            lines.append(f'unimart_latency_seconds_bucket{{name="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'unimart_latency_seconds_sum{{name="{name}"}} {histogram["seconds"]}')
+        lines.append(f'unimart_latency_seconds_count{{name="{name}"}} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_reports():
+    """Write the Prometheus text file and the JSON trace configured for this run, if any."""
+    if _prometheus_path:
+        with open(_prometheus_path, 'w', encoding='utf-8') as report:
+            report.write(prometheus_text())
+        print(f"Metrics written to {_prometheus_path}")
+    if _trace_path:
+        with _lock:
+            events = list(_events)
+        with open(_trace_path, 'w', encoding='utf-8') as trace:
+            json.dump({'traceEvents': events, 'otherData': {'run': _run_id, **snapshot()}}, trace)
+        print(f"Trace written to {_trace_path}")
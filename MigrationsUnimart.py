@@ -0,0 +1,143 @@
+import argparse
+import os
+import re
+
+from DataAnalysisUnimart import DatabaseManager
+
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'migrations')
+# Migration files are named <version>_<description>.sql, e.g. 0002_foreign_key_indexes.sql
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+def list_migrations(directory=MIGRATIONS_DIRECTORY):
+    """
+    List the migration scripts of a directory in the order they must be applied.
+
+    :param directory: Directory with the migration scripts.
+    :return: List of (version, name, path) tuples sorted by version.
+    """
+    migrations = []
+    for file in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(file)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, file)))
+    return sorted(migrations)
+
+
+class MigrationRunner:
+    """
+    Applies the versioned SQL scripts in resources/migrations to a database and records them in schema_migrations.
+    """
+
+    def __init__(self, db_manager, directory=MIGRATIONS_DIRECTORY):
+        """
+        :param db_manager: A connected instance of the database manager.
+        :param directory: Directory with the migration scripts.
+        """
+        self.db_manager = db_manager
+        self.directory = directory
+
+    def ensure_migrations_table(self):
+        """
+        Create the schema_migrations table. A database whose schema was applied by hand from
+        database_design.sql is recorded at version 1 so it is evolved in place instead of recreated.
+        """
+        conn = self.db_manager.conn
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL, to_regclass('article') IS NOT NULL;")
+            has_migrations_table, has_schema = cur.fetchone()
+            if not has_migrations_table:
+                cur.execute("""
+                    CREATE TABLE schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        name VARCHAR(255) NOT NULL,
+                        applied_at TIMESTAMP NOT NULL DEFAULT now()
+                    );
+                """)
+                if has_schema:
+                    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (1, 'initial_schema');")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def applied_versions(self):
+        """Return the set of versions already applied to the database."""
+        return {row[0] for row in self.db_manager.fetch_all("SELECT version FROM schema_migrations;")}
+
+    def pending(self):
+        """Return the migrations that have not been applied yet, in order."""
+        self.ensure_migrations_table()
+        applied = self.applied_versions()
+        return [migration for migration in list_migrations(self.directory) if migration[0] not in applied]
+
+    def migrate(self, target=None):
+        """
+        Apply every pending migration up to the target version. Each migration runs in its own
+        transaction together with its schema_migrations record, so a failing script leaves no trace.
+
+        :param target: Optional last version to apply; all pending migrations by default.
+        :return: List of the versions applied.
+        """
+        applied = []
+        conn = self.db_manager.conn
+        for version, name, path in self.pending():
+            if target is not None and version > target:
+                break
+            with open(path, encoding='utf-8') as script:
+                sql = script.read()
+            cur = conn.cursor()
+            try:
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Error: migration {version:04d}_{name} failed: {e}")
+                raise
+            finally:
+                cur.close()
+            print(f"Applied migration {version:04d}_{name}")
+            applied.append(version)
+        return applied
+
+    def status(self):
+        """
+        Describe every known migration and whether it has been applied.
+
+        :return: List of (version, name, applied) tuples.
+        """
+        self.ensure_migrations_table()
+        applied = self.applied_versions()
+        return [(version, name, version in applied) for version, name, _ in list_migrations(self.directory)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Versioned schema migrations for the Unimart database.')
+    parser.add_argument('command', choices=['migrate', 'status'])
+    parser.add_argument('--target', type=int, help='Last version to apply.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', default='unimart')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    db_manager = DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    runner = MigrationRunner(db_manager)
+    try:
+        if args.command == 'migrate':
+            if not runner.migrate(args.target):
+                print("The database is up to date.")
+        else:
+            for migration_version, migration_name, is_applied in runner.status():
+                print(f"{migration_version:04d} {migration_name:<40} {'applied' if is_applied else 'pending'}")
+    finally:
+        db_manager.disconnect()
@@ -0,0 +1,315 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from selenium.common import TimeoutException, WebDriverException
+from urllib3.exceptions import HTTPError
+from selenium.webdriver.support.ui import WebDriverWait
+
+import MetricsUnimart as metrics
+
+ATTEMPT_TIMEOUT = 20  # seconds a single page load or wait may take before it is abandoned and retried
+MAX_ATTEMPTS = 4
+BASE_DELAY = 1.0  # first backoff, doubled on every retry
+MAX_DELAY = 30.0
+RETRY_RATIO = 0.2  # retries allowed per first attempt, across the whole crawl
+MIN_RETRIES = 10  # retries always allowed, so a short crawl can still recover
+FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit of a host
+RESET_TIMEOUT = 60  # seconds an open circuit waits before letting one request through
+
+
+class NavigationError(Exception):
+    """A page could not be loaded within its attempts, its retry budget or because its host is failing."""
+
+
+class CircuitOpenError(NavigationError):
+    """The circuit of the host is open, requests are shed until it cools down."""
+
+
+class RetryPolicy:
+    """
+    Per-attempt deadline and jittered exponential backoff between attempts.
+    """
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, attempt_timeout=ATTEMPT_TIMEOUT, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, rng=None):
+        self.max_attempts = max_attempts
+        self.attempt_timeout = attempt_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def backoff(self, retry):
+        """
+        Delay before a retry with "full jitter": a random time up to the exponential delay, so workers
+        that failed together do not retry together.
+
+        :param retry: Number of the retry, starting at 1.
+        :return: Seconds to wait.
+        """
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def max_duration(self):
+        """
+        Longest time one page load or wait may take: every attempt reaching its timeout, with the longest
+        backoff between them.
+
+        :return: Seconds.
+        """
+        backoffs = sum(min(self.max_delay, self.base_delay * 2 ** (retry - 1)) for retry in range(1, self.max_attempts))
+        return self.max_attempts * self.attempt_timeout + backoffs
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of the first attempts, so a failing site gets a bounded amount of extra load
+    instead of every request being multiplied by the number of attempts.
+    """
+
+    def __init__(self, ratio=RETRY_RATIO, min_retries=MIN_RETRIES):
+        self.ratio = ratio
+        self.tokens = float(min_retries)
+        self.max_tokens = float(min_retries) + 100 * ratio
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Record a first attempt, which earns a fraction of a retry."""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Take a retry from the budget.
+
+        :return: False if the budget is exhausted and the retry must not be made.
+        """
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Circuit of one host. It opens after consecutive failures. After the reset timeout it becomes
+    half-open and lets one request probe the host: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.clock() - self.opened_at >= self.reset_timeout else 'open'
+
+    def remaining(self):
+        """Seconds until an open circuit lets a request through, 0 if it already does."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+    def allow(self):
+        """Return True if a request may be sent to the host now."""
+        with self._lock:
+            if self.state != 'half_open':
+                return self.state == 'closed'
+            # Let a single probe through and keep the circuit open for everything else until it answers
+            self.opened_at = self.clock()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    metrics.count('circuit_opened')
+                self.opened_at = self.clock()
+
+
+class CircuitBreakers:
+    """
+    The circuit breaker of every host, shared by all the navigators of a crawl, so that sessions loading pages
+    concurrently see the same state of the host instead of each one counting its own failures.
+    """
+
+    def __init__(self, **settings):
+        """
+        :param settings: Arguments of every CircuitBreaker, e.g. failure_threshold.
+        """
+        self.settings = settings
+        self._breakers = {}  # host -> CircuitBreaker
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(**self.settings)
+            return self._breakers[host]
+
+    def items(self):
+        with self._lock:
+            return list(self._breakers.items())
+
+
+class ResilientNavigator:
+    """
+    Wraps page navigation of a WebDriver with per-attempt deadlines, retries with backoff under a retry
+    budget and a circuit breaker per host, and records the latency of every attempt. Only failed page loads count
+    against the circuit of a host; a wait that times out on a page that did load does not.
+    With a DriverManager, the browser session is recycled between pages when the manager asks for it,
+    and a session that crashed during an attempt is replaced before the retry.
+    """
+
+    def __init__(self, driver, policy=None, budget=None, wait_when_open=True, sleep=time.sleep, drivers=None,
+                 breakers=None):
+        """
+        :param driver: The Selenium WebDriver, ignored when `drivers` is given.
+        :param policy: Retry policy, by default `RetryPolicy()`.
+        :param budget: Retry budget, shared by every navigation of the crawl; by default `RetryBudget()`.
+        :param wait_when_open: Wait for an open circuit to cool down instead of raising `CircuitOpenError`.
+        :param sleep: Function used to wait, replaceable in benchmarks.
+        :param drivers: Optional DriverManager providing the current WebDriver.
+        :param breakers: Circuit breakers, shared by every navigator of the crawl; by default `CircuitBreakers()`.
+        """
+        self._driver = driver
+        self.drivers = drivers
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.wait_when_open = wait_when_open
+        self.sleep = sleep
+        self.breakers = breakers or CircuitBreakers()
+        self.histograms = {}  # (host, operation) -> LatencyHistogram of successful attempts
+        if drivers is not None:
+            drivers.add_start_callback(lambda new_driver: new_driver.set_page_load_timeout(
+                self.policy.attempt_timeout))
+        else:
+            self.driver.set_page_load_timeout(self.policy.attempt_timeout)
+
+    @property
+    def driver(self):
+        return self.drivers.driver if self.drivers is not None else self._driver
+
+    def breaker(self, host):
+        return self.breakers.get(host)
+
+    def _observe(self, host, operation, seconds):
+        key = (host, operation)
+        if key not in self.histograms:
+            self.histograms[key] = metrics.LatencyHistogram()
+        self.histograms[key].observe(seconds)
+        metrics.observe(operation, seconds)
+        if self.drivers is not None and operation == 'navigation':
+            self.drivers.record_page(seconds)
+
+    def _admit(self, host):
+        breaker = self.breaker(host)
+        while not breaker.allow():
+            if not self.wait_when_open:
+                raise CircuitOpenError(f"Circuit open for {host}, retry in {breaker.remaining():.0f} s")
+            metrics.count('circuit_waits')
+            self.sleep(max(breaker.remaining(), 0.1))
+
+    def _run(self, url, operation, attempt, recover):
+        """
+        Run an attempt function until it succeeds, retrying with backoff while attempts and budget last.
+
+        :param url: URL being loaded, used for the host of the circuit breaker.
+        :param operation: Name of the latency histogram.
+        :param attempt: Function running one attempt within the attempt timeout.
+        :param recover: Function run before every retry, e.g. reloading the page.
+        :return: The result of the successful attempt.
+        """
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        self.budget.deposit()
+        for number in range(1, self.policy.max_attempts + 1):
+            self._admit(host)
+            start = time.perf_counter()
+            try:
+                result = attempt()
+            except (TimeoutException, WebDriverException, HTTPError) as e:
+                error = e
+                if self.drivers is not None and self.drivers.ensure_healthy():
+                    # The browser died, not the host: retry on the new session without blaming the host
+                    metrics.count('driver_crashes')
+                else:
+                    if operation == 'navigation' or not isinstance(e, TimeoutException):
+                        # A wait timing out means the page lacks the element, not that the host is failing
+                        breaker.record_failure()
+                    metrics.count(f'{operation}_failures')
+            else:
+                breaker.record_success()
+                self._observe(host, operation, time.perf_counter() - start)
+                return result
+
+            if number == self.policy.max_attempts:
+                break
+            if not self.budget.withdraw():
+                metrics.count('retry_budget_exhausted')
+                raise NavigationError(f"Retry budget exhausted on {url}: {error}")
+            metrics.count(f'{operation}_retries')
+            self.sleep(self.policy.backoff(number))
+            try:
+                recover()
+            except (TimeoutException, WebDriverException, HTTPError):
+                # The next attempt fails the same way and is counted there
+                pass
+        raise NavigationError(f"{operation} failed {self.policy.max_attempts} times on {url}: {error}")
+
+    def get(self, url):
+        """
+        Load a page, abandoning any attempt that exceeds the attempt timeout.
+
+        :param url: URL of the page.
+        """
+        if self.drivers is not None:
+            # Between two pages is the only safe point to swap the browser session
+            self.drivers.maybe_recycle()
+        self._run(url, 'navigation', lambda: self.driver.get(url), lambda: None)
+
+    def wait_until(self, condition):
+        """
+        Wait for a condition on the current page, reloading the page when an attempt times out.
+
+        :param condition: Expected condition, e.g. EC.visibility_of_element_located(locator).
+        :return: The value returned by the condition, e.g. the element.
+        """
+        url = self.driver.current_url
+        return self._run(url, 'wait', lambda: WebDriverWait(self.driver, self.policy.attempt_timeout).until(condition),
+                         lambda: self._reload(url))
+
+    def _reload(self, url):
+        # A session replaced after a crash starts on a blank page, load the page again instead of refreshing it
+        if self.driver.current_url != url:
+            self.driver.get(url)
+        else:
+            self.driver.refresh()
+
+    def summary(self):
+        """
+        Latency percentiles of every host and operation, and the state of the circuits.
+
+        :return: List of lines of text.
+        """
+        lines = []
+        for (host, operation), histogram in sorted(self.histograms.items()):
+            lines.append(f"{host} {operation}: {histogram.count} ok, p50 {histogram.quantile(0.5):.2f} s, "
+                         f"p90 {histogram.quantile(0.9):.2f} s, p99 {histogram.quantile(0.99):.2f} s, "
+                         f"max {histogram.max:.2f} s")
+        for host, breaker in sorted(self.breakers.items()):
+            lines.append(f"{host} circuit {breaker.state}, {breaker.failures} consecutive failures")
+        return lines
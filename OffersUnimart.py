@@ -0,0 +1,281 @@
+import argparse
+from datetime import date
+
+import psycopg2.extras
+
+import MetricsUnimart as metrics
+from DataAnalysisUnimart import (ARTICLE_BATCH_SIZE, ARTICLES_BY_SUBCATEGORY_DIRECTORY, DatabaseManager,
+                                 iter_article_batches)
+
+# Width in percentage points of the buckets of the discount-depth distribution
+DISCOUNT_BUCKET_WIDTH = 10
+
+# Observations of one load: every scraped article, with its offer price or NULL when it was not on offer.
+# ID_Article is resolved from the type, brand and name of the scraped row, the key the articles are loaded on.
+CREATE_STAGING_QUERY = """
+    CREATE TEMPORARY TABLE offer_observation (
+        ID_Type INTEGER,
+        ID_Brand INTEGER,
+        article_name VARCHAR(255),
+        offer_price_cents BIGINT
+    ) ON COMMIT DROP;
+    """
+
+STAGE_OBSERVATIONS_QUERY = """
+    INSERT INTO offer_observation (ID_Type, ID_Brand, article_name, offer_price_cents) VALUES %s;
+    """
+
+# Joins on the expression of idx_article_natural_key, so each observation is one index lookup
+RESOLVE_OBSERVATIONS_QUERY = """
+    CREATE TEMPORARY TABLE offer_seen ON COMMIT DROP AS
+    SELECT DISTINCT ON (A.ID_Article) A.ID_Article, S.offer_price_cents, S.offer_price_cents / 100.0 AS Price
+    FROM offer_observation S
+    JOIN Article A ON A.ID_Type = S.ID_Type AND COALESCE(A.ID_Brand, 0) = COALESCE(S.ID_Brand, 0)
+                  AND A.article_name = S.article_name
+    ORDER BY A.ID_Article, S.offer_price_cents NULLS LAST;
+    """
+
+# The current offer price stored on the article follows the scrape
+SYNC_ARTICLES_QUERY = """
+    UPDATE Article A SET offer_price_cents = S.offer_price_cents
+    FROM offer_seen S
+    WHERE A.ID_Article = S.ID_Article AND A.offer_price_cents IS DISTINCT FROM S.offer_price_cents;
+    """
+
+# Offers of the scraped articles that are gone or changed price end on the day of the load.
+# Articles that were not scraped at all keep their offers: a partial crawl says nothing about them.
+CLOSE_EXPIRED_QUERY = """
+    UPDATE OfferPrice O SET EndDate = %(day)s
+    FROM offer_seen S
+    WHERE O.ID_Article = S.ID_Article AND O.EndDate IS NULL AND O.StartDate < %(day)s
+      AND S.Price IS DISTINCT FROM O.Price;
+    """
+
+# An offer opened earlier the same day, by a load that is now being repeated, has no period left to keep
+DELETE_SAME_DAY_QUERY = """
+    DELETE FROM OfferPrice O
+    USING offer_seen S
+    WHERE O.ID_Article = S.ID_Article AND O.EndDate IS NULL AND O.StartDate >= %(day)s
+      AND S.Price IS DISTINCT FROM O.Price;
+    """
+
+OPEN_NEW_QUERY = """
+    INSERT INTO OfferPrice (ID_Article, Price, StartDate)
+    SELECT ID_Article, Price, %(day)s FROM offer_seen WHERE Price IS NOT NULL
+    ON CONFLICT (ID_Article) WHERE EndDate IS NULL DO NOTHING;
+    """
+
+ACTIVE_OFFERS_QUERY = """
+    SELECT
+        A.ID_Article,
+        A.article_name,
+        B.brand_name,
+        A.price_cents / 100.0 AS RegularPrice,
+        O.Price AS OfferPrice,
+        ROUND((A.price_cents - O.Price * 100) / NULLIF(A.price_cents, 0) * 100, 2) AS DiscountPercentage,
+        O.StartDate,
+        O.EndDate
+    FROM OfferPrice O
+    JOIN Article A ON O.ID_Article = A.ID_Article
+    LEFT JOIN Brand B ON A.ID_Brand = B.ID_Brand
+    WHERE daterange(O.StartDate, O.EndDate, '[)') @> %(day)s::date
+    ORDER BY DiscountPercentage DESC NULLS LAST
+    LIMIT %(limit)s;
+    """
+
+DEEPEST_DISCOUNTS_BY_SUBCATEGORY_QUERY = """
+    WITH discounts AS (
+        SELECT
+            S.subcategory_name,
+            A.article_name,
+            A.price_cents / 100.0 AS RegularPrice,
+            O.Price AS OfferPrice,
+            ROUND((A.price_cents - O.Price * 100) / NULLIF(A.price_cents, 0) * 100, 2) AS DiscountPercentage,
+            ROW_NUMBER() OVER (PARTITION BY S.ID_Subcategory
+                               ORDER BY (A.price_cents - O.Price * 100) / NULLIF(A.price_cents, 0) DESC NULLS LAST)
+                AS rank
+        FROM OfferPrice O
+        JOIN Article A ON O.ID_Article = A.ID_Article
+        JOIN Type T ON A.ID_Type = T.ID_Type
+        JOIN Subcategory S ON T.ID_Subcategory = S.ID_Subcategory
+        WHERE daterange(O.StartDate, O.EndDate, '[)') @> %(day)s::date
+    )
+    SELECT subcategory_name, article_name, RegularPrice, OfferPrice, DiscountPercentage, rank
+    FROM discounts
+    WHERE rank <= %(top)s
+    ORDER BY DiscountPercentage DESC NULLS LAST, subcategory_name, rank;
+    """
+
+DISCOUNT_DISTRIBUTION_QUERY = """
+    SELECT
+        LEAST(FLOOR((A.price_cents - O.Price * 100) / NULLIF(A.price_cents, 0) * 100 / %(width)s),
+              100 / %(width)s - 1) * %(width)s AS BucketStart,
+        COUNT(*) AS Offers
+    FROM OfferPrice O
+    JOIN Article A ON O.ID_Article = A.ID_Article
+    WHERE daterange(O.StartDate, O.EndDate, '[)') @> %(day)s::date AND O.Price * 100 < A.price_cents
+    GROUP BY BucketStart
+    ORDER BY BucketStart;
+    """
+
+
+def load_offers(db_manager, observations, observed_on, batch_size=ARTICLE_BATCH_SIZE):
+    """
+    Record the offers seen by one scrape. The observations are staged in batches, then three set-based
+    statements update the whole OfferPrice history: offers that are gone or changed price are closed,
+    and the new ones are opened. The offer price stored on the articles is updated too. Everything runs
+    in one transaction.
+
+    :param db_manager: A connected instance of the database manager.
+    :param observations: Iterable of (id_type, id_brand, article_name, offer price in cents) for every scraped
+                         article, with the offer price None when the article was not on offer.
+    :param observed_on: Date of the scrape.
+    :param batch_size: Number of observations sent to the database at once.
+    :return: Dictionary with the number of observations, closed offers and opened offers.
+    """
+    params = {'day': observed_on}
+    counts = {'observations': 0, 'closed': 0, 'opened': 0}
+    cur = db_manager.conn.cursor()
+    try:
+        cur.execute(CREATE_STAGING_QUERY)
+        batch = []
+        with metrics.span('db_load'):
+            for observation in observations:
+                batch.append(observation)
+                if len(batch) == batch_size:
+                    psycopg2.extras.execute_values(cur, STAGE_OBSERVATIONS_QUERY, batch, page_size=batch_size)
+                    counts['observations'] += len(batch)
+                    batch = []
+            if batch:
+                psycopg2.extras.execute_values(cur, STAGE_OBSERVATIONS_QUERY, batch, page_size=batch_size)
+                counts['observations'] += len(batch)
+
+            cur.execute(RESOLVE_OBSERVATIONS_QUERY)
+            cur.execute(SYNC_ARTICLES_QUERY)
+            cur.execute(CLOSE_EXPIRED_QUERY, params)
+            counts['closed'] = cur.rowcount
+            cur.execute(DELETE_SAME_DAY_QUERY, params)
+            cur.execute(OPEN_NEW_QUERY, params)
+            counts['opened'] = cur.rowcount
+        db_manager.conn.commit()
+    except Exception as e:
+        # In case of an error, rollback the transaction
+        db_manager.conn.rollback()
+        print(f"Error: {e}")
+        raise
+    finally:
+        cur.close()
+    metrics.count('offers_opened', counts['opened'])
+    metrics.count('offers_closed', counts['closed'])
+    return counts
+
+
+def load_offers_from_excel(db_manager, observed_on, read_directory=ARTICLES_BY_SUBCATEGORY_DIRECTORY,
+                           batch_size=ARTICLE_BATCH_SIZE):
+    """
+    Record the offers of the scraped workbooks, or of a Parquet dataset, once their articles are in the database.
+
+    :param db_manager: A connected instance of the database manager.
+    :param observed_on: Date the articles were scraped.
+    :param read_directory: Directory with the article Excel files, one file per subcategory, or a Parquet dataset.
+    :param batch_size: Number of observations sent to the database at once.
+    :return: Dictionary with the number of observations, closed offers and opened offers.
+    """
+    type_ids, brand_ids = {}, {}
+
+    def observations():
+        for batch in iter_article_batches(read_directory, batch_size):
+            if batch.type_name not in type_ids:
+                type_ids[batch.type_name] = db_manager.select_id_type(batch.type_name)
+            for row in batch.rows:
+                if row.brand not in brand_ids:
+                    brand_ids[row.brand] = db_manager.select_id_brand(row.brand)
+                yield type_ids[batch.type_name], brand_ids[row.brand], row.articule_name, row.offer_price
+
+    return load_offers(db_manager, observations(), observed_on, batch_size)
+
+
+def get_active_offers(db_manager, day, limit=None):
+    """
+    Fetch the offers running on a date, deepest discount first.
+
+    :param db_manager: An instance of the database manager.
+    :param day: The date.
+    :param limit: Optional maximum number of offers.
+    :return: List of (id_article, article_name, brand_name, regular price, offer price, discount %, start, end).
+    """
+    return db_manager.fetch_all(ACTIVE_OFFERS_QUERY, {'day': day, 'limit': limit})
+
+
+def get_deepest_discounts_by_subcategory(db_manager, day, top=1):
+    """
+    Fetch the deepest discounts of every subcategory among the offers running on a date.
+
+    :param db_manager: An instance of the database manager.
+    :param day: The date.
+    :param top: Number of offers per subcategory.
+    :return: List of (subcategory_name, article_name, regular price, offer price, discount %, rank).
+    """
+    return db_manager.fetch_all(DEEPEST_DISCOUNTS_BY_SUBCATEGORY_QUERY, {'day': day, 'top': top})
+
+
+def get_discount_distribution(db_manager, day, width=DISCOUNT_BUCKET_WIDTH):
+    """
+    Count the offers running on a date by depth of discount.
+
+    :param db_manager: An instance of the database manager.
+    :param day: The date.
+    :param width: Width of the buckets in percentage points, e.g. 10 for 0-10 %, 10-20 %, ...
+    :return: List of (bucket start in %, number of offers).
+    """
+    return db_manager.fetch_all(DISCOUNT_DISTRIBUTION_QUERY, {'day': day, 'width': width})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Offer price history of the Unimart articles.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help='Record the offers of the scraped workbooks.')
+    load_parser.add_argument('read_directory', nargs='?', default=ARTICLES_BY_SUBCATEGORY_DIRECTORY)
+    load_parser.add_argument('--batch-size', type=int, default=ARTICLE_BATCH_SIZE)
+
+    active_parser = subparsers.add_parser('active', help='Offers running on a date.')
+    active_parser.add_argument('--limit', type=int, default=20)
+
+    deepest_parser = subparsers.add_parser('deepest', help='Deepest discounts of every subcategory.')
+    deepest_parser.add_argument('--top', type=int, default=1)
+
+    distribution_parser = subparsers.add_parser('distribution', help='Number of offers by depth of discount.')
+    distribution_parser.add_argument('--width', type=int, default=DISCOUNT_BUCKET_WIDTH)
+
+    for command_parser in (load_parser, active_parser, deepest_parser, distribution_parser):
+        command_parser.add_argument('--date', type=date.fromisoformat, default=date.today(),
+                                    help='Date of the scrape or of the offers, e.g. 2023-11-01; today by default.')
+        command_parser.add_argument('--host', default='localhost')
+        command_parser.add_argument('--dbname', default='unimart')
+        command_parser.add_argument('--user', default='postgres')
+        command_parser.add_argument('--password', default='root')
+        command_parser.add_argument('--port', default='5432')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    metrics.configure_from_environment()
+    db_manager = DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    try:
+        if args.command == 'load':
+            print(load_offers_from_excel(db_manager, args.date, args.read_directory, args.batch_size))
+        elif args.command == 'active':
+            for row in get_active_offers(db_manager, args.date, args.limit):
+                print(*row, sep='\t')
+        elif args.command == 'deepest':
+            for row in get_deepest_discounts_by_subcategory(db_manager, args.date, args.top):
+                print(*row, sep='\t')
+        else:
+            for bucket_start, offers in get_discount_distribution(db_manager, args.date, args.width):
+                print(f"{bucket_start:>3.0f}-{bucket_start + args.width:.0f} %\t{offers}")
+    finally:
+        db_manager.disconnect()
+    metrics.write_reports()
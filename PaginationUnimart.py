@@ -0,0 +1,146 @@
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+import MetricsUnimart as metrics
+
+PAGE_WORKERS = 3  # browser sessions loading the pages of a collection at the same time
+REQUEST_INTERVAL = 1.0  # seconds between two page requests to the store, across every session
+PAGE_PARAMETER = 'page'
+# Total shown above the boost-pfs grid, e.g. "1,234 productos"
+PRODUCT_COUNT = re.compile(r'(\d[\d,.]*)\s*(?:productos|products|resultados|results)', re.IGNORECASE)
+
+
+def set_page(url, page):
+    """
+    Return the URL of another page of a collection, keeping the other query parameters.
+
+    :param url: URL of any page of the collection.
+    :param page: Number of the page, starting at 1.
+    :return: The URL with its page parameter replaced.
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query, keep_blank_values=True)
+    query[PAGE_PARAMETER] = [str(page)]
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+
+
+def parse_product_count(text):
+    """
+    Read the total number of products of a collection, e.g. '1,234 productos' -> 1234.
+
+    :param text: Text of the product count element.
+    :return: The number of products, or None if the text has no count.
+    """
+    match = PRODUCT_COUNT.search(text or '')
+    if match is None:
+        return None
+    return int(re.sub(r'\D', '', match.group(1)))
+
+
+def last_page(page_links, product_count=None, page_size=None):
+    """
+    Find the number of pages of a collection from its first page: the highest numbered pagination link,
+    or the total product count divided by the products of a full page.
+
+    :param page_links: Texts of the pagination links, e.g. ['←', '1', '2', '…', '40', '→'].
+    :param product_count: Total products of the collection, if the page shows it.
+    :param page_size: Products on the first page.
+    :return: The number of the last page, or None if the page gives no way to know it.
+    """
+    numbers = [int(text.strip()) for text in page_links if text and text.strip().isdigit()]
+    if numbers:
+        return max(numbers)
+    if product_count is not None and page_size:
+        return max(1, -(-product_count // page_size))
+    return None
+
+
+def plan_page_urls(first_url, page_links, product_count=None, page_size=None):
+    """
+    Build the URLs of the pages after the first one, so they can be loaded without waiting for the link
+    of each page on the previous one.
+
+    :param first_url: URL of the first page of the collection.
+    :param page_links: Texts of the pagination links of the first page.
+    :param product_count: Total products of the collection, if the page shows it.
+    :param page_size: Products on the first page.
+    :return: List of URLs of pages 2 to the last, or None if the number of pages is unknown.
+    """
+    last = last_page(page_links, product_count, page_size)
+    if last is None:
+        return None
+    return [set_page(first_url, page) for page in range(2, last + 1)]
+
+
+class RequestPacer:
+    """
+    Politeness budget shared by the sessions of a crawl: requests to the store start at least
+    `interval` seconds apart, whatever the number of sessions.
+    """
+
+    def __init__(self, interval=REQUEST_INTERVAL, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Wait for the next free slot and reserve it."""
+        with self._lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            metrics.count('pacer_waits')
+            self.sleep(slot - now)
+
+
+class PageFanOut:
+    """
+    Loads the pages of a collection concurrently, each on one of a fixed set of browser sessions, and
+    returns them in page order.
+    """
+
+    def __init__(self, navigators, pacer=None):
+        """
+        :param navigators: ResilientNavigators, one per session; a session loads one page at a time.
+        :param pacer: RequestPacer spacing the requests, by default `RequestPacer()`.
+        """
+        self.navigators = list(navigators)
+        self.pacer = pacer or RequestPacer()
+        self._idle = queue.Queue()
+        for navigator in self.navigators:
+            self._idle.put(navigator)
+
+    def _load(self, url, read_page):
+        navigator = self._idle.get()
+        try:
+            self.pacer.wait()
+            with metrics.span('page_fetch'):
+                navigator.get(url)
+            metrics.count('pages')
+            return read_page(navigator)
+        finally:
+            self._idle.put(navigator)
+
+    def map(self, urls, read_page):
+        """
+        Load every URL and read it once loaded.
+
+        :param urls: URLs of the pages.
+        :param read_page: Function receiving the navigator the page was loaded with, run in its worker.
+        :return: Generator of the results of `read_page`, in the order of the URLs. An error stops it and
+                 the pages not started yet are dropped.
+        """
+        executor = ThreadPoolExecutor(max_workers=len(self.navigators))
+        try:
+            futures = [executor.submit(self._load, url, read_page) for url in urls]
+            for future in futures:
+                yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
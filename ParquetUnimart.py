@@ -0,0 +1,296 @@
+import argparse
+import os
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from CatalogUnimart import CompactCatalog, price_to_cents
+
+# Articles are stored under <root>/Subcategory=<name>/Type=<name>/, names are URI-encoded in the paths
+PARTITION_SCHEMA = pa.schema([('Subcategory', pa.string()), ('Type', pa.string())])
+ARTICLE_SCHEMA = pa.schema([
+    ('Brand', pa.string()),
+    ('Articule_Name', pa.string()),
+    ('Price_Cents', pa.int64()),
+    ('Offer_Price_Cents', pa.int64()),
+    ('Subcategory', pa.string()),
+    ('Type', pa.string()),
+])
+# Columns of the articles, the subcategory and type are the partition keys
+SHEET_COLUMNS = ['Brand', 'Articule_Name', 'Price_Cents', 'Offer_Price_Cents']
+COMPRESSION = 'zstd'
+ROW_GROUP_SIZE = 64 * 1024
+
+
+def _partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+
+def is_parquet_dataset(path):
+    """
+    Tell whether a directory holds a Parquet article dataset rather than Excel workbooks.
+
+    :param path: Directory to check.
+    :return: True if it contains Subcategory=<name> partitions.
+    """
+    return os.path.isdir(path) and any(entry.startswith('Subcategory=') for entry in os.listdir(path))
+
+
+def to_table(df, subcategory, type_name):
+    """
+    Convert a DataFrame with the scraper columns ('Brand', 'Articule_Name', 'Price', 'Offer_Price')
+    to an Arrow table with prices in integer cents.
+
+    :param df: DataFrame with the articles.
+    :param subcategory: Name of the subcategory, as stored in the database.
+    :param type_name: Name of the type (label) of the articles.
+    :return: The Arrow table.
+    """
+    offers = df['Offer_Price'] if 'Offer_Price' in df.columns else pd.Series([None] * len(df))
+    frame = pd.DataFrame({
+        'Brand': df['Brand'].astype(object).where(df['Brand'].notna(), None).to_numpy(),
+        'Articule_Name': df['Articule_Name'].astype(object).to_numpy(),
+        'Price_Cents': price_to_cents(df['Price'].reset_index(drop=True)),
+        'Offer_Price_Cents': price_to_cents(offers.reset_index(drop=True)),
+        'Subcategory': subcategory,
+        'Type': type_name,
+    })
+    return pa.Table.from_pandas(frame, schema=ARTICLE_SCHEMA, preserve_index=False)
+
+
+def write_tables(tables, root):
+    """
+    Write Arrow tables to the dataset. Every call adds new files, existing files are never rewritten.
+    Rows are sorted by price inside each file so the row group statistics let readers skip price ranges.
+
+    :param tables: List of tables with ARTICLE_SCHEMA.
+    :param root: Directory of the dataset.
+    :return: None
+    """
+    if not tables:
+        return
+    table = pa.concat_tables(tables).sort_by([('Subcategory', 'ascending'), ('Type', 'ascending'),
+                                              ('Price_Cents', 'ascending')])
+    options = ds.ParquetFileFormat().make_write_options(compression=COMPRESSION, write_statistics=True)
+    ds.write_dataset(table, root, format='parquet', partitioning=_partitioning(), file_options=options,
+                     basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                     max_rows_per_group=ROW_GROUP_SIZE, min_rows_per_group=min(ROW_GROUP_SIZE, table.num_rows),
+                     existing_data_behavior='overwrite_or_ignore')
+
+
+class ParquetSink:
+    """
+    Scraper sink that collects the pages of a label and writes them as one Parquet file when the
+    scraper moves on to another label, so the dataset does not fill up with one small file per page.
+    """
+
+    def __init__(self, root):
+        """
+        :param root: Directory of the dataset.
+        """
+        self.root = root
+        self.key = None
+        self.tables = []
+        os.makedirs(root, exist_ok=True)
+
+    def __call__(self, df, subcategory, label):
+        # Excel file names use '_' for spaces, the dataset uses the subcategory name
+        key = (subcategory.replace('_', ' '), label)
+        if key != self.key:
+            self.close()
+            self.key = key
+        self.tables.append(to_table(df, *key))
+
+    def close(self):
+        """Write the pages collected so far."""
+        write_tables(self.tables, self.root)
+        self.tables = []
+
+
+def read_catalog(root, filters=None, columns=None):
+    """
+    Read the dataset into a compact catalog. Filters on Subcategory and Type only open the matching
+    partitions and filters on prices skip the row groups whose statistics are out of range.
+
+    :param root: Directory of the dataset.
+    :param filters: Optional filters in the pyarrow.parquet format, e.g. [('Price_Cents', '>=', 5000000)].
+    :param columns: Optional columns to read.
+    :return: The compact catalog.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=_partitioning())
+    expression = pq.filters_to_expression(filters) if filters else None
+    frame = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    for dimension in ('Subcategory', 'Type', 'Brand'):
+        if dimension in frame.columns:
+            frame[dimension] = frame[dimension].astype('category')
+    return CompactCatalog(frame)
+
+
+def partitions(root):
+    """
+    List the files of every subcategory and type from the directory layout, without reading any article.
+
+    :param root: Directory of the dataset.
+    :return: Dictionary (subcategory, type name) -> list of fragments, sorted by subcategory and type.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=_partitioning())
+    fragments = {}
+    for fragment in dataset.get_fragments():
+        partition = ds.get_partition_keys(fragment.partition_expression)
+        fragments.setdefault((partition['Subcategory'], partition['Type']), []).append(fragment)
+    return dict(sorted(fragments.items()))
+
+
+def iter_sheets(root, batch_size=ROW_GROUP_SIZE):
+    """
+    Yield the articles of every subcategory and type as Arrow record batches, one partition at a time, so the
+    dataset is never read whole and the prices stay in integer cents.
+
+    :param root: Directory of the dataset.
+    :param batch_size: Maximum number of articles of a batch.
+    :return: Generator of (subcategory, type name, RecordBatch with SHEET_COLUMNS); a batch never mixes two
+             types, and a type may span several batches.
+    """
+    for (subcategory, type_name), fragments in partitions(root).items():
+        for fragment in fragments:
+            for batch in fragment.to_batches(columns=SHEET_COLUMNS, batch_size=batch_size):
+                if batch.num_rows:
+                    yield subcategory, type_name, batch
+
+
+def convert_excel_directory(read_directory, root):
+    """
+    Convert the Articles_by_subcategory workbooks (one file per subcategory, one sheet per type) to the dataset.
+
+    :param read_directory: Directory with the Excel files.
+    :param root: Directory of the dataset.
+    :return: Number of articles converted.
+    """
+    converted = 0
+    for file in sorted(os.listdir(read_directory)):
+        if not (file.endswith('.xlsx') or file.endswith('.xls')):
+            continue
+        subcategory = file.replace('.xlsx', '').replace('.xls', '').replace('_', ' ')
+        xl = pd.ExcelFile(os.path.join(read_directory, file))
+        tables = [to_table(xl.parse(sheet_name, engine='openpyxl'), subcategory, sheet_name)
+                  for sheet_name in xl.sheet_names]
+        write_tables(tables, root)
+        converted += sum(table.num_rows for table in tables)
+        print(f"{file} converted")
+    return converted
+
+
+def export_to_excel(root, output_directory, filters=None):
+    """
+    Write the dataset back to Excel workbooks in the Articles_by_subcategory layout.
+
+    :param root: Directory of the dataset.
+    :param output_directory: Directory for the Excel files.
+    :param filters: Optional filters, as in `read_catalog`.
+    :return: Number of workbooks written.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    frame = read_catalog(root, filters).to_frame()
+    workbooks = 0
+    for subcategory, articles in frame.groupby('Subcategory', sort=True):
+        file_path = os.path.join(output_directory, subcategory.replace(' ', '_') + '.xlsx')
+        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+            for type_name, df in articles.groupby('Type', sort=True):
+                df[['Brand', 'Articule_Name', 'Price', 'Offer_Price']].to_excel(writer, sheet_name=type_name,
+                                                                                index=False)
+        workbooks += 1
+    return workbooks
+
+
+def describe(root):
+    """
+    Summarise the dataset from the Parquet footers only, without reading any article.
+
+    :param root: Directory of the dataset.
+    :return: DataFrame with the files, rows and price range of each subcategory and type.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=_partitioning())
+    rows = []
+    for fragment in dataset.get_fragments():
+        partition = ds.get_partition_keys(fragment.partition_expression)
+        metadata = fragment.metadata
+        price_column = metadata.schema.names.index('Price_Cents')
+        for group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(group).column(price_column).statistics
+            has_range = statistics is not None and statistics.has_min_max
+            rows.append((partition.get('Subcategory'), partition.get('Type'), fragment.path,
+                         metadata.row_group(group).num_rows,
+                         statistics.min if has_range else None, statistics.max if has_range else None))
+    stats = pd.DataFrame(rows, columns=['Subcategory', 'Type', 'file', 'rows', 'min_cents', 'max_cents'])
+    summary = stats.groupby(['Subcategory', 'Type']).agg(files=('file', 'nunique'), rows=('rows', 'sum'),
+                                                         min_price=('min_cents', 'min'), max_price=('max_cents', 'max'))
+    summary[['min_price', 'max_price']] = summary[['min_price', 'max_price']] / 100
+    return summary
+
+
+def benchmark(read_directory, root):
+    """
+    Time the conversion and reading of the same articles from Excel and from Parquet.
+
+    :param read_directory: Directory with the Excel files.
+    :param root: Empty directory for the dataset.
+    :return: Dictionary with the timings in seconds and the number of articles.
+    """
+    before = time.perf_counter()
+    excel_catalog = CompactCatalog.read_excel_directory(read_directory)
+    excel_read = time.perf_counter() - before
+
+    before = time.perf_counter()
+    convert_excel_directory(read_directory, root)
+    convert = time.perf_counter() - before
+
+    before = time.perf_counter()
+    parquet_catalog = read_catalog(root)
+    parquet_read = time.perf_counter() - before
+
+    before = time.perf_counter()
+    export_to_excel(root, os.path.normpath(root) + '_xlsx')
+    excel_write = time.perf_counter() - before
+
+    return {'articles': len(parquet_catalog), 'excel_articles': len(excel_catalog), 'excel_read': excel_read,
+            'excel_write': excel_write, 'parquet_convert': convert, 'parquet_read': parquet_read}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Parquet datasets of scraped articles.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='Convert Articles_by_subcategory workbooks to Parquet.')
+    convert_parser.add_argument('read_directory')
+    convert_parser.add_argument('root')
+
+    export_parser = subparsers.add_parser('export', help='Write a Parquet dataset back to Excel workbooks.')
+    export_parser.add_argument('root')
+    export_parser.add_argument('output_directory')
+    export_parser.add_argument('--subcategory', help='Only export this subcategory.')
+
+    describe_parser = subparsers.add_parser('describe', help='Show rows and price ranges from the file statistics.')
+    describe_parser.add_argument('root')
+
+    bench_parser = subparsers.add_parser('bench', help='Compare Excel and Parquet read and write times.')
+    bench_parser.add_argument('read_directory')
+    bench_parser.add_argument('root')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'convert':
+        print(f"{convert_excel_directory(args.read_directory, args.root)} articles converted")
+    elif args.command == 'export':
+        filters = [('Subcategory', '==', args.subcategory)] if args.subcategory else None
+        print(f"{export_to_excel(args.root, args.output_directory, filters)} workbooks written")
+    elif args.command == 'describe':
+        print(describe(args.root).to_string())
+    elif args.command == 'bench':
+        for name, value in benchmark(args.read_directory, args.root).items():
+            print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
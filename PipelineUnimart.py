@@ -0,0 +1,293 @@
+import argparse
+import math
+import queue
+import threading
+from datetime import date, datetime
+
+import psycopg2.extras
+
+import DataAnalysisUnimart as analysis
+import MetricsUnimart as metrics
+
+QUEUE_SIZE = 64  # pages waiting to be loaded before the scraper is made to wait
+BATCH_SIZE = 1000  # articles written per INSERT
+DIMENSIONS_LOCK = 4242  # advisory lock taken by writers that share the database with other nodes
+STOP_TIMEOUT = 300  # seconds the loader may take to write what is left in the queue once the scrape ends
+_STOP = object()
+
+
+def page_rows(df, subcategory, label):
+    """
+    Convert the DataFrame of a scraped page to the rows written by `BulkArticleWriter`.
+
+    :param df: DataFrame with the scraper columns.
+    :param subcategory: Name of the subcategory, with '_' or spaces.
+    :param label: Label of the articles.
+    :return: List of (subcategory, type name, brand, article name, price, offer price) tuples.
+    """
+    # Excel file names use '_' for spaces, the database uses the subcategory name
+    subcategory = subcategory.replace('_', ' ')
+    return [(subcategory, label, brand, name, price, offer)
+            for brand, name, price, offer in df[['Brand', 'Articule_Name', 'Price', 'Offer_Price']]
+            .itertuples(index=False, name=None)]
+
+
+def price_cents(price):
+    """Price in cents of a scraped cell, e.g. '₡12,345.00' -> 1234500, or None for an empty cell."""
+    if price is None or (isinstance(price, float) and math.isnan(price)):
+        return None
+    return analysis.clean_price_cents(price)
+
+
+class BulkArticleWriter:
+    """
+    Writes scraped articles to the database in batches, resolving brand and type IDs from in-memory
+    caches and creating the missing ones with one statement per batch. Prices are written on the article
+    in cents, and in the price history when the date of the scrape is given.
+    """
+
+    def __init__(self, db_manager, shared=False, observed_on=None):
+        """
+        :param db_manager: A connected instance of the database manager, used only by this writer.
+        :param shared: Set when other processes write to the same database at the same time; brands and
+                       types are then created under an advisory lock so no node creates them twice.
+        :param observed_on: Date the articles were scraped; their prices are recorded in PriceHistory in the
+                            transaction of their batch. None records nothing.
+        """
+        self.db_manager = db_manager
+        self.shared = shared
+        self.observed_on = observed_on
+        self.partition_ready = False
+        self.brands = {name: id_brand for id_brand, name in db_manager.fetch_all(
+            "SELECT ID_Brand, brand_name FROM Brand ORDER BY ID_Brand DESC;")}  # the first ID of a name wins
+        self.subcategories = {name: id_subcategory for id_subcategory, name in db_manager.fetch_all(
+            "SELECT ID_Subcategory, subcategory_name FROM Subcategory ORDER BY ID_Subcategory DESC;")}
+        self.types = {}  # (subcategory, type name) -> ID_Type
+
+    def _insert_missing(self, cur, query, values):
+        """Insert the values with one statement and return the (id, value) pairs created."""
+        if not values:
+            return []
+        return psycopg2.extras.execute_values(cur, query, [(value,) for value in values], fetch=True)
+
+    def _type_id(self, cur, subcategory, type_name):
+        key = (subcategory, type_name)
+        if key not in self.types:
+            cur.execute("SELECT ID_Type FROM Type T JOIN Subcategory S ON T.ID_Subcategory = S.ID_Subcategory "
+                        "WHERE S.subcategory_name = %s AND T.type_name = %s ORDER BY T.ID_Type LIMIT 1;", key)
+            row = cur.fetchone()
+            if row is None:
+                cur.execute("INSERT INTO Type (ID_Subcategory, type_name) VALUES (%s, %s) RETURNING ID_Type;",
+                            (self.subcategories.get(subcategory), type_name))
+                row = cur.fetchone()
+            self.types[key] = row[0]
+        return self.types[key]
+
+    def _refresh(self, cur, brands):
+        """Load the brands other nodes created since the cache was filled."""
+        cur.execute("SELECT ID_Brand, brand_name FROM Brand WHERE brand_name = ANY(%s) ORDER BY ID_Brand DESC;",
+                    (list(brands),))
+        self.brands.update({name: id_brand for id_brand, name in cur.fetchall()})
+
+    def write(self, rows, guard=None):
+        """
+        Write a batch of articles.
+
+        :param rows: List of (subcategory, type name, brand, article name, price, offer price) tuples,
+                     with prices as scraped, e.g. '₡12,345.00'.
+        :param guard: Optional callable run with the cursor at the start of the transaction; if it returns
+                      False nothing is written. Lets callers commit their own bookkeeping atomically with the batch.
+        :return: True if the batch was written.
+        """
+        cleaned = [(subcategory, type_name, brand, name, price_cents(price), price_cents(offer))
+                   for subcategory, type_name, brand, name, price, offer in rows]
+        missing_brands = set()
+        try:
+            # Create a cursor for database operations
+            cur = self.db_manager.conn.cursor()
+
+            if guard is not None and not guard(cur):
+                self.db_manager.conn.rollback()
+                return False
+
+            if self.shared:
+                # Held until the commit, so brands and types are created by one node at a time
+                cur.execute("SELECT pg_advisory_xact_lock(%s);", (DIMENSIONS_LOCK,))
+                self._refresh(cur, {row[2] for row in cleaned} - self.brands.keys())
+
+            missing_brands = {row[2] for row in cleaned} - self.brands.keys()
+            for id_brand, name in self._insert_missing(
+                    cur, "INSERT INTO Brand (brand_name) VALUES %s RETURNING ID_Brand, brand_name;", missing_brands):
+                self.brands[name] = id_brand
+
+            articles = analysis.unique_articles([
+                (self._type_id(cur, subcategory, type_name), self.brands[brand], price, offer, name)
+                for subcategory, type_name, brand, name, price, offer in cleaned])
+            # Articles already known by their type, brand and name keep their ID and get the new prices
+            inserted = psycopg2.extras.execute_values(cur, analysis.UPSERT_ARTICLES_QUERY, articles,
+                                                      page_size=BATCH_SIZE, fetch=True)
+            if self.observed_on is not None:
+                if not self.partition_ready:
+                    cur.execute("SELECT ensure_pricehistory_partition(%s);", (self.observed_on,))
+                    self.partition_ready = True
+                prices = [(id_article, cents, self.observed_on) for id_article, cents in inserted if cents is not None]
+                psycopg2.extras.execute_values(cur, analysis.INSERT_PRICE_HISTORY_QUERY, prices, page_size=BATCH_SIZE)
+                metrics.count('prices_recorded', len(prices))
+
+            # Commit the transaction to the database
+            self.db_manager.conn.commit()
+            return True
+
+        except Exception:
+            # In case of an error, rollback the transaction and forget the IDs created in it
+            self.db_manager.conn.rollback()
+            for name in missing_brands:
+                self.brands.pop(name, None)
+            self.types.clear()
+            self.partition_ready = False
+            raise
+
+        finally:
+            # Close the cursor
+            cur.close()
+
+
+class PipelinedLoader(threading.Thread):
+    """
+    Consumes scraped pages from a bounded queue and writes them to the database in batches while the
+    scraper keeps running. When the database falls behind the queue fills up and the scraper waits.
+    """
+
+    def __init__(self, writer, page_queue, batch_size=BATCH_SIZE):
+        super().__init__(name='pipelined-loader', daemon=True)
+        self.writer = writer
+        self.queue = page_queue
+        self.batch_size = batch_size
+        self.error = None
+        self.loaded = 0
+
+    def flush(self, batch):
+        if batch:
+            with metrics.span('db_load'):
+                self.writer.write(batch)
+            self.loaded += len(batch)
+            metrics.count('articles_loaded', len(batch))
+
+    def run(self):
+        batch = []
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+                batch.extend(item)
+                # Write as soon as a batch is full, or when the scraper has nothing else queued
+                if len(batch) >= self.batch_size or self.queue.empty():
+                    self.flush(batch)
+                    batch = []
+            self.flush(batch)
+        except Exception as e:
+            print(f"Error: {e}")
+            self.error = e
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        Tell the loader no page is coming and wait for it to write the queued ones. The end marker is only
+        offered while the loader is alive: a loader that died leaves a full queue nobody drains.
+
+        :param timeout: Seconds to wait for the loader to finish once it has the end marker.
+        """
+        while self.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=1)
+                break
+            except queue.Full:
+                metrics.count('queue_full_waits')
+        self.join(timeout)
+        if self.is_alive() and self.error is None:
+            self.error = TimeoutError(f"still writing after {timeout} s")
+
+
+class QueueSink:
+    """
+    Scraper sink that puts the articles of every page on the loader queue, blocking while the queue is full.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __call__(self, df, subcategory, label):
+        rows = page_rows(df, subcategory, label)
+        while True:
+            if self.loader.error is not None:
+                raise RuntimeError(f"The database loader stopped: {self.loader.error}")
+            try:
+                self.loader.queue.put(rows, timeout=1)
+                return
+            except queue.Full:
+                metrics.count('queue_full_waits')
+
+
+def run_pipelined(scraper, db_manager, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, keep_excel=False):
+    """
+    Scrape the store and load the articles into the database at the same time.
+
+    The categories and subcategories are discovered and loaded first; then every scraped page is pushed to
+    a bounded queue that a loader thread writes to the database in batches, so the total time is close to
+    the longest of scraping and loading instead of their sum.
+
+    :param scraper: An instance of UnimartScraper.
+    :param db_manager: A connected instance of the database manager, used by the loader thread.
+    :param queue_size: Number of pages that can wait in the queue.
+    :param batch_size: Number of articles per INSERT.
+    :param keep_excel: Also write the Excel files, as in the non-pipelined mode.
+    :return: Number of articles loaded.
+    """
+    scraper.discover_categories()
+    analysis.insert_category_from_excel(
+        db_manager, scraper.OUTPUT_DIRECTORY + scraper.MAIN_CATEGORIES_SUBFOLDER + scraper.MAIN_CATEGORIES_TITLE + '.xlsx')
+    analysis.insert_subcategory_from_excel(db_manager, scraper.MAIN_CATEGORIES_URLS_SUBCATEGORIES)
+
+    loader = PipelinedLoader(BulkArticleWriter(db_manager, observed_on=date.today()), queue.Queue(maxsize=queue_size), batch_size)
+    scraper.row_sinks = [QueueSink(loader)] + ([scraper.excel_sink] if keep_excel else [])
+    loader.start()
+    try:
+        scraper.get_articule_info()
+    finally:
+        loader.stop()
+        scraper.quit()
+    if loader.error is not None:
+        raise RuntimeError(f"The database loader stopped: {loader.error}")
+    return loader.loaded
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape Unimart and load the database at the same time.')
+    parser.add_argument('--root-url', help='Store to scrape, e.g. the fixture site.')
+    parser.add_argument('--output-directory', help='Directory for the category workbooks.')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--keep-excel', action='store_true')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--dbname', default='unimart')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='root')
+    parser.add_argument('--port', default='5432')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from ScrappingUnimart import UnimartScraper
+
+    args = parse_args()
+    metrics.configure_from_environment()
+    before = datetime.now()
+
+    db_manager = analysis.DatabaseManager(args.host, args.dbname, args.user, args.password, args.port)
+    db_manager.connect()
+    scraper = UnimartScraper(root_url=args.root_url, output_directory=args.output_directory)
+    loaded = run_pipelined(scraper, db_manager, args.queue_size, args.batch_size, args.keep_excel)
+    db_manager.disconnect()
+
+    print(f"{loaded} articles loaded in {datetime.now() - before}")
+    metrics.write_reports()
@@ -1,18 +1,61 @@
 from openpyxl.reader.excel import load_workbook
-from selenium import webdriver
 from selenium.common import NoSuchElementException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urljoin
 import pandas as pd
 import os
 import time
-import boto3
 from datetime import datetime
 from urllib.robotparser import RobotFileParser
 from openpyxl import load_workbook
+import MetricsUnimart as metrics
+from FrontierUnimart import build_frontier
+from ExtractionUnimart import DIV_WITH_ARTICLES, extract_articles
+from MenuUnimart import parse_mega_menu, subcategories_frame
+from DriverUnimart import MAX_PAGES_PER_SESSION, RSS_WATERMARK_MB, DriverManager
+from NavigationUnimart import NavigationError, ResilientNavigator
+from PaginationUnimart import PAGE_WORKERS, REQUEST_INTERVAL, PageFanOut, RequestPacer, parse_product_count, \
+    plan_page_urls
+import StorageUnimart as storage
+
+
+def iter_collection_urls(directory):
+    """
+    Goes through each Excel file of a MainCategories_urls_subcategories directory and yields the collections to scrape.
+
+    :param directory: Directory with one Excel file of subcategories and URLs per main category.
+    :return: Generator of (subcategory, label, url), with the subcategory as used in the Excel file names.
+    """
+    # List all files in the output directory
+    files = os.listdir(directory)
+
+    # Filter and get only Excel files
+    excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
+
+    for file in excelFiles:
+        print(file)
+        complete_path = os.path.join(directory, file)
+        print(complete_path)
+
+        # Read the Excel file
+        excel_df = pd.read_excel(complete_path, engine='openpyxl')
+
+        # Iterate through the dataframe columns in steps of 2 (since every pair is a value and a URL)
+        for i in range(0, excel_df.columns.size, 2):
+            value_header = excel_df.columns[i]
+            url_header = excel_df.columns[i + 1]
+            if value_header == "Marcas Populares":
+                continue
+
+            # Iterate through the dataframe rows
+            for _, row in excel_df.iterrows():
+                label = row[value_header]
+                url = row[url_header]
+                if pd.notna(label) and pd.notna(url) and not label.startswith("Ver Todo"):
+                    subcategory = value_header.replace("¿", "").replace("?", "").replace(" ", "_")
+                    yield subcategory, label, url
 
 
 class UnimartScraper:
@@ -34,88 +77,275 @@ class UnimartScraper:
     MAIN_CATEGORIES_SUBFOLDER='MainCategories\\'
     MAIN_CATEGORIES_URLS_SUBCATEGORIES=OUTPUT_DIRECTORY+MAIN_CATEGORIES_SUBFOLDER+ 'MainCategories_urls_subcategories\\'
     ARTICLES_BY_SUBCATEGORY_FOLDER=OUTPUT_DIRECTORY+'Articles_by_subcategory\\'
-    BUCKET = 'unimartbucket'  # Name of the S3 bucket for cloud storage
+    ARTICLES_PARQUET_FOLDER=OUTPUT_DIRECTORY+'Articles_parquet\\'  # Parquet dataset partitioned by subcategory and type
+    BUCKET = storage.BUCKET  # Name of the S3 bucket for cloud storage
     FILE_WITH_MAIN_URLS = 'MAIN_URLS.xlsx'  # Excel file containing main URLs
     # XPath for the main content div containing article details on the website
-    DIV_WITH_ARTICLES = (
-        "//*[contains(@class, 'boost-pfs-filter-products') and "
-        "contains(@class, 'boost-pfs-filter-product-item-layout-no-border') and "
-        "contains(@class, 'boost-pfs-filter-product-item-label-top_left') and "
-        "contains(@class, 'boost-pfs-filter-product-item-swatch_color_display_type_image_product') and "
-        "contains(@class, 'boost-pfs-filter-swatch-shape-circle') and "
-        "contains(@class, 'boost-pfs-filter-product-item-text-alignment-left')]"
-    )
+    DIV_WITH_ARTICLES = DIV_WITH_ARTICLES
     # XPath to locate the bottom pagination div on the website
     BOTTOM_DIV = '//div[contains(@class, "boost-pfs-filter-bottom-pagination") and contains(@class, "boost-pfs-filter-bottom-pagination-default") and @style="display: block;"]'
     # XPath for the link to navigate to the next page
     NEXT_PAGE_LINK = './ul/li[not(contains(@class, "boost-pfs-filter-pagination-disabled"))]/a[normalize-space(.)="→"]'
-
-    def __init__(self):
+    # XPath for the links of the pagination, numbered pages and arrows
+    PAGE_LINKS = './ul/li/a'
+    # XPath for the total number of products of the collection, shown above the grid
+    PRODUCT_COUNT = '//*[contains(@class, "boost-pfs-filter-total-product")]'
+    # Seconds to wait for the JavaScript of the menus; the pages are waited for with navigator.wait_until
+    MENU_OPEN_DELAY = 5
+    MENU_CLOSE_DELAY = 3
+
+    def __init__(self, root_url=None, output_directory=None, row_sinks=None, output_formats=('excel',),
+                 archive_directory=None, max_pages_per_session=MAX_PAGES_PER_SESSION,
+                 rss_watermark_mb=RSS_WATERMARK_MB, driver_log=None, page_workers=PAGE_WORKERS,
+                 request_interval=REQUEST_INTERVAL):
         """
                Initializes the scraper with a headless Chrome browser session.
-               Sets up the WebDriver wait for explicit waits and initializes the S3 client for AWS operations.
-         """
 
-        # Set Chrome to run in headless mode for scraping without visual browser interface
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        self.driver = webdriver.Chrome(options=chrome_options)
+               :param root_url: Optional URL of the store to scrape instead of ROOT_URL, e.g. a local fixture site.
+               :param output_directory: Optional directory to store the Excel files instead of OUTPUT_DIRECTORY.
+               :param row_sinks: Optional callables that receive the articles of every scraped page as
+                                 (dataframe, subcategory, label). By default the pages are saved to Excel.
+               :param output_formats: Formats written by the default sinks, 'excel' and/or 'parquet'.
+               :param archive_directory: Optional directory where the HTML of every scraped page is archived,
+                                         so the articles can be extracted again later without crawling.
+               :param max_pages_per_session: Pages after which the Chrome session is replaced by a fresh one.
+               :param rss_watermark_mb: Memory of the Chrome session in MB above which it is replaced.
+               :param driver_log: Optional JSON lines file with the pages, memory and latencies of every session.
+               :param page_workers: Browser sessions loading the pages of a collection at the same time.
+               :param request_interval: Seconds between two page requests to the store, across every session.
+         """
+        if root_url is not None:
+            self.ROOT_URL = root_url
+            self.ROBOTS_URL = urljoin(root_url, 'robots.txt')
+        if output_directory is not None:
+            self.OUTPUT_DIRECTORY = os.path.join(output_directory, '')
+            self.MAIN_CATEGORIES_SUBFOLDER = os.path.join('MainCategories', '')
+            self.MAIN_CATEGORIES_URLS_SUBCATEGORIES = os.path.join(
+                output_directory, 'MainCategories', 'MainCategories_urls_subcategories', '')
+            self.ARTICLES_BY_SUBCATEGORY_FOLDER = os.path.join(output_directory, 'Articles_by_subcategory', '')
+            self.ARTICLES_PARQUET_FOLDER = os.path.join(output_directory, 'Articles_parquet', '')
+            os.makedirs(self.MAIN_CATEGORIES_URLS_SUBCATEGORIES, exist_ok=True)
+            os.makedirs(self.ARTICLES_BY_SUBCATEGORY_FOLDER, exist_ok=True)
+
+        if row_sinks is None:
+            row_sinks = []
+            if 'excel' in output_formats:
+                row_sinks.append(self.excel_sink)
+            if 'parquet' in output_formats:
+                # pyarrow is only needed when the Parquet output is requested
+                from ParquetUnimart import ParquetSink
+                row_sinks.append(ParquetSink(self.ARTICLES_PARQUET_FOLDER))
+        self.row_sinks = row_sinks
+
+        self.archive = None
+        if archive_directory is not None:
+            # zstandard is only needed when the pages are archived
+            from ArchiveUnimart import PageArchive
+            self.archive = PageArchive(archive_directory)
+
+        # Headless Chrome sessions, recycled after max_pages pages or above the memory watermark and
+        # replaced when they crash
+        self.driver_settings = {'max_pages': max_pages_per_session, 'rss_watermark_mb': rss_watermark_mb,
+                                'log_path': driver_log}
+        self.drivers = DriverManager(**self.driver_settings)
+
+        # Page loads and waits with deadlines, retries with backoff and a circuit breaker per host
+        self.navigator = ResilientNavigator(None, drivers=self.drivers)
+        # Sessions loading the pages of a collection concurrently, started with the first collection that
+        # has more than one page
+        self.page_workers = max(1, page_workers)
+        # Spaces the page requests of every session, the main one included
+        self.pacer = RequestPacer(request_interval)
+        self.page_drivers = []
+        self.fan_out = None
+        # S3 client for Amazon Web Services, created by the first upload
+        self.s3 = None
+
+    @property
+    def driver(self):
+        """The WebDriver of the current Chrome session; it changes when the session is recycled."""
+        return self.drivers.driver
+
+    def quit(self):
+        """
+        Close the Chrome sessions and print the pages, memory and latencies of every session of the run.
+        """
+        for drivers in [self.drivers] + self.page_drivers:
+            drivers.quit()
+            print('\n'.join(drivers.summary()))
 
-        # Setup explicit wait with a maximum of 10 seconds for elements to become available
-        self.wait = WebDriverWait(self.driver, 10)
-        # Initialize the S3 client for Amazon Web Services
-        self.s3 = boto3.client('s3')
+    def page_fan_out(self):
+        """
+        The sessions loading the pages of a collection concurrently: the main session and page_workers - 1
+        more, sharing its retry budget and circuit breakers and spaced by one request pacer.
 
-    def scrape_product_details_from_url(self, subcategory, label, url):
+        :return: The PageFanOut.
+        """
+        if self.fan_out is None:
+            navigators = [self.navigator]
+            for _ in range(self.page_workers - 1):
+                drivers = DriverManager(**self.driver_settings)
+                self.page_drivers.append(drivers)
+                navigators.append(ResilientNavigator(None, budget=self.navigator.budget, drivers=drivers,
+                                                     breakers=self.navigator.breakers))
+            self.fan_out = PageFanOut(navigators, self.pacer)
+        return self.fan_out
+
+    def scrape_product_details_from_url(self, subcategory, label, url, other_labels=()):
         """
             Navigates to the given URL, scrapes, and stores article details like brand, name, price, and offer price.
 
             :param subcategory: Name of the subcategory.
             :param label: Label of the article.
             :param url: Web page URL to scrape article details from.
+            :param other_labels: Other (subcategory, label) pairs the collection is listed under; its articles
+                                 are written under every one of them.
             """
-        df = pd.DataFrame(columns=['Brand', 'Articule_Name', 'Price', 'Offer_Price'])
+        labels = [(subcategory, label), *other_labels]
         # Navigate to the primary URL
-        self.driver.get(url)
-        time.sleep(15)
-        file_path = self.ARTICLES_BY_SUBCATEGORY_FOLDER + subcategory + '.xlsx'
+        self.load_page(url)
+        df = self.read_current_page(labels)
+        self.write_page_to_labels(df, labels)
+
+        # Build the URLs of every page from the first one and load them concurrently
+        page_urls = self.plan_pages(len(df))
+        if page_urls is not None:
+            metrics.count('pagination_planned')
+            for df in self.page_fan_out().map(
+                    page_urls, lambda navigator: self.read_current_page(labels, navigator)):
+                self.write_page_to_labels(df, labels)
+            return
+
+        # The number of pages is unknown, follow the link to the next page from page to page
+        metrics.count('pagination_followed')
+        next_page_url = self.next_page_url()
+        while next_page_url is not None:
+            # Navigate to the next page
+            self.load_page(next_page_url)
+            df = self.read_current_page(labels)
+            self.write_page_to_labels(df, labels)
+            next_page_url = self.next_page_url()
+
+    def load_page(self, url):
+        """
+        Load a page in the main session, once the request pacer allows it.
 
-        while True:
-            time.sleep(10)
+        :param url: URL of the page.
+        """
+        self.pacer.wait()
+        with metrics.span('page_fetch'):
+            self.navigator.get(url)
+        metrics.count('pages')
 
-            div_with_articles = self.wait.until(EC.visibility_of_element_located((By.XPATH, self.DIV_WITH_ARTICLES)))
+    def plan_pages(self, page_size):
+        """
+        Read the number of pages of the collection loaded in the browser, from the numbered pagination
+        links or from the product count, and build the URLs of the pages after the first one.
 
-            elements_with_class1 = div_with_articles.find_elements(By.XPATH,
-                                                                   './/div[contains(@class, "boost-pfs-filter-product-bottom-inner")]')
-            elements_with_class2 = div_with_articles.find_elements(By.XPATH,
-                                                                   './/div[contains(@class, "boost-pfs-filter-product-bottom")]')
+        :param page_size: Number of articles on the first page.
+        :return: List of URLs, empty for a single page, or None if the number of pages is unknown.
+        """
+        try:
+            element_bottom = self.driver.find_element(By.XPATH, self.BOTTOM_DIV)
+            page_links = [link.text for link in element_bottom.find_elements(By.XPATH, self.PAGE_LINKS)]
+        except NoSuchElementException:
+            page_links = []
+        counts = self.driver.find_elements(By.XPATH, self.PRODUCT_COUNT)
+        product_count = parse_product_count(counts[0].text) if counts else None
+        return plan_page_urls(self.driver.current_url, page_links, product_count, page_size)
+
+    def scrape_current_page(self, subcategory, label, other_labels=()):
+        """
+            Scrapes the articles of the page loaded in the browser and hands them to the sinks.
 
-            if elements_with_class1:
-                elements_to_process = elements_with_class1
-            else:
-                elements_to_process = elements_with_class2
+            :param subcategory: Name of the subcategory.
+            :param label: Label of the article.
+            :param other_labels: Other (subcategory, label) pairs the collection is listed under; its articles
+                                 are written under every one of them.
+            :return: URL of the next page, or None if this is the last page.
+            """
+        labels = [(subcategory, label), *other_labels]
+        df = self.read_current_page(labels)
+        self.write_page_to_labels(df, labels)
+        return self.next_page_url()
 
-            self.iterate_by_articule(elements_to_process, df)
-            self.save_to_excel(df, file_path, label)
+    def read_current_page(self, labels, navigator=None):
+        """
+        Wait for the articles of the page loaded in a browser session, archive the page and extract them.
 
-            try:
-                element_bottom = self.driver.find_element(By.XPATH, self.BOTTOM_DIV)
-                next_page = element_bottom.find_element(By.XPATH, self.NEXT_PAGE_LINK)
-                next_page_url = next_page.get_attribute('href')
+        :param labels: (subcategory, label) pairs the collection is listed under, the page is indexed in the
+                       archive under every one of them.
+        :param navigator: Navigator of the session, by default the main one.
+        :return: DataFrame with the articles of the page.
+        """
+        navigator = navigator or self.navigator
+        with metrics.span('wait'):
+            navigator.wait_until(EC.visibility_of_element_located((By.XPATH, self.DIV_WITH_ARTICLES)))
+        page_url, page_html = navigator.driver.current_url, navigator.driver.page_source
+
+        if self.archive is not None:
+            with metrics.span('archive'):
+                for subcategory, label in labels:
+                    self.archive.put(page_url, page_html, subcategory, label)
+
+        # The same extraction as the re-extraction of the archived pages, on the HTML of the page
+        with metrics.span('extraction'):
+            df = extract_articles(page_html)
+        metrics.count('products', len(df))
+        return df
+
+    def next_page_url(self):
+        """
+        Read the link to the next page of the page loaded in the browser.
+
+        :return: URL of the next page, or None if this is the last page.
+        """
+        try:
+            element_bottom = self.driver.find_element(By.XPATH, self.BOTTOM_DIV)
+            next_page = element_bottom.find_element(By.XPATH, self.NEXT_PAGE_LINK)
+            next_page_url = next_page.get_attribute('href')
+        except NoSuchElementException:
+            return None
+
+        if not next_page_url or not isinstance(next_page_url, str):
+            print("Invalid URL or Not Founded:", next_page_url)
+            return None
+        return next_page_url
+
+    def write_page(self, df, subcategory, label):
+        """
+        Hand the articles of one scraped page to every sink.
 
-                if not next_page_url or not isinstance(next_page_url, str):
-                    print("Invalid URL or Not Founded:", next_page_url)
-                    break
+        :param df: DataFrame with the articles of the page.
+        :param subcategory: Name of the subcategory, as used in the Excel file names.
+        :param label: Label of the articles.
+        """
+        with metrics.span('sink_write'):
+            for sink in self.row_sinks:
+                sink(df, subcategory, label)
 
-                # Navigate to the next page
-                self.driver.get(next_page_url)
-                print(self.driver.current_url)  # print the current next page
+    def write_page_to_labels(self, df, labels):
+        """
+        Hand the articles of one scraped page to every sink, once for every label of its collection.
 
-            except NoSuchElementException:
-                # break the loop
-                break
+        :param df: DataFrame with the articles of the page.
+        :param labels: (subcategory, label) pairs the collection is listed under.
+        """
+        for subcategory, label in labels:
+            self.write_page(df, subcategory, label)
+
+    def excel_sink(self, df, subcategory, label):
+        """
+        Append the articles of a page to the sheet of its label in the Excel file of its subcategory.
+
+        :param df: DataFrame with the articles of the page.
+        :param subcategory: Name of the subcategory, as used in the Excel file names.
+        :param label: Label of the articles, used as sheet name.
+        """
+        self.save_to_excel(df, self.ARTICLES_BY_SUBCATEGORY_FOLDER + subcategory + '.xlsx', label)
 
-    def save_to_excel(self, df, file_path, sheet_name):
+    @staticmethod
+    def save_to_excel(df, file_path, sheet_name):
         """
         Save the dataframe to an Excel file. If the file already exists, append the new dataframe to the end.
         If the specified sheet doesn't exist in an existing file, then create a new sheet with headers.
@@ -127,17 +357,15 @@ class UnimartScraper:
 
         # Check if the file already exists
         if os.path.exists(file_path):
-            try:
-                # Determine the last row using pandas
-                existing_df = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
-                startrow = existing_df.shape[0]
-                header = False  # Do not add headers since the sheet already exists
-            except ValueError:  # If the sheet doesn't exist in the file
-                startrow = 0
-                header = True  # Add headers since the sheet will be new
-
             # Write to the existing file
             with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
+                if sheet_name in writer.sheets:
+                    # max_row counts the header too, so the new rows start right after the last article
+                    startrow = writer.sheets[sheet_name].max_row
+                    header = False  # Do not add headers since the sheet already exists
+                else:  # If the sheet doesn't exist in the file
+                    startrow = 0
+                    header = True  # Add headers since the sheet will be new
                 df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=startrow, header=header)
 
         else:  # If the file doesn't exist
@@ -174,64 +402,37 @@ class UnimartScraper:
         :param self: Instance of the class.
         """
 
-        # List all files in the output directory
-        files = os.listdir(self.MAIN_CATEGORIES_URLS_SUBCATEGORIES)
-
-        # Filter and get only Excel files
-        excelFiles = [f for f in files if f.endswith('.xlsx') or f.endswith('.xls')]
-
-        for file in excelFiles:
-            print(file)
-            file_without_extension = file.replace(".xlsx", "")
-            complete_path = os.path.join(self.MAIN_CATEGORIES_URLS_SUBCATEGORIES, file)
-            print(complete_path)
-
-            # Read the Excel file
-            excel_df = pd.read_excel(complete_path, engine='openpyxl')
-
-            # Iterate through the dataframe columns in steps of 2 (since every pair is a value and a URL)
-            for i in range(0, excel_df.columns.size, 2):
-                value_header = excel_df.columns[i]
-                url_header = excel_df.columns[i + 1]
-                if value_header == "Marcas Populares":
-                    continue
-
-                # Iterate through the dataframe rows
-                for _, row in excel_df.iterrows():
-                    label = row[value_header]
-                    url = row[url_header]
-                    if pd.notna(label) and pd.notna(url) and not label.startswith("Ver Todo"):
-                        # Process each URL and extract article details
-                        subcategory = value_header.replace("¿", "").replace("?", "").replace(" ", "_")
-                        print(f"Processing: {subcategory} - {label} - {url}")
-                        self.scrape_product_details_from_url(subcategory, label, url)
+        # A collection linked from several menus, or with other tracking or sort parameters, is fetched once
+        # and its articles are written under every label it is listed under
+        for url, labels in build_frontier(self.iter_collection_urls()):
+            (subcategory, label), other_labels = labels[0], labels[1:]
+            # Process each URL and extract article details
+            listed = '; '.join(f"{name} - {text}" for name, text in labels)
+            print(f"Processing: {listed} - {url}")
+            try:
+                self.scrape_product_details_from_url(subcategory, label, url, other_labels)
+            except NavigationError as e:
+                # A collection that keeps failing is skipped instead of aborting the whole run
+                print(f"Error: {e}")
+                metrics.count('collections_failed')
 
-    def iterate_by_articule(self, elements_with_class, dataframe):
+        self.close_sinks()
 
+    def iter_collection_urls(self):
         """
-            Iterates over given elements, extracts, and stores article details.
+        Goes through each Excel file of MAIN_CATEGORIES_URLS_SUBCATEGORIES and yields the collections to scrape.
 
-            :param elements_with_class: Web page elements containing article details.
-            :param dataframe: DataFrame to store article details.
-            """
+        :return: Generator of (subcategory, label, url), with the subcategory as used in the Excel file names.
+        """
+        return iter_collection_urls(self.MAIN_CATEGORIES_URLS_SUBCATEGORIES)
 
-        for element in elements_with_class:
-            a_class_list = element.find_elements(By.TAG_NAME, "a")
-            span_money = element.find_elements(By.CSS_SELECTOR, "span.money")
-            offer = None
-            brand = a_class_list[0].text
-            articule_name = a_class_list[1].text
-            if len(span_money) > 1:
-                price = span_money[0].text
-                offer = span_money[1].text
-            else:
-                price = span_money[0].text
-
-            print("brand: " + brand)
-            print("article_name: " + articule_name)
-            print("price: " + price)
-            dataframe.loc[len(dataframe)] = [brand, articule_name, price, offer]
-            print("+++++++++++++++++++++++++++++++")
+    def close_sinks(self):
+        """
+        Let the sinks that buffer pages, such as the Parquet sink, write what they still hold.
+        """
+        for sink in self.row_sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
 
     def get_access_to_root_page(self):
         """
@@ -342,7 +543,7 @@ class UnimartScraper:
 
             # Find the associated content by ID after the click
             elementID = self.driver.find_element(By.ID, data_link)
-            time.sleep(5)  # Allow some time for the content to load/display
+            time.sleep(self.MENU_OPEN_DELAY)  # Allow some time for the content to load/display
 
             # Extract all the subcategory elements under the main category
             element_divs = elementID.find_elements(By.XPATH,
@@ -351,7 +552,7 @@ class UnimartScraper:
             # Extract details (like URLs) from the subcategories and save to the dataframe
             self.extract_subcategories_and_urls(element_divs, df)
 
-            time.sleep(3)  # Pause for a moment before proceeding
+            time.sleep(self.MENU_CLOSE_DELAY)  # Pause for a moment before proceeding
             li.click()  # Click again to collapse the category (or navigate back)
 
             # Save the dataframe to an Excel file named after the main category
@@ -369,52 +570,77 @@ class UnimartScraper:
         if directory is None:
             directory = self.OUTPUT_DIRECTORY
 
-        # Iterate over files and directories in the given directory
-        for archivo in os.listdir(directory):
-            complete_path = os.path.join(directory, archivo)
+        if self.s3 is None:
+            self.s3 = storage.s3_client()
+        storage.upload_directory(directory, self.BUCKET, self.OUTPUT_DIRECTORY, self.s3)
 
-            # If it's a file, upload it to S3
-            if os.path.isfile(complete_path):
-                # Calculate the relative path to keep the directory structure in S3
-                s3_path = os.path.relpath(complete_path, self.OUTPUT_DIRECTORY)
+    def scrape_unimart(self):
+        """
+        Orchestrates the scraping process for the Unimart website: discovers the categories,
+        scrapes the articles of every subcategory and closes the browser session.
+        """
+        self.discover_categories()
 
-                # Replace backslashes with slashes for S3 paths and upload
-                self.s3.upload_file(complete_path, self.BUCKET, s3_path.replace("\\", "/"))
+        # Start the main scraping method of the scraper
+        self.get_articule_info()
 
-                # Print a confirmation message
-                print(f'{complete_path} has been successfully uploaded to {self.BUCKET}/{s3_path}')
+        # Page load latencies and circuit states of the run
+        print('\n'.join(self.navigator.summary()))
 
-            # If it's a directory, call the function recursively to process its contents
-            elif os.path.isdir(complete_path):
-                self.uploadtoS3(directory=complete_path)
+        # Closes the browser session after scraping
+        self.quit()
 
-    def scrape_unimart(self):
+    def discover_categories(self):
         """
-        Orchestrates the scraping process for the Unimart website. It follows these steps:
+        Discovers the categories of the Unimart website. It follows these steps:
         1. Navigate to the Unimart root URL.
         2. Wait for the main navigation to be accessible.
-        3. Extract main category names from the navigation.
-        4. Save main category names to an Excel file.
-        5. Extract data-links associated with main categories.
-        6. Extract individual list items corresponding to main categories.
-        7. Execute scraping for the list items using their data-links.
+        3. Take one snapshot of the page, the data-link mega-menu panels are already in it.
+        4. Parse the main categories, subcategories, labels and URLs from the snapshot.
+        5. Save main category names to an Excel file.
+        6. Save the subcategories and URLs of every main category to its Excel file.
+        If the snapshot has no panels, e.g. because the website starts loading them on click, the menus are
+        opened one by one instead.
         """
 
         # Navigate to the Unimart root URL
-        self.driver.get(self.ROOT_URL)
+        self.navigator.get(self.ROOT_URL)
 
         # Wait until the main navigation section is accessible
         self.get_access_to_root_page()
 
-        # Find and extract the main navigation element by its ID
-        nav = self.driver.find_element(By.ID, self.ROOT_NAV_ID)
-
-        # Extract main category names from the navigation
-        main_categories = self.get_categories_from_nav(nav)
+        # Parse the whole menu from a single snapshot of the page, instead of clicking every main category
+        with metrics.span('discovery'):
+            menu = parse_mega_menu(self.driver.page_source, self.driver.current_url)
+        main_categories = [category for category, _, _ in menu]
+        if not main_categories:
+            # No data-link in the snapshot, fall back to the visible text of the navigation
+            main_categories = self.get_categories_from_nav(self.driver.find_element(By.ID, self.ROOT_NAV_ID))
 
         # Save the extracted main category names to an Excel file
         self.create_excel_with_main_categories(main_categories)
 
+        # Exclude the "Regalos" and "Ofertas" categories, they are always the last two of the menu
+        menu = menu[:-2]
+        if not any(subcategories for _, _, subcategories in menu):
+            self.discover_categories_by_clicking(main_categories)
+            return
+
+        for category, _, subcategories in menu:
+            # Save the dataframe to an Excel file named after the main category
+            subcategories_frame(subcategories).to_excel(self.MAIN_CATEGORIES_URLS_SUBCATEGORIES + category + '.xlsx',
+                                                        sheet_name=category, index=False)
+
+    def discover_categories_by_clicking(self, main_categories):
+        """
+        Discovers the subcategories by opening the menu of every main category and reading its panel once it is
+        displayed. Much slower than the snapshot of `discover_categories`, which it backs up.
+
+        :param main_categories: List of main category names.
+        """
+        # Find and extract the main navigation element by its ID
+        nav = self.driver.find_element(By.ID, self.ROOT_NAV_ID)
+
         # Extract data-links associated with main categories
         data_links = self.get_data_links(nav)
 
@@ -427,21 +653,20 @@ class UnimartScraper:
         # Initiate the scraping process for the list items using their associated data-links
         self.get_elements_by_data_links(list_li_categories, data_links, main_categories)
 
-        # Start the main scraping method of the scraper
-        self.get_articule_info()
-
-        # Commented line: Closes the browser session after scraping
-        self.driver.quit()
-
 
 if __name__ == "__main__":
     # Ensure the script is being run as the main program (not imported elsewhere)
 
+    # Optional stage timings, e.g. UNIMART_METRICS_TRACE=scrape-{run}.json
+    metrics.configure_from_environment()
+
     # Record the current datetime before starting the scraping process for performance measurement
     before = datetime.now()
 
     # Instantiate the UnimartScraper class
     scraper = UnimartScraper()
+    # Write the articles as Parquet too, e.g. for faster loading in DataAnalysisUnimart.py
+    #scraper = UnimartScraper(output_formats=('excel', 'parquet'))
 
     # Start scrapping
     scraper.scrape_unimart()
@@ -452,6 +677,7 @@ if __name__ == "__main__":
 
     # Print the duration it took for the scraping process to complete
     print(after - before)
+    metrics.write_reports()
 
     # Commented lines: additional methods that could be called on the scraper instance
     # scraper.readFirstUrls()  # Potentially read and process URLs from an initial set
@@ -0,0 +1,156 @@
+import re
+import unicodedata
+
+import numpy as np
+
+NGRAM_SIZE = 3
+MIN_SCORE = 0.3  # Same default threshold as pg_trgm
+
+
+def normalize_text(text):
+    """
+    Lowercase a name and remove accents and punctuation, e.g. 'Audífonos Xiaomi-Redmi' -> 'audifonos xiaomi redmi'.
+
+    :param text: Text to normalise.
+    :return: The normalised text.
+    """
+    ascii_text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', ' ', ascii_text.lower()).strip()
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """
+    Split a text into the set of n-grams of its words, padded like pg_trgm so word starts weigh more.
+
+    :param text: Text to split.
+    :param n: Size of the n-grams.
+    :return: Set of n-grams.
+    """
+    grams = set()
+    for word in normalize_text(text).split():
+        padded = ' ' * (n - 1) + word + ' '
+        grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def search_name(name, brand=None):
+    """
+    Text an article is searched by: its brand and its name, as Article.search_name, e.g. 'JBL Audífonos Tune 510BT'.
+
+    :param name: Name of the article.
+    :param brand: Brand name, None or NaN when the article has none.
+    :return: The text to index.
+    """
+    return f"{brand} {name}" if isinstance(brand, str) else str(name)
+
+
+class NgramIndex:
+    """
+    In-memory n-gram index over the brand and name of the articles for the embedded/offline path, when there
+    is no database with the trigram index. Scores follow pg_trgm word_similarity: the share of the n-grams of
+    the query found in the brand and name.
+    """
+
+    def __init__(self, n=NGRAM_SIZE):
+        self.n = n
+        self.names = []
+        self.prices = []
+        self._sizes = []  # number of distinct n-grams of each brand and name
+        self._postings = {}  # n-gram -> list of document positions, frozen to arrays on first search
+        self._frozen = None
+        self._facets = {'brand': [], 'category': [], 'subcategory': []}
+
+    def add(self, name, price=None, brand=None, category=None, subcategory=None):
+        """
+        Add an article to the index.
+
+        :param name: Name of the article.
+        :param price: Optional price of the article.
+        :param brand: Optional brand name.
+        :param category: Optional category name.
+        :param subcategory: Optional subcategory name.
+        :return: Position of the article in the index.
+        """
+        position = len(self.names)
+        self.names.append(name)
+        self.prices.append(price)
+        self._facets['brand'].append(brand)
+        self._facets['category'].append(category)
+        self._facets['subcategory'].append(subcategory)
+        grams = ngrams(search_name(name, brand), self.n)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+        self._frozen = None
+        return position
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build an index from a DataFrame with the scraper columns ('Articule_Name', 'Brand', 'Price') and
+        optionally 'Category' and 'Subcategory'.
+
+        :param df: DataFrame with the articles.
+        :return: The index.
+        """
+        index = cls()
+        categories = df['Category'] if 'Category' in df.columns else [None] * len(df)
+        subcategories = df['Subcategory'] if 'Subcategory' in df.columns else [None] * len(df)
+        for name, price, brand, category, subcategory in zip(df['Articule_Name'], df['Price'], df['Brand'],
+                                                             categories, subcategories):
+            index.add(name, price, brand, category, subcategory)
+        return index
+
+    def _freeze(self):
+        if self._frozen is None:
+            postings = {gram: np.asarray(positions, dtype=np.int32) for gram, positions in self._postings.items()}
+            facets = {}
+            for facet, values in self._facets.items():
+                codes, uniques = {}, []
+                for value in values:
+                    if value not in codes:
+                        codes[value] = len(uniques)
+                        uniques.append(value)
+                facets[facet] = (codes, np.asarray([codes[value] for value in values], dtype=np.int32))
+            self._frozen = (postings, facets, np.asarray(self._sizes, dtype=np.int32))
+        return self._frozen
+
+    def search(self, text, category=None, subcategory=None, brand=None, limit=20, min_score=MIN_SCORE):
+        """
+        Search articles by a partial or misspelled brand and name.
+
+        :param text: Text to search, e.g. 'xiaomi redmi 12'.
+        :param category: Optional category name to filter by.
+        :param subcategory: Optional subcategory name to filter by.
+        :param brand: Optional brand name to filter by.
+        :param limit: Maximum number of results.
+        :param min_score: Minimum share of the n-grams of the query the brand and name of an article must contain.
+        :return: List of (position, article name, brand, category, subcategory, price, score) tuples, best first.
+        """
+        query_grams = ngrams(text, self.n)
+        if not query_grams or not self.names:
+            return []
+        postings, facets, sizes = self._freeze()
+
+        # Count the n-grams of the query found in each article in one vectorised pass
+        matches = [postings[gram] for gram in query_grams if gram in postings]
+        if not matches:
+            return []
+        shared = np.bincount(np.concatenate(matches), minlength=len(self.names))
+        scores = shared / len(query_grams)
+
+        for facet, value in (('category', category), ('subcategory', subcategory), ('brand', brand)):
+            if value is not None:
+                codes, column = facets[facet]
+                if value not in codes:
+                    return []
+                scores[column != codes[value]] = 0
+
+        candidates = np.flatnonzero(scores >= min_score)
+        # Ties on the query score go to the closest brand and name overall, n-grams shared over n-grams of either,
+        # e.g. 'Redmi 12' before 'Redmi 112 Pro'
+        similarity = shared[candidates] / (len(query_grams) + sizes[candidates] - shared[candidates])
+        ranked = np.lexsort((-similarity, -scores[candidates]))[:limit]
+        candidates = candidates[ranked]
+        return [(int(i), self.names[i], self._facets['brand'][i], self._facets['category'][i],
+                 self._facets['subcategory'][i], self.prices[i], round(float(scores[i]), 4)) for i in candidates]
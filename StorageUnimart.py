@@ -0,0 +1,48 @@
+import os
+
+BUCKET = 'unimartbucket'  # Name of the S3 bucket for cloud storage
+
+
+def s3_client():
+    # boto3 takes a while to import, only pay for it when something is uploaded
+    import boto3
+    return boto3.client('s3')
+
+
+def upload_directory(directory, bucket=BUCKET, base_directory=None, s3=None):
+    """
+    Uploads the files of a directory and its subdirectories to an Amazon S3 bucket, preserving the
+    directory structure.
+
+    :param directory: The directory path to look for files.
+    :param bucket: Name of the S3 bucket.
+    :param base_directory: Directory the S3 keys are relative to, by default `directory` itself.
+    :param s3: Optional S3 client, created when not given.
+    :return: Number of files uploaded.
+    """
+    if base_directory is None:
+        base_directory = directory
+    if s3 is None:
+        s3 = s3_client()
+
+    uploaded = 0
+    # Iterate over files and directories in the given directory
+    for archivo in os.listdir(directory):
+        complete_path = os.path.join(directory, archivo)
+
+        # If it's a file, upload it to S3
+        if os.path.isfile(complete_path):
+            # Calculate the relative path to keep the directory structure in S3
+            s3_path = os.path.relpath(complete_path, base_directory)
+
+            # Replace backslashes with slashes for S3 paths and upload
+            s3.upload_file(complete_path, bucket, s3_path.replace("\\", "/"))
+            uploaded += 1
+
+            # Print a confirmation message
+            print(f'{complete_path} has been successfully uploaded to {bucket}/{s3_path}')
+
+        # If it's a directory, call the function recursively to process its contents
+        elif os.path.isdir(complete_path):
+            uploaded += upload_directory(complete_path, bucket, base_directory, s3)
+    return uploaded
@@ -0,0 +1,21 @@
+-- Indexes on the join columns used by every statistics query.
+-- Article(ID_Type) also carries the brand and price ids so the Type -> Article join can be answered from the index.
+
+CREATE INDEX IF NOT EXISTS idx_article_id_type ON Article(ID_Type) INCLUDE (ID_Brand, ID_Price);
+
+CREATE INDEX IF NOT EXISTS idx_article_id_brand ON Article(ID_Brand);
+
+CREATE INDEX IF NOT EXISTS idx_article_id_price ON Article(ID_Price);
+
+CREATE INDEX IF NOT EXISTS idx_type_id_subcategory ON Type(ID_Subcategory);
+
+CREATE INDEX IF NOT EXISTS idx_subcategory_id_category ON Subcategory(ID_Category);
+
+-- Lets the Article -> Price join and the most expensive articles read the price without touching the table
+CREATE INDEX IF NOT EXISTS idx_price_id_price_covering ON Price(ID_Price) INCLUDE (Price);
+
+CREATE INDEX IF NOT EXISTS idx_pricehistory_id_article ON PriceHistory(ID_Article);
+
+CREATE INDEX IF NOT EXISTS idx_offerprice_id_article ON OfferPrice(ID_Article);
+
+ANALYZE;
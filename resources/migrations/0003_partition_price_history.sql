@@ -0,0 +1,45 @@
+-- PriceHistory grows by catalog size x scrape runs, so it is partitioned by month on DateChanged.
+-- Monthly partitions are created on demand by ensure_pricehistory_partition(); rows outside of them land in
+-- the default partition.
+
+CREATE OR REPLACE FUNCTION ensure_pricehistory_partition(day DATE) RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', day)::date;
+    partition_name TEXT := 'pricehistory_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF PriceHistory FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, month_start, (month_start + INTERVAL '1 month')::date);
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE PriceHistory RENAME TO PriceHistory_old;
+
+CREATE TABLE PriceHistory (
+    ID_History INTEGER NOT NULL DEFAULT nextval('pricehistory_id_history_seq'),
+    ID_Article INTEGER REFERENCES Article(ID_Article) ON DELETE CASCADE,
+    ID_Price INTEGER REFERENCES Price(ID_Price) ON DELETE SET NULL,
+    DateChanged DATE NOT NULL,
+    Notes TEXT,
+    PRIMARY KEY (ID_History, DateChanged)
+) PARTITION BY RANGE (DateChanged);
+
+CREATE TABLE PriceHistory_default PARTITION OF PriceHistory DEFAULT;
+
+-- Series of one article: bounded B-tree range scan, the price id is read from the index
+CREATE INDEX idx_pricehistory_article_date ON PriceHistory(ID_Article, DateChanged) INCLUDE (ID_Price);
+
+-- Date range scans across all articles: BRIN stays tiny because rows arrive in date order
+CREATE INDEX idx_pricehistory_date_brin ON PriceHistory USING BRIN (DateChanged);
+
+SELECT ensure_pricehistory_partition(month)
+FROM (SELECT DISTINCT date_trunc('month', DateChanged)::date AS month FROM PriceHistory_old) AS months;
+
+INSERT INTO PriceHistory (ID_History, ID_Article, ID_Price, DateChanged, Notes)
+SELECT ID_History, ID_Article, ID_Price, DateChanged, Notes FROM PriceHistory_old;
+
+ALTER SEQUENCE pricehistory_id_history_seq OWNED BY PriceHistory.ID_History;
+
+DROP TABLE PriceHistory_old;
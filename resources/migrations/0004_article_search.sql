@@ -0,0 +1,9 @@
+-- Fuzzy and full-text search on article names. idx_article_name only helps exact and prefix matches.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Partial and misspelled names: similarity and word_similarity operators (%, <%)
+CREATE INDEX IF NOT EXISTS idx_article_name_trgm ON Article USING GIN (article_name gin_trgm_ops);
+
+-- Whole words in any order, e.g. 'redmi xiaomi'
+CREATE INDEX IF NOT EXISTS idx_article_name_fts ON Article USING GIN (to_tsvector('simple', article_name));
@@ -0,0 +1,6 @@
+-- The same product is listed under several labels and subcategories. ID_Canonical points every listing to the
+-- canonical article of its product (see DeduplicationUnimart.py) so counts can be computed on distinct products.
+
+ALTER TABLE Article ADD COLUMN IF NOT EXISTS ID_Canonical INTEGER REFERENCES Article(ID_Article) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_article_id_canonical ON Article(ID_Canonical);
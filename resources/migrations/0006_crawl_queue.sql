@@ -0,0 +1,24 @@
+-- Shared work queue for distributed crawls (see DistributedCrawlUnimart.py). Every row is one page to scrape:
+-- the first page of a collection or a following page found while scraping. Nodes claim rows with
+-- FOR UPDATE SKIP LOCKED and hold them under a lease; a row whose lease expired is claimed again.
+
+CREATE TABLE IF NOT EXISTS CrawlTask (
+    ID_Task BIGSERIAL PRIMARY KEY,
+    run_id VARCHAR(64) NOT NULL,
+    kind VARCHAR(16) NOT NULL,  -- 'collection' or 'page'
+    subcategory_name VARCHAR(255) NOT NULL,
+    label VARCHAR(255) NOT NULL,
+    url TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',  -- 'pending', 'leased', 'done' or 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_by VARCHAR(255),
+    lease_expires TIMESTAMPTZ,
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    products INTEGER,
+    error TEXT,
+    UNIQUE (run_id, subcategory_name, label, url)
+);
+
+-- Claims only look at the open rows of a run, in queue order
+CREATE INDEX IF NOT EXISTS idx_crawltask_open ON CrawlTask(run_id, ID_Task) WHERE status IN ('pending', 'leased');
@@ -0,0 +1,12 @@
+-- OfferPrice keeps one row per period an article was on offer at a price (see OffersUnimart.py).
+-- StartDate is the first day the offer was seen and EndDate the first day it was no longer seen;
+-- an offer still running has no EndDate.
+
+ALTER TABLE OfferPrice ADD CONSTRAINT offerprice_dates_check CHECK (EndDate IS NULL OR EndDate > StartDate);
+
+-- At most one running offer per article, the loader relies on it to open new offers with ON CONFLICT
+CREATE UNIQUE INDEX IF NOT EXISTS idx_offerprice_open ON OfferPrice(ID_Article) WHERE EndDate IS NULL;
+
+-- "Offers active on a date" is a containment query on the offer period. A GiST index on the range answers it
+-- without scanning the whole history; a NULL EndDate is an unbounded upper end.
+CREATE INDEX IF NOT EXISTS idx_offerprice_period ON OfferPrice USING GIST (daterange(StartDate, EndDate, '[)'));
@@ -0,0 +1,39 @@
+-- Prices are stored where they are read: Article keeps its price and its current offer price, and PriceHistory
+-- the observed price, as integer cents (see DataAnalysisUnimart.clean_price_cents). The Price dimension only
+-- added a join to every statistic and a lookup per row to the ingest, two listings never share a price row
+-- in any useful way, so it is dropped once its values are copied.
+
+ALTER TABLE Article
+    ADD COLUMN IF NOT EXISTS price_cents BIGINT,
+    ADD COLUMN IF NOT EXISTS offer_price_cents BIGINT;
+
+UPDATE Article A SET price_cents = ROUND(P.Price * 100)
+FROM Price P
+WHERE A.ID_Price = P.ID_Price;
+
+-- The offer running on an article is its current offer price
+UPDATE Article A SET offer_price_cents = ROUND(O.Price * 100)
+FROM OfferPrice O
+WHERE O.ID_Article = A.ID_Article AND O.EndDate IS NULL;
+
+ALTER TABLE PriceHistory ADD COLUMN IF NOT EXISTS price_cents BIGINT;
+
+UPDATE PriceHistory H SET price_cents = ROUND(P.Price * 100)
+FROM Price P
+WHERE H.ID_Price = P.ID_Price;
+
+-- Dropping the columns also drops idx_article_id_type, idx_article_id_price and idx_pricehistory_article_date
+ALTER TABLE Article DROP COLUMN ID_Price;
+ALTER TABLE PriceHistory DROP COLUMN ID_Price;
+DROP TABLE Price;
+
+-- The Type -> Article join of the statistics reads the brand and the price from the index
+CREATE INDEX IF NOT EXISTS idx_article_id_type ON Article(ID_Type) INCLUDE (ID_Brand, price_cents);
+
+-- Most expensive articles: a backward scan of the index, stopped after the first rows
+CREATE INDEX IF NOT EXISTS idx_article_price_cents ON Article(price_cents);
+
+-- Series of one article: bounded B-tree range scan, the price is read from the index
+CREATE INDEX IF NOT EXISTS idx_pricehistory_article_date ON PriceHistory(ID_Article, DateChanged) INCLUDE (price_cents);
+
+ANALYZE Article;
@@ -0,0 +1,51 @@
+-- An article is identified by its type, brand and name. Every load used to insert the scraped articles again,
+-- so each one had a new ID_Article per load and its price history and offers were split across the copies.
+-- The loaders now upsert on this key (see DatabaseManager.insert_articles). The copies of earlier loads are
+-- merged into the newest one, which holds the current prices.
+
+CREATE TEMPORARY TABLE article_merge ON COMMIT DROP AS
+SELECT ID_Article, MAX(ID_Article) OVER (PARTITION BY ID_Type, COALESCE(ID_Brand, 0), article_name) AS ID_Keep
+FROM Article;
+
+-- Offers left open on an older copy were never closed, later loads only saw the newer copies. They end on the
+-- day the last offer of the article started.
+UPDATE OfferPrice O SET EndDate = L.last_start
+FROM article_merge M,
+     (SELECT M2.ID_Keep, MAX(O2.StartDate) AS last_start
+      FROM OfferPrice O2
+      JOIN article_merge M2 ON O2.ID_Article = M2.ID_Article
+      GROUP BY M2.ID_Keep) L
+WHERE O.ID_Article = M.ID_Article AND M.ID_Article <> M.ID_Keep AND L.ID_Keep = M.ID_Keep
+  AND O.EndDate IS NULL AND O.StartDate < L.last_start;
+
+-- Still open on an older copy: started the same day as the last offer. At most one offer per article may stay
+-- open, the newest copy's own one first, then the most recently inserted.
+DELETE FROM OfferPrice O
+USING article_merge M
+WHERE O.ID_Article = M.ID_Article AND M.ID_Article <> M.ID_Keep AND O.EndDate IS NULL
+  AND EXISTS (
+      SELECT 1 FROM OfferPrice O2
+      JOIN article_merge M2 ON O2.ID_Article = M2.ID_Article
+      WHERE M2.ID_Keep = M.ID_Keep AND O2.EndDate IS NULL
+        AND (M2.ID_Article = M2.ID_Keep OR O2.ID_OfferPrice > O.ID_OfferPrice));
+
+UPDATE OfferPrice O SET ID_Article = M.ID_Keep
+FROM article_merge M
+WHERE O.ID_Article = M.ID_Article AND M.ID_Article <> M.ID_Keep;
+
+UPDATE PriceHistory H SET ID_Article = M.ID_Keep
+FROM article_merge M
+WHERE H.ID_Article = M.ID_Article AND M.ID_Article <> M.ID_Keep;
+
+UPDATE Article A SET ID_Canonical = M.ID_Keep
+FROM article_merge M
+WHERE A.ID_Canonical = M.ID_Article AND M.ID_Article <> M.ID_Keep;
+
+DELETE FROM Article A
+USING article_merge M
+WHERE A.ID_Article = M.ID_Article AND M.ID_Article <> M.ID_Keep;
+
+-- The key of the upsert; articles without a brand share the brand 0
+CREATE UNIQUE INDEX IF NOT EXISTS idx_article_natural_key ON Article(ID_Type, COALESCE(ID_Brand, 0), article_name);
+
+ANALYZE Article;
@@ -0,0 +1,42 @@
+-- Shoppers type the brand and the name together, e.g. 'xiaomi redmi 12' or 'audifonos jbl', and the brand is
+-- often not part of the article name. Article.search_name holds "brand name", lowercase and without accents, and
+-- the trigram and full-text indexes are built on it instead of on the name alone (see SEARCH_ARTICLES_QUERY).
+-- An index expression cannot read Brand, so the column is kept by a trigger on every insert and rename.
+
+-- Same normalisation as SearchUnimart.normalize_text for the Spanish accents; applied to the searched text too.
+-- lower() leaves accented capitals alone under the C locale, so they are mapped as well.
+CREATE OR REPLACE FUNCTION search_text(value TEXT) RETURNS TEXT AS $$
+    SELECT translate(lower(value),
+                     'ÁÀÄÂÉÈËÊÍÌÏÎÓÒÖÔÚÙÜÛÑÇ'
+                     'áàäâéèëêíìïîóòöôúùüûñç',
+                     'aaaaeeeeiiiioooouuuunc'
+                     'aaaaeeeeiiiioooouuuunc');
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+ALTER TABLE Article ADD COLUMN IF NOT EXISTS search_name TEXT;
+
+UPDATE Article A
+SET search_name = search_text(concat_ws(' ', (SELECT brand_name FROM Brand B WHERE B.ID_Brand = A.ID_Brand),
+                                        A.article_name));
+
+CREATE OR REPLACE FUNCTION set_article_search_name() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_name := search_text(concat_ws(' ', (SELECT brand_name FROM Brand WHERE ID_Brand = NEW.ID_Brand),
+                                             NEW.article_name));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER article_search_name BEFORE INSERT OR UPDATE OF ID_Brand, article_name ON Article
+    FOR EACH ROW EXECUTE FUNCTION set_article_search_name();
+
+DROP INDEX IF EXISTS idx_article_name_trgm;
+DROP INDEX IF EXISTS idx_article_name_fts;
+
+-- Partial and misspelled brand and name: similarity and word_similarity operators (%, <%)
+CREATE INDEX IF NOT EXISTS idx_article_search_name_trgm ON Article USING GIN (search_name gin_trgm_ops);
+
+-- Whole words in any order, e.g. 'jbl audifonos'
+CREATE INDEX IF NOT EXISTS idx_article_search_name_fts ON Article USING GIN (to_tsvector('simple', search_name));
+
+ANALYZE Article;
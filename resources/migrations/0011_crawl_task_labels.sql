@@ -0,0 +1,5 @@
+-- A collection listed under several labels is crawled once per run (see FrontierUnimart.build_frontier): its task
+-- is queued under the first label it was found with and carries the other (subcategory, label) pairs, so its
+-- articles are written under every one of them. The pages after the first one inherit the labels of the task.
+
+ALTER TABLE CrawlTask ADD COLUMN IF NOT EXISTS other_labels JSONB NOT NULL DEFAULT '[]';
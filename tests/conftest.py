@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pandas as pd
+
+import pytest
+
+# The modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scratch database the database tests reset on every test, e.g. UNIMART_TEST_DBNAME=unimart_test
+TEST_DATABASE_ENV = {
+    'host': ('UNIMART_TEST_HOST', 'localhost'),
+    'dbname': ('UNIMART_TEST_DBNAME', 'unimart_test'),
+    'user': ('UNIMART_TEST_USER', 'postgres'),
+    'password': ('UNIMART_TEST_PASSWORD', 'root'),
+    'port': ('UNIMART_TEST_PORT', '5432'),
+}
+
+
+@pytest.fixture
+def db_manager():
+    """A connection to an empty, fully migrated test database; the test is skipped without one."""
+    import psycopg2
+
+    from BenchmarkUnimart import reset_database
+    from DataAnalysisUnimart import DatabaseManager
+
+    settings = {name: os.environ.get(variable, default) for name, (variable, default) in TEST_DATABASE_ENV.items()}
+    db_manager = DatabaseManager(**settings)
+    try:
+        db_manager.connect()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"no test database: {e}")
+    reset_database(db_manager)
+    yield db_manager
+    db_manager.disconnect()
+
+
+def write_catalog(directory, articles):
+    """
+    Write the workbooks of a one-type catalog, as the scraper does.
+
+    :param directory: Root directory of the workbooks.
+    :param articles: List of (brand, name, price, offer price or None) in colones.
+    :return: Directory of the article workbooks.
+    """
+    from BenchmarkUnimart import format_price
+
+    main_categories = os.path.join(directory, 'MainCategories')
+    urls_directory = os.path.join(main_categories, 'MainCategories_urls_subcategories')
+    articles_directory = os.path.join(directory, 'Articles_by_subcategory')
+    for path in (urls_directory, articles_directory):
+        os.makedirs(path, exist_ok=True)
+    pd.DataFrame({'Main Categories': ['Celulares']}).to_excel(
+        os.path.join(main_categories, 'Main Categories.xlsx'), index=False)
+    pd.DataFrame({'Smartphones': ['Xiaomi'], 'Smartphones_url': ['https://example.com/collections/xiaomi']}).to_excel(
+        os.path.join(urls_directory, 'Celulares.xlsx'), index=False)
+    pd.DataFrame({
+        'Brand': [brand for brand, _, _, _ in articles],
+        'Articule_Name': [name for _, name, _, _ in articles],
+        'Price': [format_price(price) for _, _, price, _ in articles],
+        'Offer_Price': [format_price(offer) if offer else None for _, _, _, offer in articles],
+    }).to_excel(os.path.join(articles_directory, 'Smartphones.xlsx'), sheet_name='Xiaomi', index=False)
+    return articles_directory
+
+
+@pytest.fixture
+def load_scrape(db_manager, tmp_path):
+    """
+    Load one scrape of a one-type catalog the way `CliUnimart.py ingest` does, articles then offers, from its
+    workbooks or, with parquet=True, from their Parquet dataset.
+    """
+    import DataAnalysisUnimart as analysis
+    from OffersUnimart import load_offers_from_excel
+
+    scrapes = []
+
+    def load(articles, observed_on, parquet=False):
+        directory = str(tmp_path / f'scrape-{len(scrapes)}')
+        articles_directory = write_catalog(directory, articles)
+        scrapes.append(directory)
+        if parquet:
+            from ParquetUnimart import convert_excel_directory
+            convert_excel_directory(articles_directory, os.path.join(directory, 'Articles_parquet'))
+            articles_directory = os.path.join(directory, 'Articles_parquet')
+        main_categories = os.path.join(directory, 'MainCategories')
+        analysis.insert_category_from_excel(db_manager, os.path.join(main_categories, 'Main Categories.xlsx'))
+        analysis.insert_subcategory_from_excel(
+            db_manager, os.path.join(main_categories, 'MainCategories_urls_subcategories'))
+        analysis.insert_brands_from_excel(db_manager, articles_directory)
+        analysis.insert_type_from_excel(db_manager, articles_directory)
+        analysis.insert_articule_from_excel(db_manager, articles_directory, observed_on=observed_on)
+        return load_offers_from_excel(db_manager, observed_on, articles_directory)
+
+    return load
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from ArchiveUnimart import PageArchive, reextract
+from ExtractionUnimart import extract_articles
+from FixtureSiteUnimart import FixtureCatalog, format_price, render_collection
+
+HANDLE = 'ver-todo-smartwatches'
+
+
+def served_articles(catalog, page):
+    return [[product['vendor'], product['title'], format_price(product['price']),
+             format_price(product['offer']) if product['offer'] is not None else None]
+            for product in catalog.page(HANDLE, page)]
+
+
+def rows(df):
+    return [[None if pd.isna(value) else value for value in row] for row in df.itertuples(index=False, name=None)]
+
+
+def test_extract_articles_reads_every_product_of_the_page():
+    catalog = FixtureCatalog(n_products=2000, page_size=8)
+    df = extract_articles(render_collection(catalog, HANDLE, 1))
+
+    assert rows(df) == served_articles(catalog, 1)
+
+
+def test_reextract_writes_the_archived_pages_of_each_label(tmp_path):
+    catalog = FixtureCatalog(n_products=2000, page_size=8)
+    archive = PageArchive(str(tmp_path), run_id='run-1')
+    for page in (1, 2):
+        archive.put(f'https://www.unimart.com/collections/{HANDLE}?page={page}',
+                    render_collection(catalog, HANDLE, page), 'Audio', 'Audífonos')
+
+    written = []
+    assert reextract(archive, [lambda df, *key: written.append((key, rows(df)))], workers=1) == 16
+    assert written == [(('Audio', 'Audífonos'), served_articles(catalog, 1) + served_articles(catalog, 2))]
+
+
+def test_reextract_reports_an_empty_archive(tmp_path, capsys):
+    assert reextract(PageArchive(str(tmp_path)), []) is None
+    assert 'has no run' in capsys.readouterr().out
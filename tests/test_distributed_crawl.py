@@ -0,0 +1,43 @@
+from DistributedCrawlUnimart import CrawlQueue
+
+COLLECTIONS = [
+    ('Audio', 'Audífonos', 'https://www.unimart.com/collections/audifonos'),
+    ('Ofertas', 'Audífonos en oferta', 'https://www.unimart.com/collections/Audifonos/'),
+    ('Audio', 'Parlantes', 'https://www.unimart.com/collections/parlantes'),
+]
+
+
+def test_seed_queues_each_collection_once_with_all_of_its_labels(db_manager):
+    queue = CrawlQueue(db_manager, 'run-1')
+    assert queue.seed(COLLECTIONS) == 2
+
+    tasks = {task[4]: task for task in queue.claim('node-1', limit=10)}
+    assert tasks['https://www.unimart.com/collections/audifonos'][2:4] == ('Audio', 'Audífonos')
+    assert tasks['https://www.unimart.com/collections/audifonos'][5] == [('Ofertas', 'Audífonos en oferta')]
+    assert tasks['https://www.unimart.com/collections/parlantes'][5] == []
+
+
+def test_following_pages_keep_the_labels_of_the_collection(db_manager):
+    queue = CrawlQueue(db_manager, 'run-1')
+    queue.seed(COLLECTIONS[:2])
+    id_task, _, subcategory, label, url, other_labels = queue.claim('node-1')[0]
+
+    cur = db_manager.conn.cursor()
+    assert queue.complete(cur, id_task, 'node-1', 2, url + '?page=2', subcategory, label, other_labels)
+    db_manager.conn.commit()
+    cur.close()
+
+    assert queue.claim('node-1')[0][1:] == ('page', 'Audio', 'Audífonos', url + '?page=2',
+                                            [('Ofertas', 'Audífonos en oferta')])
+
+
+def test_renew_keeps_the_lease_until_another_node_takes_the_page(db_manager):
+    queue = CrawlQueue(db_manager, 'run-1', lease_seconds=0)
+    queue.seed(COLLECTIONS[2:])
+    id_task = queue.claim('node-1')[0][0]
+    assert queue.renew(id_task, 'node-1')
+
+    # The lease of node-1 expired at once, another node claims the page again
+    assert queue.claim('node-2')[0][0] == id_task
+    assert not queue.renew(id_task, 'node-1')
+    assert queue.renew(id_task, 'node-2')
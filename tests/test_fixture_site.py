@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+import pytest
+
+from FeedUnimart import ExcelSink, ShopifyFeed
+from FixtureSiteUnimart import FixtureCatalog, FixtureSite, check_written_articles, run_benchmark, scrape_with_feed
+
+# products.json pages of one collection in the format of FeedUnimart.py record, two products per page:
+# a variant on sale, a product without compare_at_price and one whose compare_at_price is its price
+RECORDINGS = os.path.join(os.path.dirname(__file__), 'fixtures', 'recordings')
+
+RECORDED_ARTICLES = [
+    ('JBL', 'Audífonos Inalámbricos Tune 510BT', '₡34,990.00', '₡29,990.00'),
+    ('Sony', 'Parlante Portátil SRS-XB100', '₡39,900.00', None),
+    ('Xiaomi', 'Audífonos Redmi Buds 4 Lite', '₡14,900.00', None),
+]
+
+
+@pytest.fixture
+def site():
+    site = FixtureSite(FixtureCatalog(n_products=120, page_size=4), recordings=RECORDINGS).start()
+    yield site
+    site.stop()
+
+
+def read_sheet(file_path, sheet_name):
+    sheet = pd.read_excel(file_path, sheet_name=sheet_name, engine='openpyxl')
+    return [tuple(None if pd.isna(value) else value for value in row)
+            for row in sheet[['Brand', 'Articule_Name', 'Price', 'Offer_Price']].itertuples(index=False, name=None)]
+
+
+def test_feed_writes_the_recorded_products(site, tmp_path):
+    feed = ShopifyFeed(site.url, page_size=2, request_delay=0)
+    collections = [('Audio', 'Audio 1', site.url + 'collections/audio-1')]
+
+    assert feed.scrape(collections, [ExcelSink(str(tmp_path))]) == 3
+    assert read_sheet(tmp_path / 'Audio.xlsx', 'Audio 1') == RECORDED_ARTICLES
+    assert site.pages_served == 2
+
+
+def test_benchmark_compares_every_row_with_the_served_products(site):
+    results = run_benchmark(site, ['feed'])
+
+    assert results[0]['sheets_mismatched'] == 0
+    # Every generated product but those of the recorded collection, which serves the recorded ones instead
+    assert results[0]['products'] == 120 - len(site.catalog.collections['audio-1']) + len(RECORDED_ARTICLES)
+
+
+def test_check_catches_an_altered_price(site, tmp_path):
+    articles_directory = scrape_with_feed(site, str(tmp_path))
+    assert check_written_articles(site, articles_directory) == []
+
+    workbook = os.path.join(articles_directory, 'Audio.xlsx')
+    sheets = pd.read_excel(workbook, sheet_name=None, engine='openpyxl')
+    sheets['Audio 1'].loc[1, 'Price'] = '₡39,000.00'
+    with pd.ExcelWriter(workbook, engine='openpyxl') as writer:
+        for label, sheet in sheets.items():
+            sheet.to_excel(writer, sheet_name=label, index=False)
+
+    assert check_written_articles(site, articles_directory) == [('Audio', 'Audio 1', 3, 3)]
@@ -0,0 +1,52 @@
+import pytest
+from selenium.common import WebDriverException
+
+from NavigationUnimart import CircuitBreakers, NavigationError, ResilientNavigator, RetryPolicy
+
+URL = 'https://www.unimart.com/collections/audifonos'
+
+
+class FakeDriver:
+    """A WebDriver whose page loads fail while `failing` is set, and whose pages never show any element."""
+
+    def __init__(self, failing=False):
+        self.failing = failing
+        self.current_url = URL
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        if self.failing:
+            raise WebDriverException('net::ERR_CONNECTION_RESET')
+        self.current_url = url
+
+    def refresh(self):
+        pass
+
+
+def navigator(driver, breakers):
+    return ResilientNavigator(driver, policy=RetryPolicy(max_attempts=1, attempt_timeout=0.01),
+                              wait_when_open=False, breakers=breakers)
+
+
+def test_sessions_share_the_circuit_of_the_host():
+    breakers = CircuitBreakers(failure_threshold=4)
+    navigators = [navigator(FakeDriver(failing=True), breakers) for _ in range(2)]
+    for _ in range(2):
+        for session in navigators:
+            with pytest.raises(NavigationError):
+                session.get(URL)
+
+    assert breakers.get('www.unimart.com').state == 'open'
+    assert [host for host, _ in navigators[1].breakers.items()] == ['www.unimart.com']
+
+
+def test_wait_timeouts_do_not_open_the_circuit():
+    breakers = CircuitBreakers(failure_threshold=1)
+    session = navigator(FakeDriver(), breakers)
+    with pytest.raises(NavigationError):
+        session.wait_until(lambda driver: False)
+
+    assert breakers.get('www.unimart.com').state == 'closed'
+    session.get(URL)
@@ -0,0 +1,47 @@
+from datetime import date
+
+from OffersUnimart import get_active_offers
+
+FIRST_DAY = date(2024, 3, 1)
+SECOND_DAY = date(2024, 3, 8)
+THIRD_DAY = date(2024, 3, 15)
+
+
+def offers(db_manager):
+    return db_manager.fetch_all("""
+        SELECT A.article_name, O.Price, O.StartDate, O.EndDate
+        FROM OfferPrice O JOIN Article A ON O.ID_Article = A.ID_Article
+        ORDER BY O.StartDate, A.article_name;
+        """)
+
+
+def test_offer_that_disappears_is_closed_by_the_next_load(db_manager, load_scrape):
+    load_scrape([('Xiaomi', 'Redmi 12', 100000, 90000), ('JBL', 'Audifonos Tune 510BT', 30000, 25000)], FIRST_DAY)
+    counts = load_scrape([('Xiaomi', 'Redmi 12', 100000, None), ('JBL', 'Audifonos Tune 510BT', 30000, 25000)],
+                         SECOND_DAY)
+
+    assert counts['closed'] == 1 and counts['opened'] == 0
+    assert [(name, float(price), start, end) for name, price, start, end in offers(db_manager)] == [
+        ('Audifonos Tune 510BT', 25000.0, FIRST_DAY, None),
+        ('Redmi 12', 90000.0, FIRST_DAY, SECOND_DAY),
+    ]
+    assert [row[1] for row in get_active_offers(db_manager, SECOND_DAY)] == ['Audifonos Tune 510BT']
+    assert db_manager.fetch_all("SELECT offer_price_cents FROM Article WHERE article_name = 'Redmi 12';") == [(None,)]
+
+
+def test_offer_that_changes_price_starts_a_new_period(db_manager, load_scrape):
+    load_scrape([('Xiaomi', 'Redmi 12', 100000, 90000)], FIRST_DAY)
+    load_scrape([('Xiaomi', 'Redmi 12', 100000, 85000)], SECOND_DAY)
+    load_scrape([('Xiaomi', 'Redmi 12', 100000, 85000)], THIRD_DAY)
+
+    assert [(float(price), start, end) for _, price, start, end in offers(db_manager)] == [
+        (90000.0, FIRST_DAY, SECOND_DAY),
+        (85000.0, SECOND_DAY, None),
+    ]
+
+
+def test_offers_are_matched_by_brand_too(db_manager, load_scrape):
+    load_scrape([('Samsung', 'Cargador USB-C 25W', 12000, 9000), ('Xiaomi', 'Cargador USB-C 25W', 10000, None)],
+                FIRST_DAY)
+
+    assert [(row[2], float(row[4])) for row in get_active_offers(db_manager, FIRST_DAY)] == [('Samsung', 9000.0)]
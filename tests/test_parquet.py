@@ -0,0 +1,49 @@
+from datetime import date
+
+from DataAnalysisUnimart import ArticleRow, iter_article_batches
+from ParquetUnimart import convert_excel_directory, iter_sheets
+from conftest import write_catalog
+
+# Brand, name, price, offer in colones; 19.99 is the price a float conversion rounds to the wrong cent
+ARTICLES = [
+    ('Xiaomi', 'Smartphone Redmi 12C, 128GB', 119900, 99900),
+    ('Xiaomi', 'Smartphone Redmi Note 12 Pro, 256GB', 249900, None),
+    (None, 'Cable USB-C', 19.99, None),
+]
+ROWS = [ArticleRow('Xiaomi', 'Smartphone Redmi 12C, 128GB', 11990000, 9990000),
+        ArticleRow('Xiaomi', 'Smartphone Redmi Note 12 Pro, 256GB', 24990000, None),
+        ArticleRow(None, 'Cable USB-C', 1999, None)]
+
+
+def convert(tmp_path):
+    root = str(tmp_path / 'Articles_parquet')
+    convert_excel_directory(write_catalog(str(tmp_path), ARTICLES), root)
+    return root
+
+
+def test_sheets_are_read_as_batches_in_cents(tmp_path):
+    batches = list(iter_sheets(convert(tmp_path), batch_size=2))
+
+    assert [(subcategory, type_name, batch.num_rows) for subcategory, type_name, batch in batches] == [
+        ('Smartphones', 'Xiaomi', 2), ('Smartphones', 'Xiaomi', 1)]
+    assert sorted(price for _, _, batch in batches for price in batch.column('Price_Cents').to_pylist()) == [
+        1999, 11990000, 24990000]
+
+
+def test_article_batches_match_the_workbooks(tmp_path):
+    articles_directory = write_catalog(str(tmp_path), ARTICLES)
+    root = convert(tmp_path)
+
+    def rows(directory):
+        return sorted((row for batch in iter_article_batches(directory) for row in batch.rows),
+                      key=lambda row: row.articule_name)
+
+    assert rows(root) == rows(articles_directory) == sorted(ROWS, key=lambda row: row.articule_name)
+
+
+def test_ingest_from_the_parquet_dataset(db_manager, load_scrape):
+    load_scrape(ARTICLES, date(2024, 3, 1), parquet=True)
+
+    assert sorted(db_manager.fetch_all("SELECT article_name, price_cents FROM Article;", None)) == [
+        ('Cable USB-C', 1999), ('Smartphone Redmi 12C, 128GB', 11990000),
+        ('Smartphone Redmi Note 12 Pro, 256GB', 24990000)]
@@ -0,0 +1,25 @@
+from BenchmarkUnimart import capture_plans, generate_catalog, join_index_regressions, load_catalog, plan_regressions
+
+# Large enough for the planner to prefer the indexes of PLAN_EXPECTATIONS, small enough to load in seconds
+CATALOG_SIZE = 10_000
+
+
+def test_queries_reach_the_catalog_through_their_indexes(db_manager, tmp_path):
+    generate_catalog(str(tmp_path), CATALOG_SIZE)
+    load_catalog(db_manager, str(tmp_path))
+
+    plans = capture_plans(db_manager)
+    assert plan_regressions(plans) == []
+    assert join_index_regressions(db_manager) == []
+
+
+def test_dropped_foreign_key_index_is_reported(db_manager, tmp_path):
+    generate_catalog(str(tmp_path), CATALOG_SIZE)
+    load_catalog(db_manager, str(tmp_path))
+    cur = db_manager.conn.cursor()
+    cur.execute("DROP INDEX idx_article_id_brand;")
+    db_manager.conn.commit()
+    cur.close()
+
+    assert plan_regressions(capture_plans(db_manager)) == ['articles_of_brand: sequential scan on article']
+    assert join_index_regressions(db_manager) == ['articles_of_brand: join without idx_article_id_brand']
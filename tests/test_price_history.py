@@ -0,0 +1,21 @@
+from datetime import date
+
+FIRST_DAY = date(2024, 3, 1)
+SECOND_DAY = date(2024, 3, 8)
+
+
+def test_price_change_between_two_loads_is_a_mover(db_manager, load_scrape):
+    load_scrape([('Xiaomi', 'Redmi 12', 100000, None), ('Xiaomi', 'Redmi Note 12', 150000, None)], FIRST_DAY)
+    load_scrape([('Xiaomi', 'Redmi 12', 90000, None), ('Xiaomi', 'Redmi Note 12', 150000, None)], SECOND_DAY)
+
+    # The second load updated the articles of the first one instead of adding new ones
+    articles = db_manager.fetch_all("SELECT ID_Article, article_name, price_cents FROM Article ORDER BY ID_Article;")
+    assert [(name, cents) for _, name, cents in articles] == [('Redmi 12', 9000000), ('Redmi Note 12', 15000000)]
+
+    movers = db_manager.get_biggest_price_movers(FIRST_DAY, SECOND_DAY)
+    assert [(name, float(first), float(last), float(change), float(percentage))
+            for name, first, last, change, percentage in movers] == [('Redmi 12', 100000.0, 90000.0, -10000.0, -10.0)]
+
+    series = db_manager.get_article_price_series(articles[0][0], FIRST_DAY, date(2024, 4, 1))
+    assert [(period, float(average)) for period, average, _, _ in series] == [(FIRST_DAY, 100000.0),
+                                                                            (SECOND_DAY, 90000.0)]
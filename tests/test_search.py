@@ -0,0 +1,43 @@
+from datetime import date
+
+from SearchUnimart import NgramIndex
+
+# Brand, name: the brand of a phone is rarely part of its name, the cases name the phone they fit
+ARTICLES = [
+    ('Creative Case', 'Estuche Protector Suave Para Xiaomi Redmi 5'),
+    ('Spigen', 'Estuche Redmi 12'),
+    ('Xiaomi', 'Smartphone Redmi 12C, 128GB'),
+    ('Xiaomi', 'Smartphone Redmi Note 12 Pro, 256GB'),
+    ('House of Marley', 'Audífonos Inalámbricos Smile Jamaica 2.0'),
+    ('JBL', 'Audífonos Inalámbricos Tune 510BT'),
+    ('JBL', 'Parlante Flip 6'),
+]
+PHONES = {'Smartphone Redmi 12C, 128GB', 'Smartphone Redmi Note 12 Pro, 256GB'}
+
+
+def names(results):
+    return [result[1] for result in results]
+
+
+def test_ngram_index_matches_the_brand_and_the_name():
+    index = NgramIndex()
+    for brand, name in ARTICLES:
+        index.add(name, brand=brand)
+
+    assert set(names(index.search('xiaomi redmi 12', limit=2))) == PHONES
+    assert names(index.search('audifonos jbl', limit=1)) == ['Audífonos Inalámbricos Tune 510BT']
+
+
+def test_ngram_index_breaks_ties_by_length_normalised_similarity():
+    index = NgramIndex()
+    for brand, name in (('Xiaomi', 'Smartphone Redmi 112 Pro, 256GB'), ('Xiaomi', 'Redmi 12')):
+        index.add(name, brand=brand)
+
+    assert names(index.search('redmi')) == ['Redmi 12', 'Smartphone Redmi 112 Pro, 256GB']
+
+
+def test_search_articles_matches_the_brand_and_the_name(db_manager, load_scrape):
+    load_scrape([(brand, name, 10000, None) for brand, name in ARTICLES], date(2024, 3, 1))
+
+    assert set(names(db_manager.search_articles('xiaomi redmi 12', limit=2))) == PHONES
+    assert names(db_manager.search_articles('audifonos jbl', limit=1)) == ['Audífonos Inalámbricos Tune 510BT']